@@ -18,25 +18,10 @@ target_direction_list=(
 "192.5.5.241" "192.112.36.4" "198.97.190.53" "192.36.148.17" "192.58.128.30"
 "193.0.14.129" "199.7.83.42" "202.12.27.33" "104.16.123.96")
 
-do_measurement_campaign_to_target()
-{
-  ip=$1
-  campaign_selected=$2
-  for probes_filepath in "${probes_sets_names_list[@]}"; do
-    # echo the command used
-    echo ./igreedy.sh -m "$ip" \
-    -p "$probes_sets_path$probes_filepath" \
-    -c "$campaign_selected"
-    echo ""
-    # Start the measurement
-    ./igreedy.sh -m "$ip" \
-    -p "$probes_sets_path$probes_filepath" \
-    -c "$campaign_selected"
-  done
-}
-
-for target in "${target_direction_list[@]}"; do
-  do_measurement_campaign_to_target "$target" "$campaign_name"
-done
-
-
+# Submit every measurement at once, the scheduler waits for all of them
+# and resumes the campaign if it is run again
+probes_sets=$(IFS=,; echo "${probes_sets_names_list[*]}")
+echo ./code/campaign_scheduler.py -c "$campaign_name" -p "$probes_sets" \
+"${target_direction_list[@]}"
+./code/campaign_scheduler.py -c "$campaign_name" -p "$probes_sets" \
+"${target_direction_list[@]}"
@@ -17,22 +17,24 @@ Stéphane Bortzmeyer <bortzmeyer+ripe@nic.fr>
 
 import os, sys
 import json
-import time
-import requests
+import httpx
 
 from utils.custom_exceptions import (
     AuthFileNotFound,
     FieldsQueryError,
-    InternalError,
     MeasurementAccessError,
     MeasurementNotFound,
     RequestSubmissionError,
     ResultError
 )
+from utils.atlas_client import (
+    MEASUREMENT_PENDING_STATUSES,
+    get_sync_atlas_client
+)
+from utils.constants import ATLAS_BACKEND
 import utils.common_functions as cm
 
 authfile = "datasets/auth"
-base_url = "https://atlas.ripe.net/api/v2/measurements"
 
 # The following parameters are currently not settable. Anyway, be
 # careful when changing these, you may get inconsistent results if you
@@ -51,6 +53,18 @@ maximum_time_for_results_factor = 5
 # "long enough". The time to wait is not documented so the values
 # above have been found mostly with trial-and-error.
 
+def get_auth_key():
+    """ Reads the API key of the authentication file """
+    if not os.path.exists(authfile):
+        # The archive answers without a key
+        if ATLAS_BACKEND == "replay":
+            return None
+        raise AuthFileNotFound("Authentication file %s not found" % authfile)
+    auth = open(authfile)
+    key = auth.readline()[:-1]
+    auth.close()
+    return key
+
 class Measurement():
     """ An Atlas measurement, identified by its ID (such as #1010569) in the field "id" """
 
@@ -71,77 +85,53 @@ class Measurement():
         
         # TODO: when creating a dummy measurement, a key may not be necessary if the measurement is public
         if not key:
-            if not os.path.exists(authfile):
-                raise AuthFileNotFound("Authentication file %s not found" % authfile)
-            auth = open(authfile)
-            key = auth.readline()[:-1]
-            auth.close()
+            key = get_auth_key()
 
-        self.url = base_url + "/?key=%s" % key
-        self.url_probes = base_url + "/%s/?fields=probes,status"
-        self.url_status = base_url + "/%s/?fields=status" 
-        self.url_results = base_url + "/%s/results/" 
-        self.url_latest = base_url + "/%s/latest/?versions=%s"
+        # Blocking facade of the asynchronous client, shares its connections
+        self._client = get_sync_atlas_client(key)
+        self.notification = sleep_notification
 
         if data is not None:
             try:
-                self.notification = sleep_notification
                 # Start the measurement and get measurement id
-                results = requests.post(self.url, json=data).json()
-                # TODO remove only for test
-                #print(json.dumps(results, indent=4))
-                #data["petition_result"] = results
-                #print(key)
-                #cm.dict_to_json_file(dict=data,
-                #                     file_path="last_measurement_data.json")
-                self.id = results["measurements"][0]
-
-            except requests.HTTPError as e:
+                self.id = self._client.create_measurement(data)[0]
+            except httpx.HTTPStatusError as e:
                 raise RequestSubmissionError("Status %s, reason \"%s\"" % \
-                                             (e.code, e.read()))
+                                             (e.response.status_code,
+                                              e.response.text))
 
             if not wait:
                 return
             # Find out how many probes were actually allocated to this measurement
-            enough = False
             requested = 0
             for probes_types in data["probes"]:
-                requested =+ probes_types["requested"]
+                requested += probes_types["requested"]
             fields_delay = fields_delay_base + (requested * fields_delay_factor)
-            while not enough:
-                # Let's be patient
-                if self.notification is not None:
-                    self.notification(fields_delay)
-                time.sleep(fields_delay)
-                fields_delay *= 2
-                try:
-                    meta = requests.get(self.url_probes % self.id).json()
-                    if meta["status"]["name"] == "Specified" or \
-                           meta["status"]["name"] == "Scheduled" or \
-                            meta["status"]["name"] == "synchronizing":
-                        # Not done, loop
-                        pass
-                    elif meta["status"]["name"] == "Ongoing":
-                        enough = True
-                        self.num_probes = len(meta["probes"])
-                    else:
-                        raise InternalError("Internal error in #%s, unexpected status when querying the measurement fields: \"%s\"" % (self.id, meta["status"]))
-                except requests.HTTPError as e:
-                    raise FieldsQueryError("%s" % e.read())
+            try:
+                probes = self._client.wait_probes_allocated(
+                    self.id, fields_delay, self.notification)
+            except httpx.HTTPStatusError as e:
+                raise FieldsQueryError("%s" % e.response.text)
+            self.num_probes = len(probes)
         else:
             self.id = id
             try:
-                result_status = requests.get(self.url_status % self.id).json()
-            except requests.HTTPError as e:
-                if e.code == 404:
+                meta = self._client.get_measurement(self.id, "probes,status")
+                if meta["status"]["name"] in MEASUREMENT_PENDING_STATUSES:
+                    # Not started yet, its probes are not allocated
+                    probes = self._client.wait_probes_allocated(
+                        self.id, fields_delay_base, self.notification)
+                else:
+                    probes = meta.get("probes") or []
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
                     raise MeasurementNotFound
                 else:
-                    raise MeasurementAccessError("%s" % e.read())
-            status = result_status["status"]["name"]
-            # TODO: test status
-            self.num_probes = None # TODO: get it from the status?
+                    raise MeasurementAccessError("%s" % e.response.text)
+            self.num_probes = len(probes)
             
-    def results(self, wait=True, percentage_required=0.9, latest=None):
+    def results(self, wait=True, percentage_required=0.9, latest=None,
+                results_notification=None):
         """Retrieves the result. "wait" indicates if you are willing to wait until
         the measurement is over (otherwise, you'll get partial
         results). "percentage_required" is meaningful only when you wait
@@ -151,62 +141,27 @@ class Measurement():
         always have to check the actual number of reporting probes in
         the result). "latest" indicates that you want to retrieve only
         the last N results (by default, you get all the results).
+        "results_notification" is a lambda taking the results received so
+        far, called while waiting every time new results arrive. If it
+        returns True the measurement is stopped and those results returned.
         """
         if latest is not None:
             wait = False
-        if latest is None:
-            url_lastest = self.url_results % self.id
-        else:
-            url_lastest = self.url_latest% (self.id, latest)
         if wait:
-            enough = False
-            attempts = 0
-            results_delay = 15
-            maximum_time_for_results = 360
-            start = time.time()
-            elapsed = 0
-            result_data = None
-            while not enough and elapsed < maximum_time_for_results:
-                if self.notification is not None:
-                    self.notification(results_delay)
-                print("Wait 15 seconds for results. Number of attempts {}".
-                      format(attempts))
-                time.sleep(results_delay)
-                attempts += 1
-                elapsed = time.time() - start
-                try:
-                    result_data = requests.get(url_lastest).json()
-                    num_results = len(result_data)
-                    if num_results >= self.num_probes*percentage_required:
-                        # Requesting a strict equality may be too
-                        # strict: if an allocated probe does not
-                        # respond, we will have to wait for the stop
-                        # of the measurement (many minutes). Anyway,
-                        # there is also the problem that a probe may
-                        # have sent only a part of its measurements.
-                        enough = True
-                    else:
-                        result_status = requests.get(self.url_status % self.id).json()
-                        status = result_status["status"]["name"]
-                        if status == "Ongoing":
-                            # Wait a bit more
-                            pass
-                        elif status == "Stopped":
-                            # Even if not enough probes
-                            enough = True
-                        else:
-                            raise InternalError("Unexpected status when retrieving the measurement: \"%s\"" % \
-                                   result_data["status"])
-                except requests.HTTPError as e:
-                    if e.code != 404: 
-                        # Yes, we may have no result file at all for some time
-                        raise ResultError(str(e.code) + " " + e.reason)
-            if result_data is None:
-                raise ResultError("No results retrieved")
+            try:
+                # First poll when the results of the probes are expected
+                result_data = self._client.wait_results(
+                    self.id, self.num_probes, percentage_required,
+                    results_delay=results_delay_base +
+                    self.num_probes * results_delay_factor,
+                    notification=self.notification,
+                    results_notification=results_notification)
+            except httpx.HTTPStatusError as e:
+                raise ResultError("%s %s" % (e.response.status_code,
+                                             e.response.reason_phrase))
         else:
             try:
-                result_data = requests.get(url_lastest).json()
-            except requests.HTTPError as e:
-                raise ResultError(e.read())
+                result_data = self._client.get_results(self.id, latest)
+            except httpx.HTTPStatusError as e:
+                raise ResultError(e.response.text)
         return result_data
-
@@ -9,9 +9,7 @@ import collections
 import json,sys
 import random
 
-from utils.common_functions import (
-    json_file_to_dict
-)
+from utils.measurement_store import iter_measurement_samples
 
 class Anycast(object):
     """
@@ -55,25 +53,15 @@ class Anycast(object):
         data.close()
         """
 
-        data = json_file_to_dict(input_file)
-        for measure in data["measurement_results"]:
-            try:
-                hostname = measure["hostname"]
-                latitude = measure["latitude"]
-                longitude = measure["longitude"]
-                minRTT = measure["rtt_ms"]
-            except KeyError as exception:
-                continue
-            # additive controlled noise (negative exponential distribution) to make problem harder ;)
-            if noise>0:
-                minRTT = float(minRTT)
-                minRTT += float(random.expovariate(1/noise))
-
-            if not ( float(minRTT) > threshold and threshold > 0):
-                if(self._setDisc.get(float(minRTT)) is None):
-                    self._setDisc[float(minRTT)]=[Disc(hostname,float(latitude),float(longitude),float(minRTT))]
-                else:                
-                    self._setDisc[float(minRTT)].append(Disc(hostname,float(latitude),float(longitude),float(minRTT)))
+        self._noise = noise
+        self._threshold = threshold
+        # input_file None starts without discs, see add_sample
+        if input_file is not None:
+            for hostname, latitude, longitude, minRTT in \
+                    iter_measurement_samples(input_file):
+                # Entries without RTT answered have no location nor RTT
+                if None not in (latitude, longitude, minRTT):
+                    self.add_sample(hostname, latitude, longitude, minRTT)
 
         #order the discs by ping
         self._orderDisc=collections.OrderedDict(sorted(self._setDisc.items()))
@@ -89,6 +77,98 @@ class Anycast(object):
                 self._airports[iata]=[float(latitude),float(longitude),int(pop),city,country_code]           
             airportLines.close()
  
+    def add_measure(self, measure):
+        """Adds a disc from an entry of "measurement_results" """
+        try:
+            hostname = measure["hostname"]
+            latitude = measure["latitude"]
+            longitude = measure["longitude"]
+            minRTT = measure["rtt_ms"]
+        except KeyError as exception:
+            return
+        self.add_sample(hostname, latitude, longitude, minRTT)
+
+    def add_sample(self, hostname, latitude, longitude, minRTT):
+        """
+        Adds the disc of one RTT sample. The discs are ordered again by
+        sort_discs(), once all the samples available are added.
+        """
+        # additive controlled noise (negative exponential distribution) to make problem harder ;)
+        if self._noise>0:
+            minRTT = float(minRTT)
+            minRTT += float(random.expovariate(1/self._noise))
+
+        if not ( float(minRTT) > self._threshold and self._threshold > 0):
+            if(self._setDisc.get(float(minRTT)) is None):
+                self._setDisc[float(minRTT)]=[Disc(hostname,float(latitude),float(longitude),float(minRTT))]
+            else:
+                self._setDisc[float(minRTT)].append(Disc(hostname,float(latitude),float(longitude),float(minRTT)))
+
+    def sort_discs(self):
+        #order the discs by ping
+        self._orderDisc=collections.OrderedDict(sorted(self._setDisc.items()))
+
+    def enumerate_and_geolocate(self, radiusGeolocated=0.1, treshold=0):
+        """
+        iGreedy: enumerates the anycast instances with the MIS of discs and
+        geolocates them, running the enumeration again after every disc
+        geolocated. Returns (numberOfInstance, discsSolution).
+        """
+        self._discsMis = Discs()
+        iteration = True
+        discsSolution = []
+
+        numberOfInstance = 0
+        while iteration:
+
+            iteration = False
+            resultEnumeration = self.enumeration()
+
+            numberOfInstance += resultEnumeration[0]
+            if numberOfInstance <= 1:
+                print("No anycast instance detected")
+                return numberOfInstance, discsSolution
+
+            for radius, discList in resultEnumeration[1].getOrderedDisc().items():
+                for disc in discList:
+                    # if the disc was not geolocated before, geolocate it!
+                    if not disc[1]:
+                        # remove old disc from MIS of disc
+                        # MIS = Maximum Independent Set
+                        resultEnumeration[1].removeDisc(disc)
+
+                        # result geolocation with the statistics of airports
+                        city = self.geolocation(disc[0], treshold)
+
+                        # if there is a city inside the disc
+                        if city is not False:
+                            # geolocated one disc, re-run enumeration!
+                            iteration = True
+                            discsSolution.append((disc[0], city))
+                            # insert the new disc in the MIS
+                            resultEnumeration[1].add(
+                                Disc("Geolocated",
+                                     float(city[1]),
+                                     float(city[2]),
+                                     radiusGeolocated),
+                                True)
+
+                            break  # exit for rerun MIS
+                        else:
+                            # insert the old disc in the MIS
+                            resultEnumeration[1].add(disc[0], True)
+                            # disc, marker
+                            discsSolution.append((disc[0], [
+                                "NoCity",
+                                disc[0].getLatitude(),
+                                disc[0].getLongitude(),
+                                "N/A",
+                                "N/A"]))
+
+                if iteration:
+                    break
+        return numberOfInstance, discsSolution
+
     def detection(self):
         self._discsMis = Discs()
         for ping, setDiscs in self._orderDisc.items(): 
@@ -183,3 +263,58 @@ class Anycast(object):
         return False #no airports inside
         """
 
+
+
+class OnlineAnycast(Anycast):
+    """
+    iGreedy over the RTT samples of a measurement still running. Every
+    update adds the new samples and runs the enumeration and geolocation
+    again over all the discs, as the MIS may change with any new smaller
+    disc. on_detection(anycast) is called once, as soon as two disjoint
+    discs exist, and from then on_update(numberOfInstance, discsSolution)
+    after every update. The analysis is stable when the number of instances has not
+    changed for stable_updates updates.
+    """
+
+    def __init__(self, airportFile, alpha, noise=0, threshold=-1,
+                 stable_updates=0, on_detection=None, on_update=None):
+        super().__init__(None, airportFile, alpha, noise, threshold)
+        self._stable_updates = stable_updates
+        self._on_detection = on_detection
+        self._on_update = on_update
+        self.anycast_detected = False
+        self.numberOfInstance = 0
+        self.discsSolution = []
+        self._updates_unchanged = 0
+
+    def update(self, measures):
+        """
+        Adds entries of "measurement_results" and refines the instances.
+        Returns True once the analysis is stable.
+        """
+        for measure in measures:
+            self.add_measure(measure)
+        self.sort_discs()
+
+        if not self.anycast_detected and self.detection():
+            self.anycast_detected = True
+            if self._on_detection is not None:
+                self._on_detection(self)
+
+        if not self.anycast_detected:
+            # Unicast so far, nothing to enumerate
+            return False
+
+        numberOfInstance, self.discsSolution = self.enumerate_and_geolocate()
+        if numberOfInstance == self.numberOfInstance:
+            self._updates_unchanged += 1
+        else:
+            self._updates_unchanged = 0
+        self.numberOfInstance = numberOfInstance
+        if self._on_update is not None:
+            self._on_update(self.numberOfInstance, self.discsSolution)
+        return self.is_stable()
+
+    def is_stable(self):
+        return self._stable_updates > 0 and \
+            self._updates_unchanged >= self._stable_updates
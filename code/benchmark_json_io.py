@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# micro-benchmark of the JSON backends reading a tree of JSON files
+# ---------------------------------------------------------------------.
+
+# external modules imports
+import getopt
+import json
+import os
+import sys
+import time
+# internal modules imports
+from utils.constants import RESULTS_PATH
+from utils.common_functions import create_directory_structure
+from utils.json_io import (
+    JSON_BACKENDS,
+    get_json_backend,
+    set_json_backend,
+    read_json_file
+)
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  benchmark_json_io.py [-r repetitions] [path]
+
+Reads every JSON file below path (the results directory by default) with
+the read path used before the json_io module and with every JSON backend
+installed, and prints the time of each one.
+
+Options:
+    --repetitions   -r  repetitions
+                        Times every file set is read, the best time is
+                        kept. Default 3.
+    """)
+    sys.exit(0)
+
+
+def read_json_file_stdlib_text(file_path: str):
+    """The read path used before the json_io module"""
+    create_directory_structure(file_path)
+    with open(file_path) as file:
+        raw_json = file.read()
+    return json.loads(raw_json)
+
+
+def time_reads(read_function, filepaths: list, repetitions: int) -> float:
+    best_time = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        for filepath in filepaths:
+            read_function(filepath)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return best_time
+
+
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv):
+        print_help_text()
+
+    try:
+        options, args = getopt.getopt(argv, "r:", ["repetitions="])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    repetitions = 3
+    for option, arg in options:
+        if option in ("-r", "--repetitions"):
+            repetitions = int(arg)
+    path = args[0] if args else RESULTS_PATH
+
+    filepaths = [os.path.join(directory, filename)
+                 for directory, _, filenames in os.walk(path)
+                 for filename in filenames if filename.endswith(".json")]
+    total_size = sum(os.path.getsize(filepath) for filepath in filepaths)
+    print("{} files, {:.1f} MB below {}".format(
+        len(filepaths), total_size / 2 ** 20, path))
+
+    baseline_time = time_reads(read_json_file_stdlib_text, filepaths,
+                               repetitions)
+    print("{:<22} {:>8.3f} s".format("previous (text, json)", baseline_time))
+    default_backend = get_json_backend()[0]
+    for backend_name in JSON_BACKENDS:
+        try:
+            set_json_backend(backend_name)
+        except ImportError:
+            print("{:<22} not installed".format(backend_name))
+            continue
+        backend_time = time_reads(read_json_file, filepaths, repetitions)
+        print("{:<22} {:>8.3f} s  x{:.2f}".format(
+            backend_name, backend_time, baseline_time / backend_time))
+    set_json_backend(default_backend)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
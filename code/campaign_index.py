@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# command line access to the results and validations index
+# ---------------------------------------------------------------------.
+
+# external modules imports
+import getopt
+import sys
+# internal modules imports
+from utils.constants import (
+    MEASUREMENTS_CAMPAIGNS_PATH,
+    RESULTS_CAMPAIGNS_PATH,
+    GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH
+)
+from utils.results_index import ResultsIndex
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  campaign_index.py -b [path]
+        campaign_index.py -l
+        campaign_index.py -m campaign [-o csv_filepath]
+        campaign_index.py -r campaign [-o csv_filepath]
+        campaign_index.py -v campaign [-o csv_filepath]
+        campaign_index.py -q "SQL query" [-o csv_filepath]
+
+Commands:
+    --build         -b  Index every measurement, results and validation file
+                        below path. Without path the measurements, results
+                        and ground truth validations campaigns directories
+                        are indexed.
+    --list          -l  List the campaigns indexed and their number of files.
+    --measurements  -m  campaign
+                        Measurements of a campaign: ID, target, address
+                        family, probes set, number of probes and of RTTs,
+                        RTT percentiles and file size.
+    --results       -r  campaign
+                        Results of a campaign.
+    --validations   -v  campaign
+                        Ground truth validations of a campaign.
+    --query         -q  "SQL query"
+                        Run a query over the tables results and validations.
+
+Options:
+    --output        -o  csv_filepath
+                        Save the rows in a CSV instead of printing them.
+    """)
+    sys.exit(0)
+
+
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv) or len(argv) == 0:
+        print_help_text()
+
+    try:
+        options, args = getopt.getopt(argv, "blm:r:v:q:o:",
+                                      ["build", "list", "measurements=",
+                                       "results=",
+                                       "validations=", "query=", "output="])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    results_index = ResultsIndex()
+    output_filepath = None
+    rows_df = None
+    for option, arg in options:
+        if option in ("-o", "--output"):
+            output_filepath = arg
+
+    for option, arg in options:
+        if option in ("-b", "--build"):
+            paths = args if args else [MEASUREMENTS_CAMPAIGNS_PATH,
+                                       RESULTS_CAMPAIGNS_PATH,
+                                       GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH]
+            for path in paths:
+                print("Files indexed in {}: {}".format(
+                    path, results_index.index_directory(path)))
+        elif option in ("-l", "--list"):
+            rows_df = results_index.campaigns()
+        elif option in ("-m", "--measurements"):
+            rows_df = results_index.query_measurements(campaign=arg)
+        elif option in ("-r", "--results"):
+            rows_df = results_index.query_results(campaign=arg)
+        elif option in ("-v", "--validations"):
+            rows_df = results_index.query_validations(campaign=arg)
+        elif option in ("-q", "--query"):
+            rows_df = results_index.query(arg)
+
+    if rows_df is not None:
+        if output_filepath:
+            rows_df.to_csv(output_filepath, sep=",", index=False)
+        else:
+            print(rows_df.to_string(index=False))
+    results_index.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 # external modules imports
+import os
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -12,10 +13,15 @@ from utils.constants import (
     METRICS_CSV_PATH
 )
 from utils.common_functions import (
-    json_file_to_dict,
     dict_to_json_file,
     get_list_files_in_path
 )
+from utils.campaign_sink import (
+    list_output_files,
+    read_output_file
+)
+from utils.results_index import get_results_index
+from utils.statistics_aggregator import aggregate_json_files
 
 
 def plot_campaign_statistics_comparison(validations_df: pd.DataFrame,
@@ -92,45 +98,29 @@ def compare_campaign_statistics(campaign_name: str,
                                 parameter: str,
                                 specification=""):
     if specification != "":
-        campaign_filepath = GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH + \
-                            "{}_{}_{}/".format(campaign_name,
+        campaign_directory = "{}_{}_{}".format(campaign_name,
                                                parameter,
                                                specification)
     else:
-        campaign_filepath = GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH + \
-                            "{}_{}/".format(campaign_name, parameter)
-    try:
-        validations_list = get_list_files_in_path(campaign_filepath)
-    except Exception as e:
-        print(e)
-        return
+        campaign_directory = "{}_{}".format(campaign_name, parameter)
+    campaign_filepath = GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH + \
+                        campaign_directory + "/"
 
-    validations_df = pd.DataFrame(columns=[
-        "target", "probes_filename",
-        "alpha", "threshold", "noise",
-        "accuracy", "precision", "recall", "f1",
-        "TP", "FP", "TN", "FN"
-    ])
-    for validation_file in validations_list:
-        data = json_file_to_dict(campaign_filepath + validation_file)
-        validations_df = pd.concat(
-            [pd.DataFrame([[
-                data["target"],
-                data["probes_filepath"].split("/")[-1][:-5],
-                data["alpha"],
-                data["threshold"],
-                data["noise"],
-                data["statistics"]["accuracy"],
-                data["statistics"]["precision"],
-                data["statistics"]["recall"],
-                data["statistics"]["f1"],
-                data["statistics"]["TP"],
-                data["statistics"]["FP"],
-                data["statistics"]["TN"],
-                data["statistics"]["FN"]
-            ]], columns=validations_df.columns),
-                validations_df],
-            ignore_index=True)
+    results_index = get_results_index()
+    results_index.sync_campaign("validations", campaign_directory)
+    validations_df = results_index.query(
+        'SELECT target, probes_filepath AS probes_filename, '
+        'alpha, threshold, noise, accuracy, precision, recall, f1, '
+        'TP, FP, TN, FN FROM validations WHERE campaign = ?',
+        (campaign_directory,), keep_types=True)
+    if validations_df.empty:
+        validations_df = read_campaign_validations(campaign_filepath,
+                                                   campaign_directory)
+        if validations_df is None:
+            return
+    else:
+        validations_df["probes_filename"] = validations_df[
+            "probes_filename"].str.split("/").str[-1].str[:-5]
     validations_df.sort_values(by=["probes_filename", parameter], inplace=True)
     if specification != "":
         validations_df.to_csv(
@@ -150,6 +140,48 @@ def compare_campaign_statistics(campaign_name: str,
     #                                    parameter)
 
 
+def read_campaign_validations(campaign_filepath: str,
+                              campaign_name: str = None) -> pd.DataFrame:
+    """
+    Validations of the campaign directory, files of their own or in the
+    sink of campaign_name
+    """
+    validations_filepaths = list_output_files(campaign_filepath,
+                                              campaign_name)
+    if not validations_filepaths and not os.path.isdir(campaign_filepath):
+        print("No validations in {}".format(campaign_filepath))
+        return None
+
+    def build_row(validation_filepath: str, data: dict) -> list:
+        return [
+            data["target"],
+            data["probes_filepath"].split("/")[-1][:-5],
+            data["alpha"],
+            data["threshold"],
+            data["noise"],
+            data["statistics"]["accuracy"],
+            data["statistics"]["precision"],
+            data["statistics"]["recall"],
+            data["statistics"]["f1"],
+            data["statistics"]["TP"],
+            data["statistics"]["FP"],
+            data["statistics"]["TN"],
+            data["statistics"]["FN"]
+        ]
+
+    return aggregate_json_files(
+        filepaths=validations_filepaths,
+        columns=[
+            "target", "probes_filename",
+            "alpha", "threshold", "noise",
+            "accuracy", "precision", "recall", "f1",
+            "TP", "FP", "TN", "FN"
+        ],
+        build_row=build_row,
+        read_file=lambda filepath: read_output_file(filepath,
+                                                    campaign_name))
+
+
 def do_campaign():
     root_campaign_name = "North-Central_20230410"
     root_servers_ip_directions = [
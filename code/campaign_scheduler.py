@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# submits and follows all the measurements of a campaign at once
+# ---------------------------------------------------------------------.
+
+# external modules imports
+import asyncio
+import getopt
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+# internal modules imports
+from utils.constants import (
+    MEASUREMENTS_CAMPAIGNS_PATH,
+    CAMPAIGN_SCHEDULER_STATE_PATH,
+    CAMPAIGN_MAX_MEASUREMENTS_IN_FLIGHT,
+    CAMPAIGN_SUBMISSIONS_PER_MINUTE,
+    CAMPAIGN_ANALYSIS_WORKERS,
+    CAMPAIGN_BATCH_SUBMISSIONS,
+    CAMPAIGN_DEFINITIONS_PER_SUBMISSION,
+    PROBES_SETS_PATH
+)
+from utils.common_functions import json_file_to_dict
+from utils.custom_exceptions import (
+    FieldsQueryError,
+    InternalError,
+    MeasurementAccessError,
+    MeasurementNotFound,
+    RequestSubmissionError,
+    ResultError
+)
+from utils.atlas_client import AtlasClient
+from utils.campaign_journal import get_campaign_journal
+from utils.http_client import http_statistics
+from measurement import Measurement
+import RIPEAtlas
+
+# Progress of a scheduled measurement
+JOB_PENDING = "pending"
+JOB_SUBMITTED = "submitted"
+JOB_SAVED = "saved"
+JOB_ANALYZED = "analyzed"
+JOB_FAILED = "failed"
+# Kind of the measurements in the campaign journal
+JOURNAL_MEASUREMENT = "measurement"
+# Errors failing the jobs of a measurement, the rest of the campaign goes
+# on. KeyError and ValueError come from answers not shaped as expected.
+JOB_ERRORS = (httpx.HTTPError, InternalError, ResultError, FieldsQueryError,
+              MeasurementNotFound, MeasurementAccessError,
+              RequestSubmissionError, KeyError, ValueError)
+
+
+def get_campaign_jobs(campaign_name: str) -> dict:
+    """Measurements of the campaign in its journal, {job_key: job}"""
+    journal = get_campaign_journal(campaign_name)
+    jobs = journal.get_units(JOURNAL_MEASUREMENT)
+    state_filepath = "{}{}.json".format(CAMPAIGN_SCHEDULER_STATE_PATH,
+                                        campaign_name)
+    if not jobs and os.path.exists(state_filepath):
+        # Campaign started before the journal
+        jobs = json_file_to_dict(state_filepath)
+        journal.record_many(JOURNAL_MEASUREMENT, jobs)
+    return jobs
+
+
+class CampaignScheduler:
+    """
+    Submits every (target, probes set) measurement of a campaign up front,
+    limited to a number of submissions per minute and of measurements in
+    flight, and waits for all of them at the same time. The targets sharing
+    a probes set are created with one request of several definitions. Each
+    measurement is saved as soon as its results are ready and then handed
+    to on_measurement_saved(measurement_filepath), which runs in a thread
+    pool while the rest of the campaign is still being polled. An analysis
+    raising an exception is reported and leaves its measurement saved, the
+    rest of the campaign goes on.
+
+    The progress is kept in the journal of the campaign, each change synced
+    to disk as it happens: running the same campaign again, even after the
+    previous run was killed, skips the measurements analyzed, analyzes the
+    saved ones and resumes waiting for the submitted ones by their ID
+    instead of creating them again.
+    """
+
+    def __init__(self, campaign_name: str, targets: list,
+                 probes_filepaths: list,
+                 on_measurement_saved=None,
+                 max_in_flight: int = CAMPAIGN_MAX_MEASUREMENTS_IN_FLIGHT,
+                 submissions_per_minute: float =
+                 CAMPAIGN_SUBMISSIONS_PER_MINUTE,
+                 analysis_workers: int = CAMPAIGN_ANALYSIS_WORKERS,
+                 percentage_required: float = 0.8,
+                 batch_submissions: bool = CAMPAIGN_BATCH_SUBMISSIONS,
+                 definitions_per_submission: int =
+                 CAMPAIGN_DEFINITIONS_PER_SUBMISSION,
+                 key: str = None,
+                 atlas_client: AtlasClient = None):
+        self._campaign_name = campaign_name
+        self._on_measurement_saved = on_measurement_saved
+        self._max_in_flight = max_in_flight
+        self._submission_interval = 60 / submissions_per_minute
+        self._analysis_workers = analysis_workers
+        self._percentage_required = percentage_required
+        self._batch_submissions = batch_submissions
+        self._definitions_per_submission = definitions_per_submission
+        self._key = key if key else RIPEAtlas.get_auth_key()
+        self._atlas_client = atlas_client
+        self._journal = get_campaign_journal(campaign_name)
+
+        self._jobs = self.load_state()
+        jobs_changed = {}
+        for job_key, job in self._jobs.items():
+            if job["status"] == JOB_FAILED:
+                # Try again from the start
+                job.update(status=JOB_PENDING, measurement_id=None)
+                jobs_changed[job_key] = job
+        for target in targets:
+            for probes_filepath in probes_filepaths:
+                job_key = "{}_{}".format(
+                    target, probes_filepath.split("/")[-1][:-5])
+                if job_key not in self._jobs:
+                    self._jobs[job_key] = jobs_changed[job_key] = {
+                        "target": target,
+                        "probes_filepath": probes_filepath,
+                        "status": JOB_PENDING,
+                        "measurement_id": None,
+                        "request_data": None,
+                        "measurement_filepath": None
+                    }
+        self.save_state(*jobs_changed.keys())
+        self._last_submission = 0
+        self._submission_lock = None
+        self._acquire_lock = None
+        self._executor = None
+
+    def load_state(self) -> dict:
+        return get_campaign_jobs(self._campaign_name)
+
+    def save_state(self, *job_keys) -> None:
+        """Records the jobs in the journal"""
+        if job_keys:
+            self._journal.record_many(JOURNAL_MEASUREMENT, {
+                job_key: self._jobs[job_key] for job_key in job_keys})
+
+    def get_jobs(self) -> dict:
+        return self._jobs
+
+    def run(self) -> dict:
+        """Runs the campaign until every measurement is saved or failed"""
+        asyncio.run(self._run())
+        return self._jobs
+
+    def get_batches(self) -> list:
+        """
+        Groups the jobs still running. With batched submissions the jobs
+        sharing a probes set are submitted together, one definition per
+        target, up to definitions_per_submission and max_in_flight.
+        """
+        jobs_running = [job_key for job_key, job in self._jobs.items()
+                        if job["status"] in (JOB_PENDING, JOB_SUBMITTED)]
+
+        if not self._batch_submissions:
+            return [[job_key] for job_key in jobs_running]
+
+        groups = {}
+        for job_key in jobs_running:
+            groups.setdefault(self._jobs[job_key]["probes_filepath"],
+                              []).append(job_key)
+        batch_size = min(self._definitions_per_submission,
+                         self._max_in_flight)
+        return [job_keys[i:i + batch_size]
+                for job_keys in groups.values()
+                for i in range(0, len(job_keys), batch_size)]
+
+    async def _run(self) -> None:
+        atlas_client = self._atlas_client or AtlasClient(key=self._key)
+        self._submission_lock = asyncio.Lock()
+        self._acquire_lock = asyncio.Lock()
+        in_flight = asyncio.Semaphore(self._max_in_flight)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._analysis_workers)
+        try:
+            await asyncio.gather(*[
+                self._run_batch(atlas_client, in_flight, job_keys)
+                for job_keys in self.get_batches()
+            ], *[
+                # Saved by a run stopped before their analysis ended
+                self._analyze_job(job_key)
+                for job_key, job in self._jobs.items()
+                if job["status"] == JOB_SAVED])
+        finally:
+            self._executor.shutdown(wait=True)
+            if self._atlas_client is None:
+                await atlas_client.close()
+
+    async def _run_batch(self, atlas_client: AtlasClient,
+                         in_flight: asyncio.Semaphore,
+                         job_keys: list) -> None:
+        # Every measurement of the batch takes its place in flight, taken
+        # all at once so batches waiting for places do not block each other
+        async with self._acquire_lock:
+            for _ in job_keys:
+                await in_flight.acquire()
+
+        pending = [job_key for job_key in job_keys
+                   if self._jobs[job_key]["status"] == JOB_PENDING]
+        if pending:
+            try:
+                await self._submit(atlas_client, pending)
+            except JOB_ERRORS as e:
+                for job_key in pending:
+                    self._fail_job(job_key, e)
+        await asyncio.gather(*[
+            self._follow_job(atlas_client, in_flight, job_key)
+            for job_key in job_keys])
+
+    async def _follow_job(self, atlas_client: AtlasClient,
+                          in_flight: asyncio.Semaphore,
+                          job_key: str) -> None:
+        job = self._jobs[job_key]
+        loop = asyncio.get_running_loop()
+        try:
+            if job["status"] != JOB_SUBMITTED:
+                return
+            results = await self._wait_results(atlas_client, job)
+        except JOB_ERRORS as e:
+            self._fail_job(job_key, e)
+            return
+        finally:
+            in_flight.release()
+
+        try:
+            job["measurement_filepath"] = await loop.run_in_executor(
+                self._executor, self._save_results, job, results)
+        except JOB_ERRORS as e:
+            self._fail_job(job_key, e)
+            return
+        job["status"] = JOB_SAVED
+        self.save_state(job_key)
+        print("Measurement {} saved in {}".format(
+            job_key, job["measurement_filepath"]))
+        await self._analyze_job(job_key)
+
+    async def _analyze_job(self, job_key: str) -> None:
+        if self._on_measurement_saved is None:
+            return
+        job = self._jobs[job_key]
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._on_measurement_saved,
+                job["measurement_filepath"])
+        except Exception:
+            # Saved, so the next run of the campaign analyzes it again
+            print("Analysis of measurement {} failed:".format(job_key))
+            traceback.print_exc()
+            return
+        job["status"] = JOB_ANALYZED
+        self.save_state(job_key)
+
+    def _fail_job(self, job_key: str, error: Exception) -> None:
+        print("Measurement {} failed: {} {}".format(
+            job_key, type(error).__name__, error))
+        self._jobs[job_key]["status"] = JOB_FAILED
+        self.save_state(job_key)
+
+    async def _submit(self, atlas_client: AtlasClient,
+                      job_keys: list) -> None:
+        """
+        Creates the measurements of the jobs, which share a probes set,
+        with a single request
+        """
+        jobs = [self._jobs[job_key] for job_key in job_keys]
+        loop = asyncio.get_running_loop()
+        # Building a mesh probes set may take a while, out of the loop
+        request_data = await loop.run_in_executor(
+            self._executor,
+            Measurement(jobs[0]["target"]).load_batch_data_request,
+            [job["target"] for job in jobs],
+            jobs[0]["probes_filepath"])
+
+        async with self._submission_lock:
+            wait = self._last_submission + self._submission_interval - \
+                time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_submission = time.monotonic()
+            measurements_ids = await atlas_client.create_measurement(
+                request_data)
+
+        # Each definition is a measurement of its own, saved in its own file
+        for job_key, job, definition, measurement_id in zip(
+                job_keys, jobs, request_data["definitions"],
+                measurements_ids):
+            job["request_data"] = {"definitions": [definition],
+                                   "probes": request_data["probes"]}
+            job["measurement_id"] = measurement_id
+            job["status"] = JOB_SUBMITTED
+            print("Measurement {} submitted with ID {}".format(
+                job_key, measurement_id))
+        self.save_state(*job_keys)
+
+    async def _wait_results(self, atlas_client: AtlasClient,
+                            job: dict) -> list:
+        measurement_id = job["measurement_id"]
+        meta = await atlas_client.get_measurement(measurement_id,
+                                                  "probes,status")
+        if meta["status"]["name"] == "Stopped":
+            # Finished while the scheduler was not running
+            return await atlas_client.get_results(measurement_id)
+
+        requested = sum(probes["requested"]
+                        for probes in job["request_data"]["probes"])
+        probes = await atlas_client.wait_probes_allocated(
+            measurement_id,
+            RIPEAtlas.fields_delay_base +
+            requested * RIPEAtlas.fields_delay_factor)
+        return await atlas_client.wait_results(
+            measurement_id, len(probes), self._percentage_required,
+            results_delay=RIPEAtlas.results_delay_base +
+            len(probes) * RIPEAtlas.results_delay_factor)
+
+    def _save_results(self, job: dict, results: list) -> str:
+        measure = Measurement(job["target"])
+        measure.load_submitted_measurement(
+            job["measurement_id"], job["request_data"],
+            job["probes_filepath"], key=self._key)
+        return measure.save_measurement_results(
+            results, measure.get_measurement_probes(), self._campaign_name)
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  campaign_scheduler.py -c campaign_name -p probes_files target ...
+
+Options:
+    --campaign      -c  campaign_name
+                        Measurements are saved in
+                        """ + MEASUREMENTS_CAMPAIGNS_PATH + """campaign_name.
+                        Running a campaign again resumes it.
+    --probes        -p  probes_files
+                        Comma separated probes sets files, relative to
+                        """ + PROBES_SETS_PATH + """ if not found.
+    --in-flight     -f  number
+                        Measurements running at the same time.
+    --rate          -r  number
+                        Measurements submitted per minute.
+    --single        -s  One definition per submission instead of grouping
+                        the targets that share a probes set.
+    """)
+    sys.exit(0)
+
+
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv) or len(argv) == 0:
+        print_help_text()
+
+    try:
+        options, targets = getopt.getopt(argv, "c:p:f:r:s",
+                                         ["campaign=", "probes=",
+                                          "in-flight=", "rate=", "single"])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    campaign_name = None
+    probes_filepaths = []
+    max_in_flight = CAMPAIGN_MAX_MEASUREMENTS_IN_FLIGHT
+    submissions_per_minute = CAMPAIGN_SUBMISSIONS_PER_MINUTE
+    batch_submissions = CAMPAIGN_BATCH_SUBMISSIONS
+    for option, arg in options:
+        if option in ("-c", "--campaign"):
+            campaign_name = arg
+        elif option in ("-p", "--probes"):
+            for probes_filepath in arg.split(","):
+                if not os.path.exists(probes_filepath):
+                    probes_filepath = PROBES_SETS_PATH + probes_filepath
+                probes_filepaths.append(probes_filepath)
+        elif option in ("-f", "--in-flight"):
+            max_in_flight = int(arg)
+        elif option in ("-r", "--rate"):
+            submissions_per_minute = float(arg)
+        elif option in ("-s", "--single"):
+            batch_submissions = False
+
+    if campaign_name is None or not probes_filepaths or not targets:
+        print("Campaign, probes sets and targets are required")
+        sys.exit(2)
+
+    jobs = CampaignScheduler(
+        campaign_name=campaign_name,
+        targets=targets,
+        probes_filepaths=probes_filepaths,
+        max_in_flight=max_in_flight,
+        submissions_per_minute=submissions_per_minute,
+        batch_submissions=batch_submissions).run()
+    for job_key, job in jobs.items():
+        print("{}: {}".format(job_key, job["status"]))
+    for endpoint, counters in http_statistics.get_summary().items():
+        print("{}: {} requests, {} retries, {} errors, mean latency "
+              "{:.3f} s".format(endpoint, counters["requests"],
+                                counters["retries"], counters["errors"],
+                                counters["mean_latency"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
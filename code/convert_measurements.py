@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# writes the columnar copy of the measurement files already saved
+# ---------------------------------------------------------------------.
+
+# external modules imports
+import getopt
+import os
+import sys
+# internal modules imports
+from utils.constants import MEASUREMENTS_PATH
+from utils.measurement_store import (
+    convert_measurement_file,
+    convert_measurements_directory
+)
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  convert_measurements.py [-f] [path ...]
+
+Writes a columnar .npz copy next to every measurement JSON file below each
+path (a directory or a file). Without path the whole measurements directory
+is converted. Copies up to date are skipped.
+
+Options:
+    --force         -f  Write the copies again even if they are up to date.
+    """)
+    sys.exit(0)
+
+
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv):
+        print_help_text()
+
+    try:
+        options, args = getopt.getopt(argv, "f", ["force"])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    force = False
+    for option, arg in options:
+        if option in ("-f", "--force"):
+            force = True
+
+    for path in args if args else [MEASUREMENTS_PATH]:
+        if os.path.isdir(path):
+            files_converted = convert_measurements_directory(path, force)
+        else:
+            files_converted = int(convert_measurement_file(path, force))
+        print("Files converted in {}: {}".format(path, files_converted))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
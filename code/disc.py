@@ -109,6 +109,9 @@ class Discs(object):
     def getDiscs(self):
         return self._setDisc
 
+    def __len__(self):
+        return sum(len(listDisc) for listDisc in self._setDisc.values())
+
     def removeDisc(self, disc):
         self._setDisc[disc[0].getRadius()].remove(disc)
 
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# writes the records of the campaign sinks as one file per analysis
+# ---------------------------------------------------------------------.
+
+# external modules imports
+import getopt
+import sys
+# internal modules imports
+from utils.constants import (
+    OUTPUT_FORMAT,
+    OUTPUT_FORMATS
+)
+from utils.campaign_sink import get_campaign_sink
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  export_campaign_sink.py [-f format] campaign [campaign ...]
+
+Writes every result and ground truth validation appended to the sink of
+each campaign to the file it would have had without the sink.
+
+Options:
+    --format        -f  format
+                        One of {}. Default {}.
+    """.format(", ".join(OUTPUT_FORMATS), OUTPUT_FORMAT))
+    sys.exit(0)
+
+
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv) or len(argv) == 0:
+        print_help_text()
+
+    try:
+        options, args = getopt.getopt(argv, "f:", ["format="])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    output_format = OUTPUT_FORMAT
+    for option, arg in options:
+        if option in ("-f", "--format"):
+            output_format = arg
+
+    for campaign_name in args:
+        print("Files exported from {}: {}".format(
+            campaign_name,
+            get_campaign_sink(campaign_name).export(output_format)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
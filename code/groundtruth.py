@@ -3,7 +3,6 @@
 
 # external modules imports
 import pandas as pd
-import ast
 from shapely import Polygon
 # internal modules imports
 from utils.constants import (
@@ -11,7 +10,12 @@ from utils.constants import (
     GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH,
     ALL_COUNTRIES_FILE_PATH,
     AREA_OF_INTEREST_FILEPATH,
-    NEAR_CITY_TP_KM
+    NEAR_CITY_TP_KM,
+    OUTPUT_FORMAT,
+    ROOT_SERVERS,
+    ROOT_SERVERS_PATH,
+    CLOUDFARE_IPS,
+    CLOUDFARE_PATH
 )
 from utils.common_functions import (
     json_file_to_dict,
@@ -19,13 +23,32 @@ from utils.common_functions import (
     distance,
     is_point_inside_area
 )
+from utils.groundtruth_repository import gt_repository
+from utils.results_index import index_validation_file
+from utils.campaign_sink import (
+    write_output_file,
+    read_output_file
+)
+
+
+def get_groundtruth_filepath(target: str) -> str:
+    """Ground truth of a root server or Cloudflare target, None for others"""
+    if target in ROOT_SERVERS.keys():
+        return ROOT_SERVERS_PATH + ROOT_SERVERS[target]
+    elif target in CLOUDFARE_IPS:
+        if "North-Central" in AREA_OF_INTEREST_FILEPATH:
+            return CLOUDFARE_PATH + "cloudfare_servers_europe.json"
+        else:
+            return CLOUDFARE_PATH + "cloudfare_servers_world.json"
+    return None
 
 
 def compare_cities_gt(results_filepath: str, gt_filepath: str,
                       campaign_name: str) -> str:
-    results_dict = json_file_to_dict(results_filepath)
+    results_dict = read_output_file(results_filepath, campaign_name)
+    gt_df = get_gt_instances_locations(gt_filepath)
     gt_instances_in_region_number = len(
-        gt_instances_in_region(gt_filepath).index)
+        gt_instances_in_region(gt_df).index)
 
     if len(results_dict["anycast_instances"]) == 0:
         comparison_result = {
@@ -57,12 +80,12 @@ def compare_cities_gt(results_filepath: str, gt_filepath: str,
                 GROUND_TRUTH_VALIDATIONS_PATH + \
                 "{}_{}.json".format(results_filename, gt_filename)
 
-        dict_to_json_file(dict=comparison_result,
-                          file_path=gt_validation_filepath)
+        write_output_file(comparison_result, gt_validation_filepath,
+                          campaign_name)
+        index_validation_file(gt_validation_filepath, comparison_result)
         return gt_validation_filepath
 
-    results_df = get_results_instances_locations(results_filepath)
-    gt_df = get_gt_instances_locations(gt_filepath)
+    results_df = get_instances_locations(results_dict["anycast_instances"])
 
     # Check for every city TP or FP
     results_df["type"] = results_df.apply(
@@ -80,8 +103,7 @@ def compare_cities_gt(results_filepath: str, gt_filepath: str,
     instances_validated.sort_values(by=["country_code", "city"], inplace=True)
 
     if "section" in results_dict["probes_filepath"]:
-        area = ast.literal_eval(
-            json_file_to_dict(results_dict["probes_filepath"])["area"])
+        area = gt_repository.get_probes_area(results_dict["probes_filepath"])
         instances_validated = filter_replicas_by_area(
             instances_validated, area)
     else:
@@ -113,58 +135,38 @@ def compare_cities_gt(results_filepath: str, gt_filepath: str,
     else:
         gt_validation_filepath = GROUND_TRUTH_VALIDATIONS_PATH + "{}_{}.json".\
             format(results_filename, gt_filename)
-    dict_to_json_file(dict=comparison_result,
-                      file_path=gt_validation_filepath)
+    write_output_file(comparison_result, gt_validation_filepath,
+                      campaign_name)
+    index_validation_file(gt_validation_filepath, comparison_result)
 
     return gt_validation_filepath
 
 
-def filter_replicas_by_area(replicas_validated: pd.DataFrame,
-                            area: tuple) -> pd.DataFrame:
-    def test_type_and_inside(validation: str,
-                             point: tuple) -> str:
-        if not is_point_inside_area(point, area):
-            if validation == "TP":
-                return "OT"
-            elif validation == "FP":
-                return "OF"
-            elif validation == "FN":
-                return "DELETE"
-            else:
-                return validation
-        else:
-            return validation
+# Validation type of a replica located outside the area of interest
+OUTSIDE_AREA_TYPES = {"TP": "OT", "FP": "OF", "FN": "DELETE"}
 
-    replicas_validated["type"] = replicas_validated.apply(
-        lambda x:
-        test_type_and_inside(validation=x.type,
-                             point=(x.longitude, x.latitude)),
-        axis=1)
-    replicas_validated = replicas_validated[
-        replicas_validated["type"] != "DELETE"]
 
-    return replicas_validated
+def filter_replicas_by_area(replicas_validated: pd.DataFrame,
+                            area: tuple) -> pd.DataFrame:
+    inside_area = is_point_inside_area(
+        point=(replicas_validated["longitude"],
+               replicas_validated["latitude"]),
+        area=area)
+    return relabel_replicas_outside_area(replicas_validated, inside_area)
 
 
 def filter_replicas_by_country_codes(replicas_validated: pd.DataFrame,
                                      codes_set: set) -> pd.DataFrame:
-    def test_type_and_inside(validation: str,
-                             country_code: str) -> str:
-        if country_code not in codes_set:
-            if validation == "TP":
-                return "OT"
-            elif validation == "FP":
-                return "OF"
-            elif validation == "FN":
-                return "DELETE"
-        else:
-            return validation
+    inside_area = replicas_validated["country_code"].isin(codes_set)
+    return relabel_replicas_outside_area(replicas_validated, inside_area)
 
-    replicas_validated["type"] = replicas_validated.apply(
-        lambda x:
-        test_type_and_inside(validation=x.type,
-                             country_code=x.country_code),
-        axis=1)
+
+def relabel_replicas_outside_area(replicas_validated: pd.DataFrame,
+                                  inside_area: pd.Series) -> pd.DataFrame:
+    outside_type = replicas_validated["type"].map(OUTSIDE_AREA_TYPES)
+    relabel = ~inside_area & outside_type.notna()
+    replicas_validated["type"] = replicas_validated["type"].where(
+        ~relabel, outside_type)
     replicas_validated = replicas_validated[
         replicas_validated["type"] != "DELETE"]
 
@@ -274,7 +276,8 @@ def compare_countries_gt(results_filepath: str, gt_filepath: str) -> None:
     gt_filename = gt_filepath.split("/")[-1][:-5]
     dict_to_json_file(dict=comparison_result,
                       file_path=GROUND_TRUTH_VALIDATIONS_PATH + "{}_{}.json"
-                      .format(results_filename, gt_filename))
+                      .format(results_filename, gt_filename),
+                      output_format=OUTPUT_FORMAT)
 
 
 def calculate_performance_statistics_cities(validation: pd.DataFrame) -> dict:
@@ -325,15 +328,15 @@ def calculate_performance_statistics_cities(validation: pd.DataFrame) -> dict:
 
 
 def get_alpha2_country_codes(filename: str) -> set:
-    country_codes = set()
-    countries_list = json_file_to_dict(filename)
-    for country in countries_list:
-        country_codes.add(country["alpha-2"])
-    return country_codes
+    return gt_repository.get_alpha2_country_codes(filename)
 
 
 def get_results_instances_locations(filepath: str) -> pd.DataFrame:
-    anycast_instances = json_file_to_dict(filepath)["anycast_instances"]
+    return get_instances_locations(
+        json_file_to_dict(filepath)["anycast_instances"])
+
+
+def get_instances_locations(anycast_instances: list) -> pd.DataFrame:
     markers = []
     for instance in anycast_instances:
         markers.append(instance["marker"])
@@ -346,41 +349,7 @@ def get_results_instances_locations(filepath: str) -> pd.DataFrame:
 
 
 def get_gt_instances_locations(filepath: str) -> pd.DataFrame:
-    if "root" in filepath:
-        return get_root_servers_instances_locations(filepath)
-    elif "cloudfare" in filepath:
-        return get_cloudfare_servers_instances_locations(filepath)
-    else:
-        raise Exception("Sorry, gt file pattern not recognized")
-
-
-def get_root_servers_instances_locations(filepath: str) -> pd.DataFrame:
-    df = pd.DataFrame(json_file_to_dict(filepath)["Sites"])
-    df = df[["Country", "Town", "Latitude", "Longitude"]]
-    df.drop_duplicates(subset=['Town'], inplace=True)
-    df.rename(
-        columns={
-            "Country": "country_code",
-            "Town": "city",
-            "Latitude": "latitude",
-            "Longitude": "longitude"},
-        inplace=True)
-    df["type"] = "gt_instance"
-
-    return df
-
-
-def get_cloudfare_servers_instances_locations(filepath: str) -> pd.DataFrame:
-    df = pd.DataFrame(json_file_to_dict(filepath))
-    df = df[["country_code", "city_name", "latitude", "longitude"]]
-    df.drop_duplicates(subset=['city_name'], inplace=True)
-    df.rename(
-        columns={
-            "city_name": "city"},
-        inplace=True)
-    df["type"] = "gt_instance"
-
-    return df
+    return gt_repository.get_gt_instances_locations(filepath)
 
 
 def get_countries_set_from_root_servers(filepath: str) -> set:
@@ -401,25 +370,16 @@ def get_countries_set_from_results(filepath: str) -> set:
     return result_set
 
 
-def gt_instances_in_region(gt_filepath: str) -> pd.DataFrame:
-    gt_instances_df = get_gt_instances_locations(gt_filepath)
-    if "North-Central" in AREA_OF_INTEREST_FILEPATH:
-        area = {
-                "longitude_min": -30,
-                "latitude_min": 30,
-                "longitude_max": 45,
-                "latitude_max": 90
-        }
+def gt_instances_in_region(gt_instances_df: pd.DataFrame) -> pd.DataFrame:
+    area = gt_repository.get_area_of_countries_file(AREA_OF_INTEREST_FILEPATH)
+    if "bounding_box" in area:
+        in_region = is_point_inside_area(
+            point=(gt_instances_df["longitude"], gt_instances_df["latitude"]),
+            area=area["bounding_box"])
     else:
-        raise Exception("Sorry, area not recognized")
-
-    gt_instances_df = gt_instances_df[
-        (gt_instances_df.latitude >= area["latitude_min"]) &
-        (gt_instances_df.latitude <= area["latitude_max"]) &
-        (gt_instances_df.longitude >= area["longitude_min"]) &
-        (gt_instances_df.longitude <= area["longitude_max"])]
+        in_region = gt_instances_df["country_code"].isin(area["countries"])
 
-    return gt_instances_df
+    return gt_instances_df[in_region]
 
 
 def print_city_gt_definitions():
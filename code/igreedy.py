@@ -17,13 +17,17 @@ from utils.constants import (
     RESULTS_PATH,
     RESULTS_CAMPAIGNS_PATH,
     ASCIIART,
-    DISTANCE_FUNCTION_USED
+    DISTANCE_FUNCTION_USED,
+    ANALYSIS_CACHE_ENABLED
 )
-from utils.common_functions import (
-    json_file_to_dict,
-    dict_to_json_file
+from utils.campaign_sink import write_output_file
+from utils.analysis_cache import AnalysisCache
+from utils.measurement_store import load_measurement_columns
+from utils.results_index import index_results_file
+from anycast import (
+    Anycast,
+    OnlineAnycast
 )
-from anycast import Anycast
 from measurement import Measurement
 from disc import *
 from groundtruth import compare_cities_gt
@@ -56,11 +60,15 @@ output_file = "output"
 results_filename = ""
 gt_file = None
 campaign_name = None
+online_stable_updates = None
+force_analysis = False
 alpha = 1  # advised settings
 visualize = False
 noise = 0  # exponential additive noise, only for sensitivity analysis
 
 numberOfInstance = 0
+anycast_instances = []
+num_latency_measurements = 0
 truePositive = 0
 falsePositive = 0
 load_time = 0
@@ -146,72 +154,56 @@ def analyze():
     """Routine to iteratively enumerate and geolocate anycast instances"""
 
     global input_file, gt_file, IATA_file
-    global alpha, visualize, noise, threshold
-    global numberOfInstance, discsSolution
+    global alpha, visualize, noise, threshold, force_analysis
+    global numberOfInstance, anycast_instances
+
+    # The noise draws are not reproducible, so they are never cached
+    use_cache = ANALYSIS_CACHE_ENABLED and noise == 0
+    if use_cache:
+        analysis_cache = AnalysisCache()
+        key = analysis_cache.get_key(input_file, IATA_file, alpha,
+                                     threshold, noise)
+        analysis = None if force_analysis else analysis_cache.get(key)
+        if analysis is not None:
+            print("Analysis found in the cache")
+            numberOfInstance = analysis["num_anycast_instances"]
+            anycast_instances = analysis["anycast_instances"]
+            return
 
     anycast = Anycast(input_file, IATA_file, alpha, noise, threshold)
+    numberOfInstance, discsSolution = anycast.enumerate_and_geolocate()
+    anycast_instances = get_anycast_instances(discsSolution)
+    if use_cache:
+        analysis_cache.put(key, {
+            "num_anycast_instances": numberOfInstance,
+            "anycast_instances": anycast_instances})
 
-    radiusGeolocated = 0.1
-    treshold = 0  # tolerance, airport out of the disc
-    iteration = True
-    discsSolution = []
-
-    numberOfInstance = 0
-    while iteration:
-
-        iteration = False
-        resultEnumeration = anycast.enumeration()
 
-        numberOfInstance += resultEnumeration[0]
-        if numberOfInstance <= 1:
-            print("No anycast instance detected")
-            return
-
-        for radius, discList in resultEnumeration[1].getOrderedDisc().items():
-            for disc in discList:
-                # if the disc was not geolocated before, geolocate it!
-                if not disc[1]:
-                    # used for the csv output
-                    # append the disc to the results
-                    # discs.append(disc[0])
-
-                    # remove old disc from MIS of disc
-                    # MIS = Maximum Independent Set
-                    resultEnumeration[1].removeDisc(disc)
-
-                    # result geolocation with the statistics of airports
-                    city = anycast.geolocation(disc[0], treshold)
-
-                    # if there is a city inside the disc
-                    if city is not False:
-                        # geolocated one disc, re-run enumeration!
-                        iteration = True
-                        # save for the results the city. Used for .csv output
-                        # markers.append(newDisc)
-
-                        discsSolution.append((disc[0], city))
-                        # insert the new disc in the MIS
-                        resultEnumeration[1].add(
-                            Disc("Geolocated",
-                                 float(city[1]),
-                                 float(city[2]),
-                                 radiusGeolocated),
-                            True)
-
-                        break  # exit for rerun MIS
-                    else:
-                        # insert the old disc in the MIS
-                        resultEnumeration[1].add(disc[0], True)
-                        # disc, marker
-                        discsSolution.append((disc[0], [
-                            "NoCity",
-                            disc[0].getLatitude(),
-                            disc[0].getLongitude(),
-                            "N/A",
-                            "N/A"]))
-
-            if iteration:
-                break
+def get_anycast_instances(discsSolution) -> list:
+    """Circle and marker of every instance found, as saved in results"""
+    anycast_instances = []
+    for instance in discsSolution:
+        # circle
+        tempCircle = instance[0]
+        circle = dict()
+        circle["id"] = tempCircle.getHostname()
+        circle["latitude"] = tempCircle.getLatitude()
+        circle["longitude"] = tempCircle.getLongitude()
+        circle["radius"] = tempCircle.getRadius()
+        # marker
+        tempMarker = instance[1]
+        marker = dict()
+        marker["id"] = tempMarker[0]
+        marker["latitude"] = tempMarker[1]
+        marker["longitude"] = tempMarker[2]
+        marker["city"] = tempMarker[3]
+        marker["country_code"] = tempMarker[4]
+        # union of circle and marker
+        markCircle = dict()
+        markCircle["marker"] = marker
+        markCircle["circle"] = circle
+        anycast_instances.append(markCircle)
+    return anycast_instances
 
 
 def output() -> bool:
@@ -225,7 +217,7 @@ def output() -> bool:
     global ip, probes_file
     global alpha, noise, threshold
 
-    global numberOfInstance
+    global numberOfInstance, anycast_instances, num_latency_measurements
     global GT, PAI, IATAlat, IATAlon, IATAcity, GTnum, PAInum
 
     # Format of result file if no name is provided
@@ -241,8 +233,8 @@ def output() -> bool:
     else:
         results_filename = output_file
 
-    print("Number latency measurements: {}".format(len(
-        json_file_to_dict(input_file)["measurement_results"])))
+    print("Number latency measurements: {}".format(
+        num_latency_measurements))
     print("Elapsed time (load+igreedy): %.2f (%.2f + %.2f)" % (
         load_time + run_time, load_time, run_time))
     print("Instances: ", str(numberOfInstance))
@@ -258,30 +250,10 @@ def output() -> bool:
     data["noise"] = noise
     data["ping_radius_function"] = DISTANCE_FUNCTION_USED
     data["num_anycast_instances"] = numberOfInstance
-    data["anycast_instances"] = []
-    for instance in discsSolution:
-        # circle
-        tempCircle = instance[0]
-        circle = dict()
-        circle["id"] = tempCircle.getHostname()
-        circle["latitude"] = tempCircle.getLatitude()
-        circle["longitude"] = tempCircle.getLongitude()
-        circle["radius"] = tempCircle.getRadius()
-        # marker
-        tempMarker = instance[1]
-        marker = dict()
-        marker["id"] = tempMarker[0]
-        marker["latitude"] = tempMarker[1]
-        marker["longitude"] = tempMarker[2]
-        marker["city"] = tempMarker[3]
-        marker["country_code"] = tempMarker[4]
-        # union of circle and marker
-        markCircle = dict()
-        markCircle["marker"] = marker
-        markCircle["circle"] = circle
-        data["anycast_instances"].append(markCircle)
+    data["anycast_instances"] = anycast_instances
 
-    dict_to_json_file(data, results_filename)
+    write_output_file(data, results_filename, campaign_name)
+    index_results_file(results_filename, data)
     if len(data["anycast_instances"]) == 0:
         return False
     else:
@@ -313,6 +285,13 @@ Parameters:
                                 Filepath of the JSON document which contains 
                                 the specification of the probes to use in the 
                                 measurement (default "{}")
+    --online        -e  stable_updates
+                                Analyze the results while the measurement is
+                                running, printing when the target is detected
+                                as anycast and its instances. The measurement
+                                is stopped when the number of instances does
+                                not change for stable_updates results updates,
+                                0 never stops it.
     --results       -r  boolean
                                 Use it when you want that iGreedy automatically 
                                 calculate the results based on the measurement 
@@ -342,6 +321,8 @@ iGreedy Options:
                                 of the campaign not the path. The campaign 
                                 directory must be created.
     --visualize     -v          Visualize the results.
+    --force         -f          Analyze the measurement even if the same
+                                analysis is in the cache, and replace it.
     
 Hunter Options:
     --origin        -s  "(latitude,longitude)"
@@ -373,11 +354,11 @@ def main(argv):
 
     # Variables needed to make the measurement and analysis
     global input_file, probes_file, gt_file, output_path, output_file
-    global campaign_name
+    global campaign_name, online_stable_updates, force_analysis
     global ip, hunter_target, hunter_origin, check_cf_ray, validate_last_hop
     global validate_hunter_target
     global threshold, alpha, visualize, noise
-    global load_time, run_time
+    global load_time, run_time, num_latency_measurements
 
     maker_time = time.time()
 
@@ -386,14 +367,15 @@ def main(argv):
     # These sections parse the options selected and their values
     try:
         options, args = getopt.getopt(argv,
-                                      "i:m:p:r:w:s:y:l:k:a:t:n:o:c:g:v",
+                                      "i:m:p:r:e:w:s:y:l:k:a:t:n:o:c:g:vf",
                                       ["input",
                                        "measurement", "probes", "results",
+                                       "online=",
                                        "hunter", "origin", "check_cf_ray",
                                        "val_last_hop", "val_target",
                                        "alpha", "threshold", "noise",
                                        "output", "campaign", "groundtruth",
-                                       "visualize"])
+                                       "visualize", "force"])
     except getopt.GetoptError as e:
         print(e)
         sys.exit(2)
@@ -434,6 +416,9 @@ def main(argv):
                       "Try with True or False")
                 sys.exit(2)
 
+        elif option in ("-e", "--online"):
+            online_stable_updates = int(arg)
+
         # Hunter option
         elif option in ("-w", "--hunter"):
             hunter_target = arg
@@ -499,6 +484,9 @@ def main(argv):
             else:
                 gt_file = arg
 
+        if option in ("-f", "--force"):
+            force_analysis = True
+
         if option in ("-v", "--visualize"):
             visualize = True
             try:
@@ -524,8 +512,17 @@ def main(argv):
         print("Probes data from: ", probes_file)
         measure = Measurement(ip)
         ripe_probes_geo = measure.doMeasure(probes_file)
+        online_anycast = None
+        if online_stable_updates is not None:
+            online_anycast = OnlineAnycast(
+                IATA_file, alpha, noise, threshold,
+                stable_updates=online_stable_updates,
+                on_detection=lambda anycast: print(
+                    "Anycast detected, two disjoint discs found"),
+                on_update=lambda instances, discs: print(
+                    "Anycast instances so far: {}".format(instances)))
         numLatencyMeasurement, input_file = measure.retrieveResult(
-            ripe_probes_geo, campaign_name)
+            ripe_probes_geo, campaign_name, online_anycast)
         if numLatencyMeasurement < 2:
             print("Error: for the anycast detection at least 2 latency "
                   "measurement are needed")
@@ -535,7 +532,8 @@ def main(argv):
     load_time = time.time() - maker_time
     maker_time = time.time()
     if analyze_measurement:
-        measurement_data = json_file_to_dict(input_file)
+        measurement_data, columns = load_measurement_columns(input_file)
+        num_latency_measurements = len(columns["hostname"])
         probes_file = measurement_data["probes_filepath"]
         ip = measurement_data["target"]
         analyze()
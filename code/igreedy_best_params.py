@@ -1,53 +1,157 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import getopt
+import os
+import sys
+import numpy as np
 import pandas as pd
 from statistics import mean
 
 from utils.constants import (
     GT_VALIDATIONS_STATISTICS,
     CLOUDFARE_IPS,
-    ROOT_SERVERS
+    ROOT_SERVERS,
+    DISTANCE_FUNCTION_USED,
+    PIPELINES_PATH
 )
-
-
-def first_try():
-    igreedy_statistics_df = pd.read_csv(
-        GT_VALIDATIONS_STATISTICS +
-        "statistics_North-Central_validation_20230410.csv")
+from utils.common_functions import json_file_to_dict
+from utils.results_index import get_results_index
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  igreedy_best_params.py -s campaign[,campaign...] [-m metric] [-t]
+        igreedy_best_params.py -c config [-m metric] [-t]
+
+Options:
+    --statistics    -s  campaign[,campaign...]
+                        Ground truth validation campaigns compared, as
+                        named by validate_igreedy or the pipeline.
+    --config        -c  config
+                        Pipeline config file, relative to """ +
+          PIPELINES_PATH + """
+                        if not found. Its validation campaign,
+                        campaign_name_""" + DISTANCE_FUNCTION_USED + """, is
+                        compared.
+    --metric        -m  metric
+                        Metric the parameters combinations are ranked by.
+                        Default Precision.
+    --by-target     -t  Also save the optimal parameters of every target.
+    """)
+    sys.exit(0)
+
+
+def load_igreedy_statistics(campaigns: list) -> pd.DataFrame:
+    """
+    Statistics of the validation campaigns from the results index, or from
+    the statistics CSV built by statistics_igreedy for the campaigns not
+    indexed
+    """
+    results_index = get_results_index()
+    campaigns_statistics = []
+    for campaign in campaigns:
+        campaign_statistics_df = \
+            results_index.query_validations_statistics(campaign)
+        csv_filepath = "{}statistics_{}.csv".format(
+            GT_VALIDATIONS_STATISTICS, campaign)
+        if campaign_statistics_df.empty and os.path.exists(csv_filepath):
+            campaign_statistics_df = pd.read_csv(csv_filepath)
+        campaigns_statistics.append(campaign_statistics_df)
+    return pd.concat(campaigns_statistics,
+                     ignore_index=True).infer_objects()
+
+
+PARAMS_COLUMNS = ["probe_selection", "probe_set_number", "distance_function",
+                  "threshold", "alpha"]
+METRICS_COLUMNS = ["Precision", "Recall", "F1", "Accuracy"]
+
+
+def first_try(campaigns: list):
+    igreedy_statistics_df = load_igreedy_statistics(campaigns)
 
     # dataframe con los optimos de cada escenario
-    optimal_params_df = pd.DataFrame()
     target_list = CLOUDFARE_IPS + list(ROOT_SERVERS.keys())
+    optimal_params_df = igreedy_statistics_df[
+        igreedy_statistics_df["target"].isin(target_list)]
+
+    # Keep, target by target, the rows with the maximum of every metric
+    for metric in METRICS_COLUMNS:
+        optimal_params_df = optimal_params_df[
+            optimal_params_df[metric] == optimal_params_df.groupby(
+                "target")[metric].transform("max")]
+
+    # Last target of the list first, the order of the previous versions
+    target_order = optimal_params_df["target"].map(
+        {target: -position for position, target in enumerate(target_list)})
+    optimal_params_df = optimal_params_df.assign(
+        target_order=target_order).sort_values(
+        by=["target_order", "threshold", "alpha"], kind="stable").drop(
+        columns="target_order").reset_index(drop=True)
 
-    for target in target_list:
-        target_df = igreedy_statistics_df[
-            igreedy_statistics_df["target"] == target]
-        target_df = target_df[target_df["Precision"] == target_df["Precision"].max()]
-        target_df = target_df[target_df["Recall"] == target_df["Recall"].max()]
-        target_df = target_df[target_df["F1"] == target_df["F1"].max()]
-        target_df = target_df[target_df["Accuracy"] == target_df["Accuracy"].max()]
-        target_optimal = target_df
-        target_optimal.sort_values(by=["threshold", "alpha"], inplace=True)
-
-        optimal_params_df = pd.concat(
-            [target_optimal, optimal_params_df], ignore_index=True)
-
-    optimal_params_df.sort_values(by=["target", "threshold", "alpha"])
     optimal_params_df.to_csv(
         GT_VALIDATIONS_STATISTICS + "optimal_params_by_target.csv",
         sep=","
     )
 
 
-def try_with_params_combinations(result_to_max: str):
+def compute_error_matrices(igreedy_statistics_df: pd.DataFrame,
+                           target_list: list,
+                           metrics: list = METRICS_COLUMNS) -> dict:
+    """
+    Error of every parameters combination for every target, as the
+    difference with the best value the target reaches with any combination.
+    One pivot over all the metrics, returns {metric: error DataFrame} with
+    a row per parameters combination and a column per target.
+    """
+    results_matrix = igreedy_statistics_df.pivot_table(
+        index=PARAMS_COLUMNS, columns="target", values=metrics,
+        aggfunc="first")
+    targets_maximum = igreedy_statistics_df.groupby("target")[metrics].max()
+
+    error_matrices = {}
+    for metric in metrics:
+        metric_matrix = results_matrix[metric].reindex(columns=target_list)
+        error_matrices[metric] = \
+            targets_maximum[metric].reindex(target_list) - metric_matrix
+    return error_matrices
+
+
+def rank_parameters_combinations(error_matrix: pd.DataFrame,
+                                 combinations: list) -> pd.DataFrame:
+    """
+    Sum and average error of the combinations given as tuples of
+    PARAMS_COLUMNS values, ranked from the lowest error
+    """
+    combinations_index = pd.MultiIndex.from_tuples(
+        [(probe_selection, float(probe_set_number), distance_function,
+          float(threshold), float(alpha))
+         for probe_selection, probe_set_number, distance_function,
+         threshold, alpha in combinations],
+        names=PARAMS_COLUMNS)
+    combinations_error = error_matrix.reindex(combinations_index)
+
+    combinations_error_df = pd.DataFrame(
+        combinations, columns=PARAMS_COLUMNS, dtype=object)
+    # Python sum and mean over the short rows keep the exact rounding
+    rows_error = [row[~np.isnan(row)]
+                  for row in combinations_error.to_numpy(dtype=float)]
+    combinations_error_df.insert(0, "sum_error", [
+        sum(row) if len(row) else np.nan for row in rows_error])
+    combinations_error_df.insert(1, "avg_error", [
+        mean(row) if len(row) else np.nan for row in rows_error])
+    for target in error_matrix.columns:
+        combinations_error_df[target] = combinations_error[target].values
+
+    combinations_error_df.sort_values(
+        by=["sum_error", "avg_error"], inplace=True, ignore_index=True)
+    return combinations_error_df
+
+
+def try_with_params_combinations(campaigns: list, result_to_max: str):
 
-    igreedy_statistics_df = pd.read_csv(
-        GT_VALIDATIONS_STATISTICS +
-        "statistics_North-Central_validation_20230410.csv")
+    igreedy_statistics_df = load_igreedy_statistics(campaigns)
 
-    probe_selection_list = ["mesh", "area"]
-    probe_set_number_list = [1, 1.5, 2, 100, 300, 500, 1000]
     threshold_list = [-1, 0.5, 1, 5, 10, 20, 30]
     alpha_list = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
     distance_function_list = ["constant_1.52", "verloc_aprox"]
@@ -56,85 +160,75 @@ def try_with_params_combinations(result_to_max: str):
     target_list.sort()
     #target_list = ["104.16.123.96"]
 
-    df_colums = ["sum_error", "avg_error"] + ["probe_selection",
-                                              "probe_set_number",
-                                              "distance_function",
-                                              "threshold",
-                                              "alpha"] + target_list
-
-    combinations_error_df = pd.DataFrame(
-        columns=df_colums
-    )
-
-    target_max_list = []
-    for target in target_list:
-        max_precision_for_target = igreedy_statistics_df[
-            igreedy_statistics_df["target"] == target
-            ][result_to_max].max()
-        target_max_list.append(max_precision_for_target)
-
     probes_combinations = [
         ("mesh", 1), ("mesh", 1.5), ("mesh", 2),
         ("area", 100), ("area", 300), ("area", 500), ("area", 1000)
     ]
 
-    for distance_function in distance_function_list:
-        for threshold in threshold_list:
-            for alpha in alpha_list:
-                for probes_combination in probes_combinations:
-                    params = [
-                        probes_combination[0],
-                        probes_combination[1],
-                        distance_function,
-                        threshold,
-                        alpha
-                    ]
-                    print(params)
-
-                    result_for_params = get_list_of_result_for_params(
-                        params=params,
-                        df=igreedy_statistics_df,
-                        result_to_max=result_to_max
-                    )
-
-                    error_list = [maximum - result for maximum, result in
-                                  zip(target_max_list, result_for_params)]
-
-                    avg_error = mean(error_list)
-                    sum_error = sum(error_list)
-
-                    list_to_concat = [sum_error, avg_error
-                                      ] + params + error_list
-
-                    combinations_error_df = pd.concat([
-                        pd.DataFrame([list_to_concat],
-                                     columns=combinations_error_df.columns),
-                        combinations_error_df
-                    ], ignore_index=True)
+    # Reversed, the order the nested loops of previous versions left
+    combinations = [
+        (probes_combination[0], probes_combination[1],
+         distance_function, threshold, alpha)
+        for distance_function in distance_function_list
+        for threshold in threshold_list
+        for alpha in alpha_list
+        for probes_combination in probes_combinations][::-1]
+
+    error_matrix = compute_error_matrices(
+        igreedy_statistics_df, target_list, [result_to_max])[result_to_max]
+    combinations_error_df = rank_parameters_combinations(
+        error_matrix, combinations)
 
-    combinations_error_df.sort_values(
-        by=["sum_error", "avg_error"], inplace=True, ignore_index=True)
     combinations_error_df.to_csv(
         GT_VALIDATIONS_STATISTICS + "matrix_{}.csv".format(result_to_max),
         sep=",", index=False
     )
 
 
-def get_list_of_result_for_params(
-        params: list, df: pd.DataFrame, result_to_max: str) -> list:
-
-    target_combination_df = df.loc[
-        (df["probe_selection"] == params[0]) &
-        (df["probe_set_number"] == params[1]) &
-        (df["distance_function"] == params[2]) &
-        (df["threshold"] == params[3]) &
-        (df["alpha"] == params[4])
-    ]
-
-    result_for_combination = target_combination_df[result_to_max].values
-    return result_for_combination
-
-
-try_with_params_combinations(result_to_max="Precision")
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv) or len(argv) == 0:
+        print_help_text()
+
+    try:
+        options, args = getopt.getopt(argv, "s:c:m:t",
+                                      ["statistics=", "config=", "metric=",
+                                       "by-target"])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    campaigns = []
+    result_to_max = "Precision"
+    by_target = False
+    for option, arg in options:
+        if option in ("-s", "--statistics"):
+            campaigns += [campaign for campaign in arg.split(",")
+                          if campaign]
+        elif option in ("-c", "--config"):
+            config_filepath = arg
+            if not os.path.exists(config_filepath):
+                config_filepath = PIPELINES_PATH + config_filepath
+            campaigns.append("{}_{}".format(
+                json_file_to_dict(config_filepath)["campaign_name"],
+                DISTANCE_FUNCTION_USED))
+        elif option in ("-m", "--metric"):
+            result_to_max = arg
+        elif option in ("-t", "--by-target"):
+            by_target = True
+
+    if not campaigns:
+        print("A validation campaign or a config file is required")
+        sys.exit(2)
+    if result_to_max not in METRICS_COLUMNS:
+        print("Metric must be one of {}".format(", ".join(METRICS_COLUMNS)))
+        sys.exit(2)
+
+    try_with_params_combinations(campaigns, result_to_max)
+    if by_target:
+        first_try(campaigns)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
 
 
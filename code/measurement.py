@@ -6,23 +6,23 @@
 
 # external modules imports
 import json
+import math
 import random
 import sys
 import socket
-import requests
+import numpy as np
 from shapely.geometry import(
-    MultiPolygon,
     Polygon,
-    box,
-    shape,
-    GeometryCollection
+    box
 )
 import ast
 # internal modules imports
 from utils.constants import (
     MEASUREMENTS_PATH,
     MEASUREMENTS_CAMPAIGNS_PATH,
-    COUNTRY_BORDERS_GEOJSON_FILEPATH
+    MEASUREMENT_COLUMNAR_STORE,
+    OUTPUT_FORMAT,
+    MESH_PROBES_SELECTION_SEED
 )
 from utils.common_functions import (
     dict_to_json_file,
@@ -31,6 +31,11 @@ from utils.common_functions import (
     is_probe_inside_section,
     is_probe_usable
 )
+from utils.atlas_client import get_sync_atlas_client
+from utils.probe_catalogue import get_probe_catalogue
+from utils.country_borders import get_mesh_grid_with_countries
+from utils.measurement_store import save_measurement_columns
+from utils.results_index import index_measurement_file
 from visualize import (
     plot_multipolygon
 )
@@ -48,6 +53,7 @@ class Measurement(object):
         self._ripeProbes = ripe_probes
         self._mesh_area = None
         self._spacing = None
+        self._seed = MESH_PROBES_SELECTION_SEED
         self._numberOfPacket = 2 #to improve
         self._numberOfProbes = 5 #to improve, introduce as parameter, in alternative to the list of probes
         self._measurement = None
@@ -101,27 +107,38 @@ class Measurement(object):
         return (",".join(temp_list_probes),temp_information_probes) #building the list
 
     def load_data_request(self, probes_file):
+        return self.load_batch_data_request([self._ip], probes_file)
+
+    def load_batch_data_request(self, targets: list, probes_file: str):
+        """
+        One ping definition per target, all of them sharing the probes of
+        probes_file, so the measurements are created with one request
+        """
         data = {
             "definitions": [
-                {
-                    "target": self._ip,
-                    "description": "Ping %s" % self._ip,
-                    "type": "ping",
-                    "is_oneoff": True,
-                    "packets": self._numberOfPacket,
-                    "af": 4
-                }
+                self.build_definition(target) for target in targets
             ]
         }
+        self.build_probes_object(probes_file)
+        data["probes"] = self._ripeProbes["probes"]
+        return data
+
+    def build_definition(self, target: str) -> dict:
+        definition = {
+            "target": target,
+            "description": "Ping %s" % target,
+            "type": "ping",
+            "is_oneoff": True,
+            "packets": self._numberOfPacket,
+            "af": 4
+        }
 
-        if ":" in self._ip:
+        if ":" in target:
             af = 6
         else:
             af = 4
-        data["definitions"][0]['af'] = af
-        self.build_probes_object(probes_file)
-        data["probes"] = self._ripeProbes["probes"]
-        return data
+        definition['af'] = af
+        return definition
 
     def build_probes_object(self, probes_file):
         probes_info = json_file_to_dict(probes_file)
@@ -131,20 +148,29 @@ class Measurement(object):
             # Build probes object from an area
             self._mesh_area = ast.literal_eval(probes_info["area"])
             self._spacing = probes_info["spacing"]
+            self._seed = probes_info.get("seed", MESH_PROBES_SELECTION_SEED)
             probes_data_json = self.mesh_area_probes_object()
             self._ripeProbes = probes_data_json
         else:
             # Build probes object from a file
             self._ripeProbes = probes_info
 
+    def load_submitted_measurement(self, measurement_id: int,
+                                   request_data: dict, probes_file: str,
+                                   key: str = None) -> None:
+        """
+        Binds the object to a measurement already created, such as the
+        ones submitted by the campaign scheduler
+        """
+        self._request_data = request_data
+        self._probes_filepath = probes_file
+        self._probes_filename = probes_file.split("/")[-1][:-5]
+        self._measurement = RIPEAtlas.Measurement(
+            None, key=key, id=measurement_id)
+
     def get_probes_in_section(self, section: dict) -> dict:
-        base_url = "https://atlas.ripe.net/api/v2/probes/"
-        filters = "longitude__gte={}&longitude__lte={}&latitude__gte={}&latitude__lte={}".format(
-            section["longitude_min"], section["longitude_max"],
-            section["latitude_min"], section["latitude_max"])
-        fields = "fields=id,geometry,status"
-        url = "{}?{}&{}".format(base_url, filters, fields)
-        return requests.get(url=url).json()
+        return {"results": get_probe_catalogue().get_probes_in_section(
+            section)}
 
     def mesh_area_probes_object(self) -> dict:
         polygon_grid = self.build_intersection_grid_with_countries()
@@ -152,26 +178,22 @@ class Measurement(object):
         sections_borders = []
         for polygon in list(polygon_grid.geoms):
             sections_borders.append(get_section_borders_of_polygon(polygon))
-
-        probes_id_list = []
         print("Number of sections to select probes: {}".format(
             len(sections_borders)))
-        sections_analyzed = 0
-        print("Analyzing sections to select probes")
-        for section in sections_borders:
-            sections_analyzed += 1
-            if (sections_analyzed % 100) == 0:
-                print("Sections already analyzed: {}".
-                      format(sections_analyzed))
-            probes_in_mesh_area = self.get_probes_in_section(section)
-            probes_filtered = filter(
-                lambda probe: is_probe_usable(
-                    probe=probe, section=section),
-                probes_in_mesh_area["results"])
-            probes_filtered = list(probes_filtered)
 
+        # All the probes of the grid are retrieved at once and bucketed in
+        # the sections, instead of one probes query per section
+        probes_per_cell = self.get_connected_probes_per_cell(
+            get_section_borders_of_polygon(polygon_grid))
+        random_generator = random.Random(self._seed)
+        probes_id_list = []
+        for section in sections_borders:
+            probes_filtered = [
+                probe for probe in probes_per_cell.get(
+                    self.get_cell_of_section(section), [])
+                if is_probe_usable(probe=probe, section=section)]
             try:
-                id_selected = random.choice(probes_filtered)["id"]
+                id_selected = random_generator.choice(probes_filtered)["id"]
                 probes_id_list.append(id_selected)
             except IndexError:
                 # Inside the selected section there is no probe
@@ -179,7 +201,7 @@ class Measurement(object):
 
         if len(probes_id_list) > 1000:
             print("More than 1000 probes in grid, selecting a set of 1000")
-            probes_id_list = random.sample(probes_id_list, 1000)
+            probes_id_list = random_generator.sample(probes_id_list, 1000)
 
         print("Number of probes ID selected: {}".format(len(probes_id_list)))
 
@@ -194,20 +216,53 @@ class Measurement(object):
 
         }
 
+    def get_connected_probes_per_cell(self, grid_borders: dict) -> dict:
+        """
+        Connected probes inside the grid borders grouped by the
+        (column, row) of the mesh cell they fall in. The borders of the
+        cells are inclusive, as the ones of the sections: a probe on the
+        edge shared by two cells is in both, and one on the maximum edge of
+        the grid in the last cell.
+        """
+        probes = [probe for probe in
+                  self.get_probes_in_section(grid_borders)["results"]
+                  if probe["status"]["name"] == "Connected"]
+        if not probes:
+            return {}
+        coordinates = np.array(
+            [probe["geometry"]["coordinates"] for probe in probes])
+        positions = (coordinates - (self._mesh_area[0],
+                                    self._mesh_area[3])) / self._spacing
+        edges = np.round(positions)
+        on_edge = np.isclose(positions, edges, rtol=0, atol=1e-9)
+        cells = np.where(on_edge, edges, np.floor(positions)).astype(int)
+        probes_per_cell = {}
+        for probe, cell, cell_on_edge in zip(probes, cells.tolist(),
+                                             on_edge.tolist()):
+            columns = [cell[0] - 1, cell[0]] if cell_on_edge[0] \
+                else [cell[0]]
+            rows = [cell[1] - 1, cell[1]] if cell_on_edge[1] else [cell[1]]
+            for column in columns:
+                for row in rows:
+                    probes_per_cell.setdefault((column, row), []).append(
+                        probe)
+        return probes_per_cell
+
+    def get_cell_of_section(self, section: dict) -> tuple:
+        """
+        (column, row) of the cell of a section, from its center as the
+        sections cut by the borders of the countries are smaller than it
+        """
+        longitude = (section["longitude_min"] + section["longitude_max"]) / 2
+        latitude = (section["latitude_min"] + section["latitude_max"]) / 2
+        return (math.floor((longitude - self._mesh_area[0]) / self._spacing),
+                math.floor((latitude - self._mesh_area[3]) / self._spacing))
+
     def build_intersection_grid_with_countries(self):
-        countries_borders_dict = json_file_to_dict(
-            COUNTRY_BORDERS_GEOJSON_FILEPATH)
-        features = countries_borders_dict["features"]
-        # NOTE: buffer(0) is a trick for fixing scenarios where polygons have overlapping coordinates
-        countries_geometry_collection = GeometryCollection(
-            [shape(feature["geometry"]).buffer(0) for feature in features])
-        area_polygons = self.get_polygons_in_mesh_area()
-        intersecting_polygons = []
-        for polygon in area_polygons:
-            if polygon.intersects(countries_geometry_collection):
-                intersecting_polygons.append(polygon)
-
-        return MultiPolygon(intersecting_polygons)
+        return get_mesh_grid_with_countries(
+            area=self._mesh_area,
+            spacing=self._spacing,
+            polygons_builder=self.get_polygons_in_mesh_area)
 
     def get_polygons_in_mesh_area(self) -> list:
         polygons = []
@@ -249,23 +304,19 @@ class Measurement(object):
         return self._ripe_probes_geo
 
     def get_measurement_probes(self):
-        measurements_url = "https://atlas.ripe.net/api/v2/measurements"
-        probes_url = "https://atlas.ripe.net/api/v2/probes"
-
         measurement_id = self.get_measurement_id()
 
-        url = measurements_url + "/%s" % measurement_id + "/?fields=probes"
-        measurement_response = requests.get(url).json()
-
-        for probe in measurement_response["probes"]:
-            hostname = str(probe["id"])
-            url = probes_url + "/%s" % hostname
-
-            probe_response = requests.get(url).json()
+        measurement_response = get_sync_atlas_client().get_measurement(
+            measurement_id, "probes")
+        probes_ids = [probe["id"] for probe in measurement_response["probes"]]
 
+        # Only the probes missing or expired in the catalogue are requested
+        for probe_response in get_probe_catalogue().get_probes(probes_ids):
+            hostname = str(probe_response["id"])
             latitude = probe_response["geometry"]["coordinates"][1]
             longitude = probe_response["geometry"]["coordinates"][0]
             self._ripe_probes_geo[hostname] = [latitude, longitude]
+        return self._ripe_probes_geo
 
     def save_measurement_results(self,
                                  ripe_measurement_results: dict,
@@ -276,24 +327,8 @@ class Measurement(object):
             "measurement_id": self._measurement.id,
             "request_data": self._request_data,
             "probes_filepath": self._probes_filepath,
-            "measurement_results": []}
-
-        for probe_result in ripe_measurement_results:
-            probe_id = probe_result["prb_id"]
-            for probe_measure in probe_result["result"]:
-                if "rtt" in probe_measure.keys():
-                    measure = dict()
-                    try:
-                        measure["hostname"] = str(probe_id)
-                        measure["latitude"] = info_probes[str(probe_id)][0]
-                        measure["longitude"] = info_probes[str(probe_id)][1]
-                        measure["rtt_ms"] = probe_measure["rtt"]
-                    except KeyError as exception:
-                        print("Key Exception Error")
-                        print(exception.__str__())
-                        print("Info probes")
-                        print(info_probes)
-                    data_to_save["measurement_results"].append(measure)
+            "measurement_results": self.build_measurement_results(
+                ripe_measurement_results, info_probes)}
 
         self._measurement_filename = "{}_{}_{}.json".format(
             self._ip,
@@ -309,9 +344,35 @@ class Measurement(object):
             measurement_filepath = MEASUREMENTS_PATH + "{}".format(
                 self._measurement_filename)
 
-        dict_to_json_file(data_to_save, measurement_filepath)
+        dict_to_json_file(data_to_save, measurement_filepath,
+                          output_format=OUTPUT_FORMAT)
+        if MEASUREMENT_COLUMNAR_STORE:
+            save_measurement_columns(measurement_filepath, data_to_save)
+        index_measurement_file(measurement_filepath, data_to_save)
         return measurement_filepath
 
+    def build_measurement_results(self, ripe_measurement_results: list,
+                                  info_probes: dict) -> list:
+        """One entry per RTT answered, located at its probe"""
+        measurement_results = []
+        for probe_result in ripe_measurement_results:
+            probe_id = probe_result["prb_id"]
+            for probe_measure in probe_result["result"]:
+                if "rtt" in probe_measure.keys():
+                    measure = dict()
+                    try:
+                        measure["hostname"] = str(probe_id)
+                        measure["latitude"] = info_probes[str(probe_id)][0]
+                        measure["longitude"] = info_probes[str(probe_id)][1]
+                        measure["rtt_ms"] = probe_measure["rtt"]
+                    except KeyError as exception:
+                        print("Key Exception Error")
+                        print(exception.__str__())
+                        print("Info probes")
+                        print(info_probes)
+                    measurement_results.append(measure)
+        return measurement_results
+
     def get_measurement_nums(self, ripe_measurement_results: dict) -> \
             tuple[int, int, int, int, int]:
         num_probes_answer = 0
@@ -339,9 +400,26 @@ class Measurement(object):
         return (num_probes_answer, num_probes_timeout, num_probes_fail,
                 num_latency_measurement, total_rtt)
 
-    def retrieveResult(self, info_probes, campaign_name: str):
+    def retrieveResult(self, info_probes, campaign_name: str,
+                       online_anycast=None):
+        """
+        Waits for the results and saves them. With an OnlineAnycast the
+        results are analyzed as they arrive and the measurement is stopped
+        once the analysis is stable.
+        """
+        results_notification = None
+        if online_anycast is not None:
+            results_analyzed = [0]
+
+            def results_notification(results: list) -> bool:
+                new_results = results[results_analyzed[0]:]
+                results_analyzed[0] = len(results)
+                return online_anycast.update(self.build_measurement_results(
+                    new_results, info_probes))
+
         self.result = self._measurement.results(
-            wait=True, percentage_required=self._percentageSuccessful)
+            wait=True, percentage_required=self._percentageSuccessful,
+            results_notification=results_notification)
 
         path_file = self.save_measurement_results(
             self.result,
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# runs the measure, analyze and validate, and aggregate stages of a
+# campaign, only the ones out of date
+# ---------------------------------------------------------------------.
+
+# external modules imports
+import getopt
+import os
+import subprocess
+import sys
+# internal modules imports
+from utils.constants import (
+    PROBES_SETS_PATH,
+    RESULTS_CAMPAIGNS_PATH,
+    GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH,
+    GT_VALIDATIONS_STATISTICS,
+    CAMPAIGN_SINK_ENABLED,
+    CAMPAIGN_SINK_PATH,
+    AIRPORTS_INFO_FILEPATH,
+    VERLOC_APROX_PATH,
+    DISTANCE_FUNCTION_USED,
+    ANALYSIS_ENGINE_VERSION,
+    PIPELINES_PATH,
+    PIPELINE_STATE_PATH,
+    PIPELINE_WORKERS
+)
+from utils.common_functions import json_file_to_dict
+from utils.custom_exceptions import PipelineError
+from utils.pipeline import (
+    Pipeline,
+    PipelineNode,
+    NODE_DONE,
+    NODE_FAILED,
+    NODE_SKIPPED,
+    NODE_STALE,
+    NODE_UP_TO_DATE
+)
+from groundtruth import get_groundtruth_filepath
+from campaign_scheduler import (
+    CampaignScheduler,
+    JOB_SAVED,
+    JOB_ANALYZED,
+    get_campaign_jobs
+)
+from statistics_igreedy import iGreedyStatistics
+
+
+def print_help_text() -> None:
+    print("""
+Usage:  pipeline.py -c config [-w workers] [-f] [-n]
+
+Measures, analyzes and validates the campaign of the config file and builds
+the statistics of its validations. Every stage keeps a fingerprint of its
+parameters and of the contents of its inputs, running the pipeline again
+only runs the stages whose fingerprint changed or whose outputs are missing.
+
+The config file is a JSON object:
+    campaign_name   measurements campaign, the results and validations are
+                    saved in campaign_name_<distance function>
+    targets         list of IPs measured
+    probes_sets     list of probes sets files, relative to
+                    """ + PROBES_SETS_PATH + """ if not found
+    alpha           list of alpha analyzed
+    threshold       list of thresholds analyzed
+    groundtruth     optional {target: ground truth file}, the root servers
+                    and Cloudflare ones are found by default
+
+Options:
+    --config        -c  config
+                        Config file, relative to """ + PIPELINES_PATH + """
+                        if not found.
+    --workers       -w  workers
+                        Stages run at the same time. Default """ +
+          str(PIPELINE_WORKERS) + """.
+    --force         -f  Run every stage.
+    --dry-run       -n  Only print the stages out of date.
+    """)
+    sys.exit(0)
+
+
+def get_scheduler_measurement_filepaths(campaign_name: str) -> dict:
+    """Measurement file saved of every job of the campaign, None if not"""
+    return {job_key: job["measurement_filepath"]
+            if job["status"] in (JOB_SAVED, JOB_ANALYZED) else None
+            for job_key, job in get_campaign_jobs(campaign_name).items()}
+
+
+def run_measurements(campaign_name: str, targets: list,
+                     probes_filepaths: list) -> None:
+    """Runs the campaign scheduler if a measurement is not saved yet"""
+    measurement_filepaths = get_scheduler_measurement_filepaths(campaign_name)
+    if all(measurement_filepaths.get("{}_{}".format(
+            target, probes_filepath.split("/")[-1][:-5]))
+           for target in targets for probes_filepath in probes_filepaths):
+        return
+    CampaignScheduler(campaign_name=campaign_name, targets=targets,
+                      probes_filepaths=probes_filepaths).run()
+
+
+def run_igreedy(measurement_filepath: str, alpha: float, threshold: float,
+                gt_filepath: str, campaign_name: str) -> None:
+    igreedy_process = subprocess.run(
+        [
+            sys.executable, "code/igreedy.py",
+            "-i", measurement_filepath,
+            "-a", str(alpha),
+            "-t", str(threshold),
+            "-c", campaign_name
+        ] + (["-g", gt_filepath] if gt_filepath else []),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+    # igreedy.py exits with 0 for anycast targets and -1 for unicast ones
+    if igreedy_process.returncode not in (0, 255):
+        raise PipelineError("igreedy.py failed with {}:\n{}".format(
+            igreedy_process.returncode, igreedy_process.stdout[-2000:]))
+
+
+def get_analysis_outputs(measurement_filepath: str, alpha: float,
+                         threshold: float, gt_filepath: str,
+                         campaign_name: str) -> list:
+    """Results file and, with a ground truth, validation file written"""
+    if CAMPAIGN_SINK_ENABLED or measurement_filepath is None:
+        return []
+    results_filename = "{}_{}_{}_0".format(
+        measurement_filepath.split("/")[-1][:-5], float(alpha),
+        float(threshold))
+    outputs = ["{}{}/{}.json".format(RESULTS_CAMPAIGNS_PATH, campaign_name,
+                                     results_filename)]
+    if gt_filepath:
+        outputs.append("{}{}/{}_{}.json".format(
+            GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH, campaign_name,
+            results_filename, gt_filepath.split("/")[-1][:-5]))
+    return outputs
+
+
+def build_analyze_node(measurements_campaign_name: str, job_key: str,
+                       alpha: float, threshold: float, gt_filepath: str,
+                       campaign_name: str,
+                       dependencies: list) -> PipelineNode:
+    def get_measurement_filepath() -> str:
+        return get_scheduler_measurement_filepaths(
+            measurements_campaign_name).get(job_key)
+
+    def get_inputs() -> list:
+        inputs = [AIRPORTS_INFO_FILEPATH,
+                  get_measurement_filepath() or job_key]
+        if gt_filepath:
+            inputs.append(gt_filepath)
+        if "verloc" in DISTANCE_FUNCTION_USED:
+            inputs.append(VERLOC_APROX_PATH)
+        return inputs
+
+    return PipelineNode(
+        name="analyze:{}_{}_{}".format(job_key, alpha, threshold),
+        action=lambda: run_igreedy(get_measurement_filepath(), alpha,
+                                   threshold, gt_filepath, campaign_name),
+        dependencies=dependencies,
+        parameters={
+            "alpha": alpha,
+            "threshold": threshold,
+            "ping_radius_function": DISTANCE_FUNCTION_USED,
+            "engine_version": ANALYSIS_ENGINE_VERSION
+        },
+        inputs=get_inputs,
+        outputs=lambda: get_analysis_outputs(
+            get_measurement_filepath(), alpha, threshold, gt_filepath,
+            campaign_name))
+
+
+def build_pipeline(config: dict, state_filepath: str,
+                   workers: int = PIPELINE_WORKERS) -> Pipeline:
+    """
+    One measure node for the campaign, one analyze node per target, probes
+    set, alpha and threshold (validated against the ground truth in the
+    same run when the target has one) and one aggregate node with the
+    statistics of the validations.
+    """
+    campaign_name = config["campaign_name"]
+    validation_campaign_name = "{}_{}".format(campaign_name,
+                                              DISTANCE_FUNCTION_USED)
+    probes_filepaths = [
+        probes_set if os.path.exists(probes_set)
+        else PROBES_SETS_PATH + probes_set
+        for probes_set in config["probes_sets"]]
+    groundtruth = config.get("groundtruth", {})
+    pipeline = Pipeline(state_filepath, workers)
+
+    measure_node = pipeline.add_node(PipelineNode(
+        name="measure:{}".format(campaign_name),
+        action=lambda: run_measurements(campaign_name, config["targets"],
+                                        probes_filepaths),
+        parameters={"targets": config["targets"]},
+        inputs=probes_filepaths,
+        outputs=lambda: list(
+            get_scheduler_measurement_filepaths(campaign_name).values())))
+
+    analyze_nodes = []
+    for target in config["targets"]:
+        gt_filepath = groundtruth.get(target,
+                                      get_groundtruth_filepath(target))
+        for probes_filepath in probes_filepaths:
+            job_key = "{}_{}".format(target,
+                                     probes_filepath.split("/")[-1][:-5])
+            for alpha in config["alpha"]:
+                for threshold in config["threshold"]:
+                    analyze_nodes.append(pipeline.add_node(
+                        build_analyze_node(
+                            campaign_name, job_key, alpha, threshold,
+                            gt_filepath, validation_campaign_name,
+                            [measure_node.name])))
+
+    def get_aggregate_inputs() -> list:
+        if CAMPAIGN_SINK_ENABLED:
+            return ["{}{}.jsonl".format(CAMPAIGN_SINK_PATH,
+                                        validation_campaign_name)]
+        # The validations, the last output of the nodes with ground truth
+        return [node.get_outputs()[-1] for node in analyze_nodes
+                if len(node.get_outputs()) == 2]
+
+    pipeline.add_node(PipelineNode(
+        name="aggregate:{}".format(validation_campaign_name),
+        action=iGreedyStatistics(
+            validation_campaign_directory=validation_campaign_name,
+            output_filename=validation_campaign_name
+        ).igreedy_build_statistics_validation_campaign,
+        dependencies=[node.name for node in analyze_nodes],
+        inputs=get_aggregate_inputs,
+        outputs=["{}statistics_{}.csv".format(GT_VALIDATIONS_STATISTICS,
+                                              validation_campaign_name)]))
+    return pipeline
+
+
+def main(argv):
+    if ("-h" in argv) or ("--help" in argv) or len(argv) == 0:
+        print_help_text()
+
+    try:
+        options, args = getopt.getopt(argv, "c:w:fn",
+                                      ["config=", "workers=", "force",
+                                       "dry-run"])
+    except getopt.GetoptError as e:
+        print(e)
+        sys.exit(2)
+
+    config_filepath = None
+    workers = PIPELINE_WORKERS
+    force = False
+    dry_run = False
+    for option, arg in options:
+        if option in ("-c", "--config"):
+            config_filepath = arg
+            if not os.path.exists(config_filepath):
+                config_filepath = PIPELINES_PATH + config_filepath
+        elif option in ("-w", "--workers"):
+            workers = int(arg)
+        elif option in ("-f", "--force"):
+            force = True
+        elif option in ("-n", "--dry-run"):
+            dry_run = True
+
+    if config_filepath is None:
+        print("A config file is required")
+        sys.exit(2)
+
+    pipeline = build_pipeline(
+        json_file_to_dict(config_filepath),
+        PIPELINE_STATE_PATH + config_filepath.split("/")[-1],
+        workers)
+    outcomes = pipeline.run(force=force, dry_run=dry_run)
+    if dry_run:
+        for name, outcome in outcomes.items():
+            if outcome == NODE_STALE:
+                print(name)
+    for outcome in (NODE_UP_TO_DATE, NODE_DONE, NODE_STALE, NODE_FAILED,
+                    NODE_SKIPPED):
+        count = list(outcomes.values()).count(outcome)
+        if count:
+            print("{} stages {}".format(count, outcome))
+    if NODE_FAILED in outcomes.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
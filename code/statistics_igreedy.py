@@ -14,20 +14,27 @@ from utils.constants import (
     DISTANCE_FUNCTION_USED
 )
 from utils.common_functions import (
-    get_list_files_in_path,
-    json_file_to_dict,
     get_nearest_airport_to_point,
-    dict_to_json_file
+    dict_to_json_file,
+    get_probe_set_selection_and_number
 )
+from utils.campaign_sink import (
+    list_output_files,
+    read_output_file
+)
+from utils.results_index import get_results_index
+from utils.statistics_aggregator import aggregate_json_files
 
 
 class iGreedyStatistics:
 
     def __init__(self,
                  validation_campaign_directory: str = None,
-                 output_filename: str = None):
+                 output_filename: str = None,
+                 use_results_index: bool = True):
         self._validation_campaign_directory = validation_campaign_directory
         self._output_filename = output_filename
+        self._use_results_index = use_results_index
 
     def igreedy_build_statistics_validation_campaign(self):
         if not self._validation_campaign_directory or \
@@ -35,56 +42,14 @@ class iGreedyStatistics:
             print("No campaign name or output filename provided")
             return
 
-        results_filenames = get_list_files_in_path(
-            GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH +
-            self._validation_campaign_directory)
-
-        validation_results_df = pd.DataFrame(columns=[
-            "target", "probes_file",
-            "probe_selection", "probe_set_number",
-            "threshold", "alpha",
-            "Accuracy", "Precision", "Recall", "F1",
-            "distance_function", "gt_instances_in_region", "filename"
-        ])
-
-        for result_filename in results_filenames:
-            print(result_filename)
-            result_dict = json_file_to_dict("{}/{}".format(
-                GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH +
-                self._validation_campaign_directory, result_filename)
-            )
-
-            probe_set_name_division = result_dict["probes_filepath"].split(
-                "/")[-1].split("_")
-
-            region = probe_set_name_division[0]
-
-            if "section" in region:
-                probe_selection = "mesh"
-            else:
-                probe_selection = "area"
-            probe_set_number = float(".".join(
-                map(str, probe_set_name_division[1].split(".")[:-1])))
-
-            validation_results_df = pd.concat(
-                [pd.DataFrame([[
-                    result_dict["target"],
-                    result_dict["probes_filepath"].split("/")[-1],
-                    probe_selection,
-                    probe_set_number,
-                    result_dict["threshold"],
-                    result_dict["alpha"],
-                    result_dict["statistics"]["accuracy"],
-                    result_dict["statistics"]["precision"],
-                    result_dict["statistics"]["recall"],
-                    result_dict["statistics"]["f1"],
-                    result_dict["ping_radius_function"],
-                    result_dict["gt_instances_in_region"],
-                    result_filename,
-                ]], columns=validation_results_df.columns,
-                ), validation_results_df],
-                ignore_index=True
-            )
+        validation_results_df = None
+        if self._use_results_index:
+            validation_results_df = get_results_index(
+            ).query_validations_statistics(
+                self._validation_campaign_directory)
+        if validation_results_df is None or validation_results_df.empty:
+            validation_results_df = \
+                self.read_validation_campaign_directory()
 
         validation_results_df.sort_values(
             by=["target", "probes_file", "threshold", "alpha"],
@@ -100,6 +65,48 @@ class iGreedyStatistics:
 
         validation_results_df.to_csv(csv_name, sep=",", index=False)
 
+    def read_validation_campaign_directory(self) -> pd.DataFrame:
+        campaign_path = GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH + \
+                        self._validation_campaign_directory
+        # The validations may be files of their own or in the campaign sink
+        validation_filepaths = list_output_files(
+            campaign_path, self._validation_campaign_directory)
+
+        def build_row(result_filepath: str, result_dict: dict) -> list:
+            result_filename = result_filepath.split("/")[-1]
+            print(result_filename)
+            probe_selection, probe_set_number = \
+                get_probe_set_selection_and_number(
+                    result_dict["probes_filepath"])
+            return [
+                result_dict["target"],
+                result_dict["probes_filepath"].split("/")[-1],
+                probe_selection,
+                probe_set_number,
+                result_dict["threshold"],
+                result_dict["alpha"],
+                result_dict["statistics"]["accuracy"],
+                result_dict["statistics"]["precision"],
+                result_dict["statistics"]["recall"],
+                result_dict["statistics"]["f1"],
+                result_dict["ping_radius_function"],
+                result_dict["gt_instances_in_region"],
+                result_filename,
+            ]
+
+        return aggregate_json_files(
+            filepaths=validation_filepaths,
+            columns=[
+                "target", "probes_file",
+                "probe_selection", "probe_set_number",
+                "threshold", "alpha",
+                "Accuracy", "Precision", "Recall", "F1",
+                "distance_function", "gt_instances_in_region", "filename"
+            ],
+            build_row=build_row,
+            read_file=lambda filepath: read_output_file(
+                filepath, self._validation_campaign_directory))
+
 
 def get_statistics_igreedy():
     campaign_name = "{}_{}".format(
@@ -111,4 +118,5 @@ def get_statistics_igreedy():
     igreedy_statistics.igreedy_build_statistics_validation_campaign()
 
 
-get_statistics_igreedy()
+if __name__ == "__main__":
+    get_statistics_igreedy()
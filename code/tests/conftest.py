@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import os
+import sys
+
+# The modules import each other from the code directory, as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
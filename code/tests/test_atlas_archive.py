@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import asyncio
+import json
+import httpx
+# internal modules imports
+from utils.atlas_archive import (
+    AtlasArchive,
+    RecordingTransport,
+    ReplayTransport
+)
+from utils.atlas_client import AtlasClient
+# fast_waits is a fixture of the tests of the client, used here too
+from test_atlas_client import (
+    BASE_URL,
+    FakeAtlas,
+    add_results,
+    fast_waits
+)
+
+RESULTS_URL = BASE_URL + "measurements/1001/results/"
+
+
+def get_results(archive: AtlasArchive, start: int = None) -> list:
+    async def get():
+        async with httpx.AsyncClient(
+                transport=ReplayTransport(archive, latency=0)) as client:
+            response = await client.get(
+                RESULTS_URL,
+                params={"start": start} if start is not None else None)
+            return response.json()
+    return [result["prb_id"] for result in asyncio.run(get())]
+
+
+def record_results(archive: AtlasArchive, polls: list) -> None:
+    """Records the answers of the results polls, lists of (probe, time)"""
+    for results in polls:
+        archive.record(
+            httpx.Request("GET", RESULTS_URL, params={"start": 1}), 200,
+            json.dumps([{"prb_id": probe_id, "timestamp": timestamp}
+                        for probe_id, timestamp in results]))
+
+
+def test_replay_results_uploaded_late(tmp_path):
+    archive = AtlasArchive(str(tmp_path) + "/")
+    # The probe 2 measured before the probe 1, its result came in later
+    record_results(archive, [[(1, 10)], [(1, 10), (2, 5)]])
+
+    # Polls not recorded see the results as they arrived in the recording
+    assert get_results(archive, start=4) == [1]
+    assert get_results(archive, start=4) == [1, 2]
+    # and the start filter of Atlas, on the time the probes measured
+    assert get_results(archive, start=8) == [1]
+
+
+def test_record_and_replay(tmp_path, fast_waits):
+    archive = AtlasArchive(str(tmp_path) + "/")
+    fake_atlas = FakeAtlas()
+    add_results(fake_atlas, 1001, 3, [1700000010, 1700000005, 1700000012])
+
+    def wait_results(transport: httpx.AsyncBaseTransport) -> list:
+        async def wait():
+            async with AtlasClient(base_url=BASE_URL, transport=transport,
+                                   backend="online") as client:
+                return await client.wait_results(1001, 3, 1,
+                                                 results_delay=0.001)
+        return asyncio.run(wait())
+
+    recorded = wait_results(RecordingTransport(fake_atlas.get_transport(),
+                                               archive))
+    replayed = wait_results(ReplayTransport(archive, latency=0))
+
+    assert [result["prb_id"] for result in recorded] == [1, 2, 3]
+    assert replayed == recorded
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from urllib.parse import parse_qs
+# internal modules imports
+import utils.atlas_client as atlas_client
+import utils.http_client as http_client
+from utils.atlas_client import AtlasClient
+from utils.custom_exceptions import (
+    InternalError,
+    ResultError
+)
+
+BASE_URL = "https://atlas.test/api/v2/"
+
+
+class FakeAtlas:
+    """
+    Stand-in of the RIPE Atlas API answering through an httpx.MockTransport.
+    failures is a list of (method, path suffix, status code or httpx
+    transport error raised) answered once each, before the request is
+    served.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failures = []
+        self.statuses = {}
+        self.results = {}
+        self.results_404 = 0
+        self.probes = {probe_id: {"id": probe_id,
+                                  "geometry": {"type": "Point",
+                                               "coordinates": [probe_id, 0]}}
+                       for probe_id in range(1, 8)}
+        self.page_size = 3
+        self.created = 0
+
+    def get_transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        parameters = {name: values[0] for name, values in
+                      parse_qs(request.url.query.decode()).items()}
+        self.requests.append((request.method, path, parameters))
+        for failure in self.failures:
+            if request.method == failure[0] and path.endswith(failure[1]):
+                self.failures.remove(failure)
+                if not isinstance(failure[2], int):
+                    raise failure[2]("failure", request=request)
+                return httpx.Response(failure[2], headers={"Retry-After": "0"},
+                                      json={"error": failure[2]})
+
+        if request.method == "POST" and path.endswith("/measurements/"):
+            definitions = json.loads(request.content)["definitions"]
+            ids = []
+            for _ in definitions:
+                self.created += 1
+                ids.append(1000 + self.created)
+            return httpx.Response(201, json={"measurements": ids})
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        if path.endswith("/results/"):
+            if self.results_404 > 0:
+                self.results_404 -= 1
+                return httpx.Response(404, json={"error": "not found"})
+            measurement_id = int(path.split("/")[-3])
+            start = int(parameters.get("start", 0))
+            # Every poll makes the next result available
+            available = self.results[measurement_id]
+            results = [result for result in available["all"]
+                       [:available["served"] + 1]
+                       if result["timestamp"] >= start]
+            available["served"] += 1
+            return httpx.Response(200, json=results)
+        if "/measurements/" in path:
+            measurement_id = int(path.split("/")[-2])
+            statuses = self.statuses[measurement_id]
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            return httpx.Response(200, json={
+                "id": measurement_id, "status": {"name": status},
+                "probes": [{"id": 1}, {"id": 2}]})
+        if path.endswith("/probes/"):
+            probes = sorted(self.probes.values(), key=lambda p: p["id"])
+            if "id__in" in parameters:
+                ids = set(map(int, parameters["id__in"].split(",")))
+                probes = [probe for probe in probes if probe["id"] in ids]
+            offset = int(parameters.get("offset", 0))
+            next_url = None
+            if offset + self.page_size < len(probes):
+                next_url = "{}probes/?offset={}".format(
+                    BASE_URL, offset + self.page_size)
+            return httpx.Response(200, json={
+                "count": len(probes), "next": next_url,
+                "results": probes[offset:offset + self.page_size]})
+        return httpx.Response(404, json={"error": "not found"})
+
+    def get_requests(self, method: str, path_suffix: str) -> list:
+        return [request for request in self.requests
+                if request[0] == method and request[1].endswith(path_suffix)]
+
+
+@pytest.fixture(autouse=True)
+def fast_waits(monkeypatch):
+    """No backoff, rate limit nor poll waits worth waiting for"""
+    monkeypatch.setattr(http_client, "HTTP_BACKOFF_BASE", 0)
+    monkeypatch.setitem(http_client.HTTP_RATE_LIMITS, "atlas.test", 10000)
+    monkeypatch.setattr(atlas_client, "ATLAS_POLL_MIN_DELAY", 0.001)
+    monkeypatch.setattr(atlas_client, "ATLAS_POLL_MAX_DELAY", 0.01)
+
+
+@pytest.fixture
+def fake_atlas():
+    return FakeAtlas()
+
+
+def run(fake_atlas: FakeAtlas, coroutine_function):
+    """Runs coroutine_function(client) with a client of the fake Atlas"""
+    async def run_with_client():
+        async with AtlasClient(key="KEY", base_url=BASE_URL,
+                               transport=fake_atlas.get_transport(),
+                               backend="online") as client:
+            return await coroutine_function(client)
+    return asyncio.run(run_with_client())
+
+
+def test_create_measurement(fake_atlas):
+    measurement_ids = run(fake_atlas, lambda client: client.create_measurement(
+        {"definitions": [{"target": "1.1.1.1"}, {"target": "8.8.8.8"}]}))
+
+    assert measurement_ids == [1001, 1002]
+    (_, _, parameters), = fake_atlas.get_requests("POST", "/measurements/")
+    assert parameters == {"key": "KEY"}
+
+
+def test_create_measurement_client_error_not_retried(fake_atlas):
+    fake_atlas.failures.append(("POST", "/measurements/", 400))
+
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(fake_atlas, lambda client: client.create_measurement(
+            {"definitions": [{"target": "1.1.1.1"}]}))
+
+    assert error.value.response.status_code == 400
+    assert len(fake_atlas.get_requests("POST", "/measurements/")) == 1
+
+
+def test_create_measurement_rate_limited_retried(fake_atlas):
+    fake_atlas.failures += [("POST", "/measurements/", 429)] * 2
+
+    measurement_ids = run(fake_atlas, lambda client: client.create_measurement(
+        {"definitions": [{"target": "1.1.1.1"}]}))
+
+    assert measurement_ids == [1001]
+    assert len(fake_atlas.get_requests("POST", "/measurements/")) == 3
+
+
+def test_create_measurement_server_error_not_retried(fake_atlas):
+    # A POST may have created the measurement, it is not sent again
+    fake_atlas.failures.append(("POST", "/measurements/", 503))
+
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(fake_atlas, lambda client: client.create_measurement(
+            {"definitions": [{"target": "1.1.1.1"}]}))
+
+    assert error.value.response.status_code == 503
+    assert len(fake_atlas.get_requests("POST", "/measurements/")) == 1
+
+
+def test_create_measurement_read_timeout_not_retried(fake_atlas):
+    # The measurement may have been created before the answer was lost
+    fake_atlas.failures.append(("POST", "/measurements/", httpx.ReadTimeout))
+
+    with pytest.raises(httpx.ReadTimeout):
+        run(fake_atlas, lambda client: client.create_measurement(
+            {"definitions": [{"target": "1.1.1.1"}]}))
+
+    assert len(fake_atlas.get_requests("POST", "/measurements/")) == 1
+
+
+def test_create_measurement_connect_error_retried(fake_atlas):
+    fake_atlas.failures.append(("POST", "/measurements/", httpx.ConnectError))
+
+    measurement_ids = run(fake_atlas, lambda client: client.create_measurement(
+        {"definitions": [{"target": "1.1.1.1"}]}))
+
+    assert measurement_ids == [1001]
+    assert len(fake_atlas.get_requests("POST", "/measurements/")) == 2
+
+
+def test_get_read_timeout_retried(fake_atlas):
+    fake_atlas.statuses[1001] = ["Ongoing"]
+    fake_atlas.failures.append(("GET", "/measurements/1001/",
+                                httpx.ReadTimeout))
+
+    status = run(fake_atlas, lambda client: client.get_measurement_status(
+        1001))
+
+    assert status == "Ongoing"
+    assert len(fake_atlas.get_requests("GET", "/measurements/1001/")) == 2
+
+
+def test_wait_probes_allocated(fake_atlas):
+    fake_atlas.statuses[1001] = ["Specified", "Scheduled", "Ongoing"]
+    fake_atlas.failures.append(("GET", "/measurements/1001/", 502))
+    delays = []
+
+    probes = run(fake_atlas, lambda client: client.wait_probes_allocated(
+        1001, 0.001, delays.append))
+
+    assert probes == [{"id": 1}, {"id": 2}]
+    assert len(delays) == 3
+    # The server error is retried, not counted as a poll
+    assert len(fake_atlas.get_requests("GET", "/measurements/1001/")) == 4
+
+
+def test_wait_probes_allocated_unexpected_status(fake_atlas):
+    fake_atlas.statuses[1001] = ["Failed"]
+
+    with pytest.raises(InternalError):
+        run(fake_atlas, lambda client: client.wait_probes_allocated(
+            1001, 0.001))
+
+
+def add_results(fake_atlas: FakeAtlas, measurement_id: int,
+                num_probes: int, timestamps: list = None) -> None:
+    """
+    Results of the probes in the order they reach Atlas, measured at the
+    timestamps given or in that same order
+    """
+    timestamps = timestamps or [1700000000 + probe_id
+                                for probe_id in range(1, num_probes + 1)]
+    fake_atlas.results[measurement_id] = {"served": 0, "all": [
+        {"prb_id": probe_id, "timestamp": timestamp,
+         "result": [{"rtt": 1.0}]}
+        for probe_id, timestamp in zip(range(1, num_probes + 1),
+                                       timestamps)]}
+
+
+def test_wait_results_incremental(fake_atlas):
+    add_results(fake_atlas, 1001, 4)
+    fake_atlas.results_404 = 1
+
+    results = run(fake_atlas, lambda client: client.wait_results(
+        1001, 4, 1, results_delay=0.001))
+
+    assert [result["prb_id"] for result in results] == [1, 2, 3, 4]
+    results_requests = fake_atlas.get_requests("GET", "/1001/results/")
+    # 404 until the first results, then the ones measured from the results
+    # window before the newest one
+    assert "start" not in results_requests[1][2]
+    assert results_requests[-1][2]["start"] == str(
+        1700000003 - atlas_client.ATLAS_RESULTS_WINDOW)
+
+
+def test_wait_results_uploaded_late(fake_atlas):
+    # The probe 2 measured before the probe 1 but its result arrives later
+    add_results(fake_atlas, 1001, 3, [1700000010, 1700000005, 1700000012])
+
+    results = run(fake_atlas, lambda client: client.wait_results(
+        1001, 3, 1, results_delay=0.001))
+
+    assert [result["prb_id"] for result in results] == [1, 2, 3]
+
+
+def test_wait_results_notification_off_the_loop(fake_atlas):
+    add_results(fake_atlas, 1001, 3)
+    notified = []
+
+    def results_notification(results: list) -> bool:
+        # A slow analysis, as the enumeration of OnlineAnycast
+        time.sleep(0.05)
+        notified.append(len(results))
+        return len(results) == 2
+
+    async def wait_with_ticks(client: AtlasClient):
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(len(notified))
+                await asyncio.sleep(0.005)
+        ticker = asyncio.create_task(tick())
+        results = await client.wait_results(
+            1001, 3, 1, results_delay=0.001,
+            results_notification=results_notification)
+        ticker.cancel()
+        return results, ticks
+
+    results, ticks = run(fake_atlas, wait_with_ticks)
+
+    assert notified == [1, 2]
+    assert len(results) == 2
+    assert fake_atlas.get_requests("DELETE", "/measurements/1001/")
+    # The loop kept running while the notifications ran
+    assert ticks.count(0) > 3
+
+
+def test_wait_results_stopped_measurement(fake_atlas):
+    add_results(fake_atlas, 1001, 2)
+    fake_atlas.statuses[1001] = ["Stopped"]
+
+    results = run(fake_atlas, lambda client: client.wait_results(
+        1001, 10, 1, results_delay=0.001))
+
+    assert [result["prb_id"] for result in results] == [1, 2]
+    assert fake_atlas.get_requests("GET", "/measurements/1001/")
+
+
+def test_wait_results_client_error(fake_atlas):
+    add_results(fake_atlas, 1001, 2)
+    fake_atlas.failures.append(("GET", "/1001/results/", 403))
+
+    with pytest.raises(ResultError):
+        run(fake_atlas, lambda client: client.wait_results(
+            1001, 2, 1, results_delay=0.001))
+
+
+def test_wait_results_server_error_retried(fake_atlas):
+    add_results(fake_atlas, 1001, 1)
+    fake_atlas.failures += [("GET", "/1001/results/", 500),
+                            ("GET", "/1001/results/", 429)]
+
+    results = run(fake_atlas, lambda client: client.wait_results(
+        1001, 1, 1, results_delay=0.001))
+
+    assert [result["prb_id"] for result in results] == [1]
+    assert len(fake_atlas.get_requests("GET", "/1001/results/")) == 3
+
+
+def test_get_probes_paginated(fake_atlas):
+    probes = run(fake_atlas, lambda client: client.get_probes())
+
+    assert [probe["id"] for probe in probes] == list(range(1, 8))
+    assert len(fake_atlas.get_requests("GET", "/probes/")) == 3
+
+
+def test_get_probes_by_id_chunked(fake_atlas, monkeypatch):
+    monkeypatch.setattr(atlas_client, "ATLAS_PROBES_PAGE_SIZE", 2)
+    fake_atlas.page_size = 2
+
+    probes = run(fake_atlas, lambda client: client.get_probes_by_id(
+        [1, 2, 3, 4, 6]))
+
+    assert sorted(probe["id"] for probe in probes) == [1, 2, 3, 4, 6]
+    chunks = sorted(parameters["id__in"] for _, _, parameters in
+                    fake_atlas.get_requests("GET", "/probes/"))
+    assert chunks == ["1,2", "3,4", "6"]
+    assert all(parameters["page_size"] == "2" for _, _, parameters in
+               fake_atlas.get_requests("GET", "/probes/"))
+
+
+def test_get_probe_not_found(fake_atlas):
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(fake_atlas, lambda client: client.get_probe(99))
+
+    assert error.value.response.status_code == 404
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import pandas as pd
+import pytest
+# internal modules imports
+import utils.campaign_sink as campaign_sink
+import utils.results_index as results_index
+import statistics_igreedy
+from utils.campaign_sink import (
+    CampaignSink,
+    write_output_file
+)
+from utils.results_index import ResultsIndex
+from statistics_igreedy import iGreedyStatistics
+
+CAMPAIGN_NAME = "sink_campaign"
+
+
+def get_validation(target: str, alpha: float) -> dict:
+    return {
+        "target": target,
+        "probes_filepath": "datasets/probes_sets/WW_100.json",
+        "alpha": alpha,
+        "threshold": 0,
+        "noise": 0,
+        "ping_radius_function": "constant_1.52",
+        "results_filepath": "results.json",
+        "gt_filepath": "groundtruth.json",
+        "gt_instances_in_region": 3,
+        "statistics": {"TP": 1, "FP": 0, "TN": 0, "FN": 2, "OT": 0, "OF": 0,
+                       "accuracy": 0.3, "precision": 1, "recall": 0.3,
+                       "f1": 0.5},
+        "instances": []
+    }
+
+
+@pytest.fixture
+def sink_campaign(tmp_path, monkeypatch):
+    """
+    Validations of a campaign saved in its sink and indexed, as igreedy.py
+    does with CAMPAIGN_SINK_ENABLED, no file of their own
+    """
+    validations_path = str(tmp_path / "validations") + "/"
+    monkeypatch.setattr(campaign_sink, "CAMPAIGN_SINK_ENABLED", True)
+    monkeypatch.setitem(getattr(campaign_sink, "__campaign_sinks"),
+                        CAMPAIGN_NAME,
+                        CampaignSink(CAMPAIGN_NAME, str(tmp_path) + "/"))
+    monkeypatch.setitem(results_index.CAMPAIGNS_PATHS, "validations",
+                        validations_path)
+    monkeypatch.setitem(results_index.CAMPAIGNS_PATHS, "results",
+                        str(tmp_path / "results") + "/")
+    monkeypatch.setattr(statistics_igreedy,
+                        "GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH",
+                        validations_path)
+    monkeypatch.setattr(statistics_igreedy, "GT_VALIDATIONS_STATISTICS",
+                        str(tmp_path) + "/")
+    index = ResultsIndex(str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(statistics_igreedy, "get_results_index",
+                        lambda: index)
+
+    for target in ["1.1.1.1", "8.8.8.8"]:
+        for alpha in [0.5, 1]:
+            filepath = "{}{}/{}_{}.json".format(validations_path,
+                                                CAMPAIGN_NAME, target, alpha)
+            validation = get_validation(target, alpha)
+            write_output_file(validation, filepath, CAMPAIGN_NAME)
+            index.add_validation(filepath, validation)
+    yield index
+    index.close()
+
+
+def read_statistics(tmp_path) -> pd.DataFrame:
+    return pd.read_csv("{}/statistics_{}.csv".format(tmp_path,
+                                                     CAMPAIGN_NAME))
+
+
+@pytest.mark.parametrize("use_results_index", [True, False])
+def test_statistics_of_sink_campaign(sink_campaign, tmp_path,
+                                     use_results_index):
+    iGreedyStatistics(
+        validation_campaign_directory=CAMPAIGN_NAME,
+        output_filename=CAMPAIGN_NAME,
+        use_results_index=use_results_index
+    ).igreedy_build_statistics_validation_campaign()
+
+    statistics_df = read_statistics(tmp_path)
+    assert len(statistics_df) == 4
+    assert sorted(statistics_df["filename"]) == [
+        "1.1.1.1_0.5.json", "1.1.1.1_1.json",
+        "8.8.8.8_0.5.json", "8.8.8.8_1.json"]
+    # The rows of the sink are not pruned as files missing
+    assert len(sink_campaign.query_validations(CAMPAIGN_NAME)) == 4
+
+
+def test_sync_indexes_sink_records(sink_campaign, tmp_path):
+    # An index built after the campaign, as the ones of other machines
+    index = ResultsIndex(str(tmp_path / "new_index.sqlite"))
+
+    assert len(index.query_campaign_validations(CAMPAIGN_NAME)) == 4
+    index.close()
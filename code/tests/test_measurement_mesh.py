@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import pytest
+# internal modules imports
+from utils.common_functions import (
+    get_section_borders_of_polygon,
+    is_probe_usable
+)
+from measurement import Measurement
+
+
+def get_probe(probe_id: int, longitude: float, latitude: float) -> dict:
+    return {"id": probe_id, "status": {"name": "Connected"},
+            "geometry": {"type": "Point",
+                         "coordinates": [longitude, latitude]}}
+
+
+@pytest.fixture
+def mesh_measurement():
+    """Mesh of 3 x 3 cells of 0.5 degrees from (10, 20)"""
+    measurement = Measurement("1.1.1.1")
+    # (longitude_min, latitude_max, longitude_max, latitude_min)
+    measurement._mesh_area = (10, 21, 11, 20)
+    measurement._spacing = 0.5
+    return measurement
+
+
+def get_probes_per_section(measurement: Measurement, probes: list) -> dict:
+    """
+    Usable probes of every section, as mesh_area_probes_object selects
+    them, by (longitude_min, latitude_min) of the section
+    """
+    measurement.get_probes_in_section = lambda section: {"results": probes}
+    sections = [get_section_borders_of_polygon(polygon) for polygon in
+                measurement.get_polygons_in_mesh_area()]
+    probes_per_cell = measurement.get_connected_probes_per_cell(None)
+    return {
+        (section["longitude_min"], section["latitude_min"]): sorted(
+            probe["id"] for probe in probes_per_cell.get(
+                measurement.get_cell_of_section(section), [])
+            if is_probe_usable(probe=probe, section=section))
+        for section in sections}
+
+
+def test_probe_inside_a_cell(mesh_measurement):
+    probes_per_section = get_probes_per_section(
+        mesh_measurement, [get_probe(1, 10.2, 20.7)])
+
+    assert probes_per_section[(10, 20.5)] == [1]
+    assert sum(map(len, probes_per_section.values())) == 1
+
+
+def test_probe_on_shared_edge(mesh_measurement):
+    probes_per_section = get_probes_per_section(
+        mesh_measurement, [get_probe(1, 10.5, 20.2)])
+
+    assert probes_per_section[(10, 20)] == [1]
+    assert probes_per_section[(10.5, 20)] == [1]
+
+
+def test_probe_on_max_edge(mesh_measurement):
+    # The last cells of the mesh end at 11.5 and 21.5
+    probes_per_section = get_probes_per_section(
+        mesh_measurement, [get_probe(1, 11.5, 21.5)])
+
+    assert probes_per_section[(11, 21)] == [1]
+
+
+def test_section_cut_by_a_border(mesh_measurement):
+    mesh_measurement.get_probes_in_section = lambda section: {
+        "results": [get_probe(1, 10.9, 20.3)]}
+    probes_per_cell = mesh_measurement.get_connected_probes_per_cell(None)
+    # The part of the cell (10.5, 20) inside a country
+    section = {"longitude_min": 10.8, "longitude_max": 10.95,
+               "latitude_min": 20.1, "latitude_max": 20.4}
+
+    assert probes_per_cell[mesh_measurement.get_cell_of_section(
+        section)][0]["id"] == 1
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import hashlib
+import json
+import os
+import shutil
+# internal modules imports
+from utils.constants import (
+    ANALYSIS_CACHE_PATH,
+    ANALYSIS_ENGINE_VERSION,
+    DISTANCE_FUNCTION_USED,
+    VERLOC_APROX_PATH
+)
+from utils.common_functions import get_file_hash
+from utils.json_io import (
+    read_json_file,
+    write_json_file
+)
+
+
+class AnalysisCache:
+    """
+    Content-addressed store of the outcome of the iGreedy analyses, one
+    file per entry named by the SHA-256 of everything the analysis depends
+    on: the contents of the measurement and airports files, alpha,
+    threshold, noise, the RTT to radius function (and its table) and
+    ANALYSIS_ENGINE_VERSION. Entries are never invalidated by themselves:
+    increase the engine version when the analysis code changes, clear() the
+    cache or force the analysis again.
+    """
+
+    def __init__(self, cache_path: str = ANALYSIS_CACHE_PATH):
+        self._cache_path = cache_path
+
+    def get_key(self, measurement_filepath: str, airports_filepath: str,
+                alpha: float, threshold: float, noise: float) -> str:
+        parameters = {
+            "measurement": get_file_hash(measurement_filepath),
+            "airports": get_file_hash(airports_filepath),
+            "alpha": float(alpha),
+            "threshold": float(threshold),
+            "noise": float(noise),
+            "ping_radius_function": DISTANCE_FUNCTION_USED,
+            "engine_version": ANALYSIS_ENGINE_VERSION
+        }
+        if "verloc" in DISTANCE_FUNCTION_USED:
+            parameters["verloc"] = get_file_hash(VERLOC_APROX_PATH)
+        return hashlib.sha256(
+            json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str):
+        """Analysis stored with the key, None if there is not"""
+        try:
+            return read_json_file(self._get_filepath(key))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, analysis: dict) -> None:
+        filepath = self._get_filepath(key)
+        # Written aside and renamed, parallel analyses never read half files
+        temporary_filepath = "{}.{}.tmp".format(filepath, os.getpid())
+        write_json_file(analysis, temporary_filepath,
+                        output_format="compact")
+        os.replace(temporary_filepath, filepath)
+
+    def clear(self) -> None:
+        if os.path.exists(self._cache_path):
+            shutil.rmtree(self._cache_path)
+
+    def _get_filepath(self, key: str) -> str:
+        return "{}{}/{}.json".format(self._cache_path, key[:2], key)
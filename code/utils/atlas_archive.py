@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import httpx
+# internal modules imports
+from utils.constants import (
+    ATLAS_ARCHIVE_PATH,
+    ATLAS_REPLAY_LATENCY
+)
+from utils.common_functions import create_directory_structure
+
+# Query parameters left out of the archive and of the requests matching
+PRIVATE_PARAMETERS = {"key"}
+RESULTS_PATH_PATTERN = re.compile(r".*/measurements/\d+/results/$")
+PROBE_PATH_PATTERN = re.compile(r".*/probes/(\d+)/$")
+PROBES_PATH_PATTERN = re.compile(r".*/probes/$")
+
+
+def get_request_key(method: str, path: str, parameters: list,
+                    content_hash: str = "") -> str:
+    """
+    Method, path, sorted query parameters, without the API key, and hash of
+    the body, so the measurements created at once are told apart
+    """
+    return "{} {}?{} {}".format(method, path, "&".join(
+        "{}={}".format(name, value)
+        for name, value in sorted(parameters)
+        if name not in PRIVATE_PARAMETERS), content_hash)
+
+
+def get_content_hash(request: httpx.Request) -> str:
+    if not request.content:
+        return ""
+    return hashlib.sha256(request.content).hexdigest()
+
+
+class AtlasArchive:
+    """
+    Raw answers of the RIPE Atlas API, one JSON line per request answered
+    with the method, path, query parameters (without the API key) and hash
+    of the body of the request, the status code and the body as received.
+    The lines are appended under an exclusive lock of the file, so several
+    processes can record at the same time.
+
+    The replay serves the answers of every request key in the order they
+    were recorded, repeating the last one, so a run polling a measurement
+    sees its status and results arrive as the recorded run did. The results
+    polled from a timestamp not recorded are the ones, measured at that
+    timestamp or later, that had arrived by the same poll of the recorded
+    run, so the results uploaded late arrive late again. The probes looked
+    up in chunks not recorded are taken from every probe recorded.
+    """
+
+    def __init__(self, archive_path: str = ATLAS_ARCHIVE_PATH):
+        self._filepath = archive_path + "responses.jsonl"
+        self._lock = threading.Lock()
+        self._answers = None
+        self._positions = {}
+        self._results = {}
+        self._results_polls = {}
+        self._probes = {}
+
+    def get_filepath(self) -> str:
+        return self._filepath
+
+    def record(self, request: httpx.Request, status_code: int,
+               body: str) -> None:
+        line = json.dumps({
+            "method": request.method,
+            "path": request.url.path,
+            "params": [[name, value] for name, value in
+                       request.url.params.multi_items()
+                       if name not in PRIVATE_PARAMETERS],
+            "content_hash": get_content_hash(request),
+            "status": status_code,
+            "body": body,
+            "time": time.time()
+        }, separators=(",", ":")) + "\n"
+        with self._lock:
+            create_directory_structure(self._filepath)
+            with open(self._filepath, "a") as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                file.write(line)
+                file.flush()
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def load(self) -> None:
+        """Reads the answers recorded, before the first replay"""
+        answers = {}
+        results = {}
+        results_polls = {}
+        probes = {}
+        if os.path.exists(self._filepath):
+            with open(self._filepath) as file:
+                for line in file:
+                    # A line cut by a process killed while recording
+                    try:
+                        answer = json.loads(line)
+                    except ValueError:
+                        continue
+                    answers.setdefault(get_request_key(
+                        answer["method"], answer["path"], answer["params"],
+                        answer["content_hash"]), []).append(
+                        (answer["status"], answer["body"]))
+                    if answer["method"] != "GET":
+                        continue
+                    if RESULTS_PATH_PATTERN.match(answer["path"]):
+                        # Every result with the poll it first came in
+                        poll = results_polls.get(answer["path"], 0)
+                        results_polls[answer["path"]] = poll + 1
+                        path_results = results.setdefault(answer["path"], {})
+                        if answer["status"] != 200:
+                            continue
+                        for result in json.loads(answer["body"]):
+                            path_results.setdefault((
+                                result.get("prb_id"),
+                                result.get("timestamp")), (poll, result))
+                    elif answer["status"] != 200:
+                        continue
+                    elif PROBE_PATH_PATTERN.match(answer["path"]):
+                        probe = json.loads(answer["body"])
+                        probes[probe["id"]] = probe
+                    elif PROBES_PATH_PATTERN.match(answer["path"]):
+                        for probe in json.loads(answer["body"])["results"]:
+                            probes[probe["id"]] = probe
+        with self._lock:
+            self._answers = answers
+            self._positions = {}
+            self._results = results
+            self._results_polls = {}
+            self._probes = probes
+
+    def get_answer(self, request: httpx.Request) -> tuple:
+        """(status code, body) of the request, 404 if it is not archived"""
+        if self._answers is None:
+            self.load()
+        path = request.url.path
+        parameters = request.url.params.multi_items()
+        key = get_request_key(request.method, path, parameters,
+                              get_content_hash(request))
+        with self._lock:
+            poll = None
+            if request.method == "GET" and path in self._results:
+                poll = self._results_polls.get(path, 0)
+                self._results_polls[path] = poll + 1
+            if key in self._answers:
+                answers = self._answers[key]
+                position = self._positions.get(key, 0)
+                self._positions[key] = min(position + 1, len(answers) - 1)
+                return answers[position]
+            parameters = dict(parameters)
+            if poll is not None:
+                start = int(parameters.get("start", 0))
+                return 200, json.dumps([
+                    result for arrival, result in self._results[path].values()
+                    if arrival <= poll and
+                    (result.get("timestamp") or 0) >= start])
+            probe_match = PROBE_PATH_PATTERN.match(path)
+            if request.method == "GET" and probe_match and \
+                    int(probe_match.group(1)) in self._probes:
+                return 200, json.dumps(
+                    self._probes[int(probe_match.group(1))])
+            if request.method == "GET" and \
+                    PROBES_PATH_PATTERN.match(path) and \
+                    "id__in" in parameters:
+                probes = [self._probes[int(probe_id)] for probe_id in
+                          parameters["id__in"].split(",")
+                          if int(probe_id) in self._probes]
+                return 200, json.dumps({"count": len(probes), "next": None,
+                                        "previous": None,
+                                        "results": probes})
+            if request.method == "DELETE":
+                # Stopping a measurement the recorded run did not stop
+                return 204, ""
+        return 404, json.dumps({"error": {
+            "status": 404, "detail": "Not in the Atlas archive"}})
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport saving in the archive every answer received, except the
+    rate limited and server errors ones, which are retried
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport,
+                 archive: AtlasArchive):
+        self._transport = transport
+        self._archive = archive
+
+    async def handle_async_request(
+            self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        # Answers to be retried are not part of the conversation
+        if response.status_code >= 500 or response.status_code == 429:
+            return response
+        body = await response.aread()
+        await response.aclose()
+        self._archive.record(request, response.status_code,
+                             body.decode(errors="replace"))
+        # The body read is decoded, the answer is built again without the
+        # encoding headers
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.lower() not in ("content-encoding",
+                                           "content-length",
+                                           "transfer-encoding")]
+        return httpx.Response(response.status_code, headers=headers,
+                              content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport answering from the archive, latency seconds after each
+    request, without any network access
+    """
+
+    def __init__(self, archive: AtlasArchive,
+                 latency: float = ATLAS_REPLAY_LATENCY):
+        self._archive = archive
+        self._latency = latency
+
+    async def handle_async_request(
+            self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        if self._latency > 0:
+            await asyncio.sleep(self._latency)
+        status_code, body = self._archive.get_answer(request)
+        return httpx.Response(
+            status_code,
+            headers={"Content-Type": "application/json"} if body else {},
+            content=body.encode(), request=request)
+
+
+__atlas_archives = {}
+__atlas_archives_lock = threading.Lock()
+
+
+def get_atlas_archive(archive_path: str = ATLAS_ARCHIVE_PATH) -> AtlasArchive:
+    """Archive shared by every client of the process"""
+    with __atlas_archives_lock:
+        if archive_path not in __atlas_archives:
+            __atlas_archives[archive_path] = AtlasArchive(archive_path)
+        return __atlas_archives[archive_path]
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import asyncio
+import random
+import threading
+import time
+import httpx
+# internal modules imports
+from utils.constants import (
+    RIPE_ATLAS_API_BASE_URL,
+    ATLAS_MAX_CONCURRENCY,
+    ATLAS_CONNECT_TIMEOUT,
+    ATLAS_REQUEST_TIMEOUT,
+    ATLAS_PROBES_PAGE_SIZE,
+    ATLAS_POLL_MIN_DELAY,
+    ATLAS_POLL_MAX_DELAY,
+    ATLAS_POLL_BACKOFF,
+    ATLAS_POLL_JITTER,
+    ATLAS_RESULTS_MAX_WAIT,
+    ATLAS_RESULTS_WINDOW,
+    ATLAS_BACKEND,
+    ATLAS_BACKENDS,
+    ATLAS_REPLAY_POLL_SCALE
+)
+from utils.custom_exceptions import (
+    InternalError,
+    ResultError
+)
+from utils.http_client import (
+    ResilientTransport,
+    run_sync
+)
+from utils.atlas_archive import (
+    RecordingTransport,
+    ReplayTransport,
+    get_atlas_archive
+)
+
+# Status of a measurement before it starts
+MEASUREMENT_PENDING_STATUSES = ["Specified", "Scheduled", "synchronizing"]
+
+
+class AtlasClient:
+    """
+    Asynchronous client of the RIPE Atlas API. All the requests share one
+    pooled HTTP connection and at most max_concurrency of them are in
+    flight at the same time. It must be used from a single event loop.
+
+    The backend is where the answers come from: "online" from the API,
+    "record" from the API saving them in the Atlas archive, "replay" from
+    the archive without network access, where the waits between polls are
+    scaled by ATLAS_REPLAY_POLL_SCALE.
+    """
+
+    def __init__(self, key: str = None,
+                 base_url: str = RIPE_ATLAS_API_BASE_URL,
+                 max_concurrency: int = ATLAS_MAX_CONCURRENCY,
+                 connect_timeout: float = ATLAS_CONNECT_TIMEOUT,
+                 request_timeout: float = ATLAS_REQUEST_TIMEOUT,
+                 transport: httpx.AsyncBaseTransport = None,
+                 backend: str = ATLAS_BACKEND):
+        if backend not in ATLAS_BACKENDS:
+            raise ValueError("Unknown Atlas backend {}, expected one of {}".
+                             format(backend, ATLAS_BACKENDS))
+        self._key = key
+        self._base_url = base_url
+        self._max_concurrency = max_concurrency
+        self._timeout = httpx.Timeout(request_timeout,
+                                      connect=connect_timeout)
+        self._transport = transport
+        self._backend = backend
+        self._poll_scale = ATLAS_REPLAY_POLL_SCALE \
+            if backend == "replay" else 1
+        self._client = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exception_info):
+        await self.close()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Rate limits, retries and statistics of the shared HTTP layer
+            # over the pooled connections, or over the archive in replay
+            if self._backend == "replay":
+                transport = ResilientTransport(
+                    ReplayTransport(get_atlas_archive()), rate_limited=False)
+            else:
+                transport = self._transport or httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=self._max_concurrency,
+                        max_keepalive_connections=self._max_concurrency))
+                if self._backend == "record":
+                    transport = RecordingTransport(transport,
+                                                   get_atlas_archive())
+                transport = ResilientTransport(transport)
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                timeout=self._timeout,
+                transport=transport,
+                follow_redirects=True)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._client
+
+    async def request(self, method: str, path: str, params: dict = None,
+                      json: dict = None):
+        """
+        Request a path of the API, relative to the base URL, or an absolute
+        URL as the "next" links of paginated answers. Raises
+        httpx.HTTPStatusError if the answer is not successful.
+        """
+        client = self._get_client()
+        async with self._semaphore:
+            response = await client.request(method, path, params=params,
+                                            json=json)
+        response.raise_for_status()
+        # Some answers, as the one of stopping a measurement, have no body
+        return response.json() if response.content else None
+
+    # Measurements
+    async def create_measurement(self, data: dict) -> list:
+        """Creates the measurements of data, returns their IDs"""
+        result = await self.request("POST", "measurements/",
+                                    params={"key": self._key}, json=data)
+        return result["measurements"]
+
+    async def get_measurement(self, measurement_id: int,
+                              fields: str = None) -> dict:
+        params = {"fields": fields} if fields else None
+        return await self.request(
+            "GET", "measurements/{}/".format(measurement_id), params=params)
+
+    async def get_measurement_status(self, measurement_id: int) -> str:
+        measurement = await self.get_measurement(measurement_id, "status")
+        return measurement["status"]["name"]
+
+    async def stop_measurement(self, measurement_id: int) -> None:
+        await self.request(
+            "DELETE", "measurements/{}/".format(measurement_id),
+            params={"key": self._key})
+
+    async def get_results(self, measurement_id: int,
+                          latest: int = None, **filters) -> list:
+        if latest is not None:
+            return await self.request(
+                "GET", "measurements/{}/latest/".format(measurement_id),
+                params={"versions": latest})
+        return await self.request(
+            "GET", "measurements/{}/results/".format(measurement_id),
+            params=filters or None)
+
+    async def wait_probes_allocated(self, measurement_id: int,
+                                    fields_delay: float,
+                                    notification=None) -> list:
+        """
+        Waits until the measurement is ongoing and returns the probes
+        allocated to it. The delay between queries starts at fields_delay
+        and grows with the poll backoff up to ATLAS_POLL_MAX_DELAY.
+        """
+        fields_delay = min(fields_delay, ATLAS_POLL_MAX_DELAY)
+        while True:
+            delay = get_poll_delay(fields_delay)
+            if notification is not None:
+                notification(delay)
+            await asyncio.sleep(delay * self._poll_scale)
+            fields_delay = min(fields_delay * ATLAS_POLL_BACKOFF,
+                               ATLAS_POLL_MAX_DELAY)
+            meta = await self.get_measurement(measurement_id,
+                                              "probes,status")
+            if meta["status"]["name"] in MEASUREMENT_PENDING_STATUSES:
+                # Not done, loop
+                continue
+            elif meta["status"]["name"] == "Ongoing":
+                return meta["probes"]
+            else:
+                raise InternalError(
+                    "Internal error in #%s, unexpected status when querying "
+                    "the measurement fields: \"%s\"" % (
+                        measurement_id, meta["status"]))
+
+    async def wait_results(self, measurement_id: int, num_probes: int,
+                           percentage_required: float,
+                           results_delay: float = None,
+                           maximum_time_for_results: float =
+                           ATLAS_RESULTS_MAX_WAIT,
+                           notification=None,
+                           results_notification=None) -> list:
+        """
+        Polls the results until percentage_required of the probes have
+        answered, the measurement stops or maximum_time_for_results passes.
+
+        results_delay is the expected time until the first results, the
+        following polls wait ATLAS_POLL_MIN_DELAY while new results keep
+        arriving and back off up to ATLAS_POLL_MAX_DELAY when they do not.
+        Only the results measured from ATLAS_RESULTS_WINDOW before the newest
+        one received are downloaded, so the ones uploaded late by probes that
+        measured earlier are not missed, and the status is only queried when
+        a poll brings nothing new.
+        results_notification(results) is called in a worker thread, not to
+        hold the polls of the other measurements, with the results so far
+        every time new ones arrive, if it returns True the measurement is
+        stopped and those results returned.
+        """
+        delay = min(max(results_delay or ATLAS_POLL_MIN_DELAY,
+                        ATLAS_POLL_MIN_DELAY), ATLAS_POLL_MAX_DELAY)
+        attempts = 0
+        start = time.time()
+        elapsed = 0
+        result_data = None
+        results_received = set()
+        last_timestamp = None
+        while elapsed < maximum_time_for_results:
+            sleep_delay = get_poll_delay(delay)
+            if notification is not None:
+                notification(sleep_delay)
+            print("Wait {:.1f} seconds for results. Number of attempts {}".
+                  format(sleep_delay, attempts))
+            await asyncio.sleep(sleep_delay * self._poll_scale)
+            attempts += 1
+            # In replay the time waited counts as in the recorded run
+            elapsed = (time.time() - start) / self._poll_scale
+            try:
+                if last_timestamp is None:
+                    new_results = await self.get_results(measurement_id)
+                else:
+                    new_results = await self.get_results(
+                        measurement_id,
+                        start=max(last_timestamp - ATLAS_RESULTS_WINDOW, 0))
+            except httpx.HTTPStatusError as e:
+                # Yes, we may have no result file at all for some time
+                if e.response.status_code != 404:
+                    raise ResultError("%s %s" % (
+                        e.response.status_code, e.response.reason_phrase))
+                delay = min(delay * ATLAS_POLL_BACKOFF, ATLAS_POLL_MAX_DELAY)
+                continue
+
+            if result_data is None:
+                result_data = []
+            # The polls overlap, skip the results already seen
+            new_results = [
+                result for result in new_results
+                if (result.get("prb_id"), result.get("timestamp"))
+                not in results_received]
+            for result in new_results:
+                results_received.add(
+                    (result.get("prb_id"), result.get("timestamp")))
+                if result.get("timestamp") is not None:
+                    last_timestamp = max(last_timestamp or 0,
+                                         result["timestamp"])
+            result_data += new_results
+            if new_results and results_notification is not None and \
+                    await asyncio.to_thread(results_notification,
+                                            list(result_data)):
+                # The caller has enough results, the probes left are not
+                # needed any more
+                await self.stop_measurement(measurement_id)
+                break
+
+            if len(result_data) >= num_probes * percentage_required:
+                # Requesting a strict equality may be too strict: if an
+                # allocated probe does not respond, we will have to wait
+                # for the stop of the measurement (many minutes). Anyway,
+                # there is also the problem that a probe may have sent
+                # only a part of its measurements.
+                break
+            if new_results:
+                # Results are arriving, poll again soon
+                delay = ATLAS_POLL_MIN_DELAY
+                continue
+
+            delay = min(delay * ATLAS_POLL_BACKOFF, ATLAS_POLL_MAX_DELAY)
+            status = await self.get_measurement_status(measurement_id)
+            if status == "Ongoing":
+                # Wait a bit more
+                continue
+            elif status == "Stopped":
+                # Even if not enough probes
+                break
+            else:
+                raise InternalError(
+                    "Unexpected status when retrieving the measurement: "
+                    "\"%s\"" % status)
+        if result_data is None:
+            raise ResultError("No results retrieved")
+        return result_data
+
+    # Probes
+    async def get_probe(self, probe_id: int) -> dict:
+        return await self.request("GET", "probes/{}/".format(probe_id))
+
+    async def get_probes(self, **filters) -> list:
+        """Every probe matching the filters, following the pagination"""
+        page = await self.request("GET", "probes/", params=filters)
+        probes = page["results"]
+        while page.get("next"):
+            page = await self.request("GET", page["next"])
+            probes += page["results"]
+        return probes
+
+    async def get_probes_by_id(self, probes_ids: list,
+                               fields: str = "id,geometry") -> list:
+        """
+        Bulk lookup of probes with the id__in filter. The IDs are split in
+        chunks of ATLAS_PROBES_PAGE_SIZE requested concurrently.
+        """
+        chunks = [probes_ids[i:i + ATLAS_PROBES_PAGE_SIZE]
+                  for i in range(0, len(probes_ids), ATLAS_PROBES_PAGE_SIZE)]
+        pages = await asyncio.gather(*[
+            self.get_probes(id__in=",".join(map(str, chunk)), fields=fields,
+                            page_size=ATLAS_PROBES_PAGE_SIZE)
+            for chunk in chunks])
+        return [probe for page in pages for probe in page]
+
+
+def get_poll_delay(delay: float) -> float:
+    """Delay with a random jitter, so polls of many measurements spread"""
+    return delay * (1 + random.uniform(-ATLAS_POLL_JITTER, ATLAS_POLL_JITTER))
+
+
+class SyncAtlasClient:
+    """
+    Blocking facade of an AtlasClient. The coroutines run in a background
+    event loop shared by the process, so the pooled connection is kept
+    between calls and several threads can wait on measurements at once.
+    """
+
+    def __init__(self, client: AtlasClient):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        def blocking_call(*args, **kwargs):
+            return run_sync(attribute(*args, **kwargs))
+        return blocking_call
+
+
+__sync_clients = {}
+__sync_clients_lock = threading.Lock()
+
+
+def get_sync_atlas_client(key: str = None) -> SyncAtlasClient:
+    """Process wide blocking client, one per API key"""
+    with __sync_clients_lock:
+        if key not in __sync_clients:
+            __sync_clients[key] = SyncAtlasClient(AtlasClient(key=key))
+    return __sync_clients[key]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import fcntl
+import json
+import os
+import threading
+# internal modules imports
+from utils.constants import (
+    CAMPAIGN_JOURNAL_PATH,
+    CAMPAIGN_JOURNAL_FSYNC
+)
+from utils.common_functions import create_directory_structure
+
+
+class CampaignJournal:
+    """
+    Append-only JSON Lines journal of the progress of a campaign, one line
+    {"kind", "key", fields} per change of a unit of work: a measurement
+    submitted with its ID, its results saved, the analyses run on it. The
+    fields of the lines of a unit are merged in order, so a line only needs
+    what changed. Every line is written under an exclusive lock of the file
+    and synced to disk before record() returns, a run killed at any moment
+    loses at most the line being written, which is skipped when the journal
+    is read again.
+    """
+
+    def __init__(self, campaign_name: str,
+                 journal_path: str = CAMPAIGN_JOURNAL_PATH,
+                 fsync: bool = CAMPAIGN_JOURNAL_FSYNC):
+        self._filepath = "{}{}.jsonl".format(journal_path, campaign_name)
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self._units = self.read()
+
+    def get_filepath(self) -> str:
+        return self._filepath
+
+    def read(self) -> dict:
+        """State of every unit, {kind: {key: fields}}, read from the file"""
+        units = {}
+        if not os.path.exists(self._filepath):
+            return units
+        with open(self._filepath) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                units.setdefault(record.pop("kind"), {}).setdefault(
+                    record.pop("key"), {}).update(record)
+        return units
+
+    def get_units(self, kind: str) -> dict:
+        """Copy of the state of the units of a kind, {key: fields}"""
+        with self._lock:
+            return {key: dict(fields)
+                    for key, fields in self._units.get(kind, {}).items()}
+
+    def get(self, kind: str, key: str) -> dict:
+        """Copy of the state of a unit, None if it was never recorded"""
+        with self._lock:
+            fields = self._units.get(kind, {}).get(key)
+            return dict(fields) if fields is not None else None
+
+    def record(self, kind: str, key: str, **fields) -> None:
+        self.record_many(kind, {key: fields})
+
+    def record_many(self, kind: str, units: dict) -> None:
+        """Records the fields of several units, {key: fields}, at once"""
+        lines = "".join(
+            json.dumps(dict(kind=kind, key=key, **fields),
+                       separators=(",", ":")) + "\n"
+            for key, fields in units.items())
+        with self._lock:
+            create_directory_structure(self._filepath)
+            with open(self._filepath, "ab") as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                # A line cut by a killed run must not swallow the next one
+                if file.tell() > 0 and not self._ends_with_newline():
+                    lines = "\n" + lines
+                file.write(lines.encode())
+                file.flush()
+                if self._fsync:
+                    os.fsync(file.fileno())
+                fcntl.flock(file, fcntl.LOCK_UN)
+            for key, fields in units.items():
+                self._units.setdefault(kind, {}).setdefault(
+                    key, {}).update(fields)
+
+    def compact(self) -> None:
+        """
+        Rewrites the journal with one line per unit, only while no other
+        run is using the campaign
+        """
+        with self._lock:
+            temporary_filepath = "{}.{}.tmp".format(self._filepath,
+                                                    os.getpid())
+            create_directory_structure(temporary_filepath)
+            with open(temporary_filepath, "w") as file:
+                for kind, units in self._units.items():
+                    for key, fields in units.items():
+                        file.write(json.dumps(
+                            dict(kind=kind, key=key, **fields),
+                            separators=(",", ":")) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_filepath, self._filepath)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self._filepath, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+
+__campaign_journals = {}
+__campaign_journals_lock = threading.Lock()
+
+
+def get_campaign_journal(campaign_name: str) -> CampaignJournal:
+    """Journal of the campaign shared by every user in the process"""
+    with __campaign_journals_lock:
+        if campaign_name not in __campaign_journals:
+            __campaign_journals[campaign_name] = \
+                CampaignJournal(campaign_name)
+        return __campaign_journals[campaign_name]
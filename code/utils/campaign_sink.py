@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+# internal modules imports
+from utils.constants import (
+    CAMPAIGN_SINK_ENABLED,
+    CAMPAIGN_SINK_PATH,
+    OUTPUT_FORMAT
+)
+from utils.common_functions import (
+    create_directory_structure,
+    json_file_to_dict,
+    dict_to_json_file
+)
+
+
+class CampaignSink:
+    """
+    Append-only JSON Lines file with the results and ground truth
+    validations of a campaign, one {"filepath", "data"} record per line,
+    instead of one file per analysis. filepath is where the file would have
+    been written, export() writes them there.
+
+    put() only enqueues the record, a background thread appends the lines
+    waiting in batches, each batch under an exclusive lock of the file so
+    the workers of several processes can share the sink of a campaign.
+    When the same filepath is put again the last record wins.
+    """
+
+    def __init__(self, campaign_name: str,
+                 sink_path: str = CAMPAIGN_SINK_PATH):
+        self._filepath = "{}{}.jsonl".format(sink_path, campaign_name)
+        self._records = {}
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def get_filepath(self) -> str:
+        return self._filepath
+
+    def put(self, filepath: str, data: dict) -> None:
+        self._records[filepath] = data
+        self._queue.put(json.dumps({"filepath": filepath, "data": data},
+                                   separators=(",", ":")) + "\n")
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_lines, name="campaign-sink",
+                    daemon=True)
+                self._writer.start()
+
+    def get(self, filepath: str):
+        """Record of filepath, None if it is not in the sink"""
+        if filepath not in self._records:
+            self.flush()
+            self._records.update(self.read())
+        return self._records.get(filepath)
+
+    def get_filepaths(self) -> list:
+        """Filepaths of every record put or appended to the sink file"""
+        self.flush()
+        self._records.update(self.read())
+        return list(self._records)
+
+    def read(self) -> dict:
+        """Last record of every filepath appended to the sink file"""
+        if not os.path.exists(self._filepath):
+            return {}
+        records = {}
+        with open(self._filepath) as file:
+            for line in file:
+                # A line cut by a process killed while appending is skipped
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["filepath"]] = record["data"]
+        return records
+
+    def flush(self) -> None:
+        """Waits until every record put is written"""
+        self._queue.join()
+
+    def close(self) -> None:
+        with self._writer_lock:
+            if self._writer is not None:
+                self._queue.put(None)
+                self._writer.join()
+                self._writer = None
+
+    def export(self, output_format: str = OUTPUT_FORMAT) -> int:
+        """Writes every record of the sink to its own file"""
+        self.flush()
+        records = self.read()
+        for filepath, data in records.items():
+            dict_to_json_file(data, filepath, output_format=output_format)
+        return len(records)
+
+    def _write_lines(self) -> None:
+        create_directory_structure(self._filepath)
+        while True:
+            lines = [self._queue.get()]
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closed = lines[-1] is None
+            lines = [line for line in lines if line is not None]
+            if lines:
+                with open(self._filepath, "a") as file:
+                    fcntl.flock(file, fcntl.LOCK_EX)
+                    file.write("".join(lines))
+                    file.flush()
+                    fcntl.flock(file, fcntl.LOCK_UN)
+            for _ in range(len(lines) + int(closed)):
+                self._queue.task_done()
+            if closed:
+                return
+
+
+__campaign_sinks = {}
+__campaign_sinks_lock = threading.Lock()
+
+
+def get_campaign_sink(campaign_name: str) -> CampaignSink:
+    with __campaign_sinks_lock:
+        if campaign_name not in __campaign_sinks:
+            __campaign_sinks[campaign_name] = CampaignSink(campaign_name)
+        return __campaign_sinks[campaign_name]
+
+
+@atexit.register
+def close_campaign_sinks() -> None:
+    with __campaign_sinks_lock:
+        for campaign_sink in __campaign_sinks.values():
+            campaign_sink.close()
+
+
+def write_output_file(data: dict, filepath: str,
+                      campaign_name: str = None) -> None:
+    """
+    Saves a results or validation file, in the sink of the campaign when
+    CAMPAIGN_SINK_ENABLED, as a file of its own otherwise
+    """
+    if CAMPAIGN_SINK_ENABLED and campaign_name is not None:
+        get_campaign_sink(campaign_name).put(filepath, data)
+    else:
+        dict_to_json_file(data, filepath, output_format=OUTPUT_FORMAT)
+
+
+def list_output_files(campaign_path: str, campaign_name: str = None) -> list:
+    """
+    Filepaths of the .json files saved by write_output_file in
+    campaign_path, as files of their own or in the sink of the campaign
+    """
+    filepaths = set()
+    if os.path.isdir(campaign_path):
+        filepaths.update(os.path.join(campaign_path, filename)
+                         for filename in os.listdir(campaign_path)
+                         if filename.endswith(".json"))
+    if CAMPAIGN_SINK_ENABLED and campaign_name is not None:
+        directory = os.path.normpath(campaign_path)
+        filepaths.update(
+            filepath for filepath in
+            get_campaign_sink(campaign_name).get_filepaths()
+            if os.path.dirname(os.path.normpath(filepath)) == directory)
+    return sorted(filepaths)
+
+
+def read_output_file(filepath: str, campaign_name: str = None) -> dict:
+    """Reads a file saved by write_output_file, wherever it is"""
+    if CAMPAIGN_SINK_ENABLED and campaign_name is not None:
+        data = get_campaign_sink(campaign_name).get(filepath)
+        if data is not None:
+            return data
+    return json_file_to_dict(filepath)
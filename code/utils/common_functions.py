@@ -2,9 +2,9 @@
 # -*- coding: utf-8 -*-
 
 # external modules imports
-import requests
 import json
 import csv
+import hashlib
 import math
 import os
 import pandas as pd
@@ -25,6 +25,11 @@ from utils.constants import (
     VERLOC_APROX_PATH,
     VERLOC_GAP
 )
+from utils.http_client import get_json
+from utils.json_io import (
+    read_json_file,
+    write_json_file
+)
 
 
 def create_directory_structure(path: str) -> None:
@@ -37,36 +42,41 @@ def create_directory_structure(path: str) -> None:
         os.makedirs(path)
 
 
+__files_hashes = {}
+
+
+def get_file_hash(filepath: str) -> str:
+    """SHA-256 of the contents of a file, computed once per version"""
+    stat = os.stat(filepath)
+    key = (filepath, stat.st_mtime_ns, stat.st_size)
+    if key not in __files_hashes:
+        file_hash = hashlib.sha256()
+        with open(filepath, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                file_hash.update(chunk)
+        __files_hashes[key] = file_hash.hexdigest()
+    return __files_hashes[key]
+
+
 def update_root_servers_json():
     for root_name in ROOT_SERVERS_NAMES:
-        request = requests.get(
-            url=ROOT_SERVERS_URL + root_name + "/json").json()
+        request = get_json(ROOT_SERVERS_URL + root_name + "/json")
         root_servers_filename = "root_servers_{}.json".format(root_name)
         dict_to_json_file(dict=request,
                           file_path=ROOT_SERVERS_PATH + root_servers_filename)
 
 
 def json_file_to_dict(file_path: str) -> dict:
-    create_directory_structure(file_path)
-    with open(file_path) as file:
-        raw_json = file.read()
-
-    return json.loads(raw_json)
+    return read_json_file(file_path)
 
 
 def json_file_to_list(file_path: str) -> list:
-    create_directory_structure(file_path)
-    with open(file_path) as file:
-        raw_json = file.read()
+    return read_json_file(file_path)
 
-    return json.loads(raw_json)
 
-
-def dict_to_json_file(dict: dict, file_path: str, sort_keys: bool = False):
-    create_directory_structure(file_path)
-    file = open(file_path, "w")
-    file.write(json.dumps(dict, indent=4, sort_keys=sort_keys))
-    file.close()
+def dict_to_json_file(dict: dict, file_path: str, sort_keys: bool = False,
+                      output_format: str = "pretty"):
+    write_json_file(dict, file_path, sort_keys, output_format)
 
 
 def list_to_json_file(dict: list, file_path: str):
@@ -198,6 +208,21 @@ def get_list_files_in_path(path: str) -> list:
     return files_in_path
 
 
+def get_probe_set_selection_and_number(probes_filepath: str) -> tuple:
+    """
+    Probe sets are named <region>_<number>.json, mesh ones have a region
+    ending in -section and the number is the grid spacing
+    """
+    probe_set_name_division = probes_filepath.split("/")[-1].split("_")
+    if "section" in probe_set_name_division[0]:
+        probe_selection = "mesh"
+    else:
+        probe_selection = "area"
+    probe_set_number = float(".".join(
+        map(str, probe_set_name_division[1].split(".")[:-1])))
+    return probe_selection, probe_set_number
+
+
 def get_list_folders_in_path(path: str) -> list:
     dirs_in_path = \
         [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
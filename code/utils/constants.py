@@ -13,6 +13,8 @@ NORTH_CENTRAL_COUNTRIES_FILE_PATH = COUNTRIES_SETS_PATH + \
                                     "North-Central_countries.json"
 ADEQUATE_INTERNATIONAL_TRANSFER_COUNTRIES_FILE_PATH = \
     COUNTRIES_SETS_PATH + "adequate_international_transfer_countries.json"
+# Named areas, either a bounding box or a countries set file
+AREAS_FILE_PATH = COUNTRIES_SETS_PATH + "areas.json"
 #AREA_OF_INTEREST_FILEPATH = NORTH_CENTRAL_COUNTRIES_FILE_PATH
 AREA_OF_INTEREST_FILEPATH = ALL_COUNTRIES_FILE_PATH
 
@@ -27,9 +29,73 @@ GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH = \
 GT_VALIDATIONS_STATISTICS = \
     GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH + "statistics/"
 
+# Results index
+RESULTS_INDEX_FILEPATH = __DATASETS_PATH + "results_index.sqlite"
+# Register every results and validation file written in the index
+RESULTS_INDEX_ENABLED = True
+
+# Threads reading JSON files when aggregating campaign statistics
+STATISTICS_READ_WORKERS = 8
+
+# Caches
+CACHE_PATH = __DATASETS_PATH + "cache/"
+GROUND_TRUTH_CACHE_PATH = CACHE_PATH + "groundtruth/"
+# Keep a pickled copy of every parsed ground truth file in the cache path
+GROUND_TRUTH_DISK_CACHE = False
+# Local copy of the RIPE Atlas probes metadata
+PROBE_CATALOGUE_FILEPATH = CACHE_PATH + "probe_catalogue.sqlite"
+PROBE_CATALOGUE_TTL = 24 * 60 * 60  # seconds
+# Use only the probes stored in the catalogue, without the API
+PROBE_CATALOGUE_OFFLINE = False
+# Countries borders as WKB and mesh grids intersecting them
+COUNTRY_BORDERS_CACHE_PATH = CACHE_PATH + "country_borders/"
+# Outcome of the iGreedy analyses, reused when the measurement, parameters,
+# airports and engine version are the same. Increase the engine version
+# when the analysis code changes to invalidate every entry.
+ANALYSIS_CACHE_ENABLED = True
+ANALYSIS_CACHE_PATH = CACHE_PATH + "analysis/"
+ANALYSIS_ENGINE_VERSION = 1
+
+# Serialization of the measurements, results and ground truth validations
+# files: "pretty" (indented JSON), "compact" (JSON in one line), "gzip"
+# (compact JSON compressed) or "msgpack" (needs the msgpack package). The
+# files keep their names, readers detect the format from the content.
+OUTPUT_FORMAT = "pretty"
+OUTPUT_FORMATS = ["pretty", "compact", "gzip", "msgpack"]
+# JSON library parsing every file and writing the compact formats: "orjson",
+# "ujson", "json" (standard library) or "auto" for the fastest installed.
+# orjson writes NaN as null.
+JSON_BACKEND = "auto"
 # Measurements
 MEASUREMENTS_PATH = __DATASETS_PATH + "measurements/"
 MEASUREMENTS_CAMPAIGNS_PATH = MEASUREMENTS_PATH + "campaigns/"
+# Save a columnar .npz copy next to every measurement JSON file, the loaders
+# read it instead of parsing the JSON
+MEASUREMENT_COLUMNAR_STORE = True
+# Characters read at a time when a measurement JSON file is parsed
+# incrementally
+MEASUREMENT_STREAM_CHUNK_SIZE = 1 << 16
+# Journal of the progress of every campaign: measurements submitted and
+# saved, analyses run. Each change is synced to disk with
+# CAMPAIGN_JOURNAL_FSYNC
+CAMPAIGN_JOURNAL_PATH = MEASUREMENTS_PATH + "journal/"
+CAMPAIGN_JOURNAL_FSYNC = True
+# State files of the campaign scheduler before the journal, imported into it
+CAMPAIGN_SCHEDULER_STATE_PATH = MEASUREMENTS_PATH + "scheduler/"
+CAMPAIGN_MAX_MEASUREMENTS_IN_FLIGHT = 20
+CAMPAIGN_SUBMISSIONS_PER_MINUTE = 30
+# Create the measurements of targets sharing a probes set in one request
+CAMPAIGN_BATCH_SUBMISSIONS = True
+CAMPAIGN_DEFINITIONS_PER_SUBMISSION = 20
+# Threads saving and analyzing the measurements completed
+CAMPAIGN_ANALYSIS_WORKERS = 4
+
+# Pipelines
+# Pipelines run by code/pipeline.py: their definitions, the fingerprints of
+# the nodes run and the nodes run at the same time
+PIPELINES_PATH = __DATASETS_PATH + "pipelines/"
+PIPELINE_STATE_PATH = PIPELINES_PATH + "state/"
+PIPELINE_WORKERS = 4
 
 # Hunter Measurements
 HUNTER_MEASUREMENTS_PATH = __DATASETS_PATH + "hunter_measurements/"
@@ -40,10 +106,18 @@ HUNTER_MEASUREMENTS_CAMPAIGNS_STATISTICS_PATH = \
 # Results
 RESULTS_PATH = __DATASETS_PATH + "results/"
 RESULTS_CAMPAIGNS_PATH = RESULTS_PATH + "campaigns/"
+# Append the results and validations of a campaign to one JSON Lines file
+# instead of writing a file per analysis, see utils/campaign_sink.py
+CAMPAIGN_SINK_ENABLED = False
+CAMPAIGN_SINK_PATH = RESULTS_PATH + "sinks/"
 
 # Probes
 PROBES_SETS_PATH = __DATASETS_PATH + "probes_sets/"
 DEFAULT_PROBES_PATH = PROBES_SETS_PATH + "WW_10.json"
+# Seed of the random choice of a probe per section of the mesh probes sets,
+# None for a different selection every time. A probes set file can set its
+# own "seed".
+MESH_PROBES_SELECTION_SEED = None
 
 # Metrics comparison
 METRICS_CSV_PATH = __DATASETS_PATH + "ploted_metrics_csv/"
@@ -65,6 +139,41 @@ RIPE_ATLAS_API_BASE_URL = "https://atlas.ripe.net/api/v2/"
 RIPE_ATLAS_MEASUREMENTS_BASE_URL = RIPE_ATLAS_API_BASE_URL + "measurements/"
 RIPE_ATLAS_PROBES_BASE_URL = RIPE_ATLAS_API_BASE_URL + "probes/"
 
+# HTTP requests
+HTTP_RATE_LIMITS = {  # requests per second per host
+    "atlas.ripe.net": 10,
+    "root-servers.org": 2
+}
+HTTP_DEFAULT_RATE_LIMIT = 5
+HTTP_MAX_RETRIES = 5
+HTTP_BACKOFF_BASE = 1  # seconds, doubled on every retry
+HTTP_BACKOFF_MAX = 60  # seconds
+HTTP_TIMEOUT = 60  # seconds
+
+# RIPE Atlas client
+ATLAS_MAX_CONCURRENCY = 8  # requests in flight at the same time
+ATLAS_CONNECT_TIMEOUT = 10  # seconds
+ATLAS_REQUEST_TIMEOUT = 60  # seconds
+ATLAS_PROBES_PAGE_SIZE = 500  # probes per page in bulk lookups
+# Polling of the probes allocation and of the results of the measurements
+ATLAS_POLL_MIN_DELAY = 5  # seconds
+ATLAS_POLL_MAX_DELAY = 60  # seconds
+ATLAS_POLL_BACKOFF = 1.5  # delay factor after a poll without news
+ATLAS_POLL_JITTER = 0.1  # +- fraction of the delay
+ATLAS_RESULTS_MAX_WAIT = 360  # seconds
+# The timestamp of a result is when the probe measured, not when the result
+# reached Atlas: the polls ask again for the results measured up to this
+# long before the newest one received, to get the ones uploaded late
+ATLAS_RESULTS_WINDOW = 600  # seconds
+# Where the client gets its answers: "online" from atlas.ripe.net, "record"
+# from atlas.ripe.net saving them in the archive, or "replay" from the
+# archive, without network, see utils/atlas_archive.py
+ATLAS_BACKEND = "record"
+ATLAS_BACKENDS = ["online", "record", "replay"]
+ATLAS_ARCHIVE_PATH = __DATASETS_PATH + "atlas_archive/"
+ATLAS_REPLAY_LATENCY = 0.05  # seconds before each answer of the archive
+ATLAS_REPLAY_POLL_SCALE = 0.01  # factor of the waits between polls
+
 # Others
 ROOT_SERVERS_NAMES = [
     "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M"
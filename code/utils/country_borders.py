@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import os
+import shapely
+from shapely.geometry import (
+    MultiPolygon,
+    GeometryCollection,
+    shape
+)
+from shapely.strtree import STRtree
+# internal modules imports
+from utils.constants import (
+    COUNTRY_BORDERS_GEOJSON_FILEPATH,
+    COUNTRY_BORDERS_CACHE_PATH
+)
+from utils.common_functions import (
+    json_file_to_dict,
+    create_directory_structure
+)
+
+__borders_trees = {}
+
+
+def get_country_borders(
+        borders_filepath: str = COUNTRY_BORDERS_GEOJSON_FILEPATH) -> list:
+    """
+    Valid geometries of the countries borders. The GeoJSON is parsed and
+    fixed once, then the geometries are read from a WKB copy in the cache
+    path, rebuilt when the GeoJSON changes.
+    """
+    cache_filepath = "{}borders_{}.wkb".format(
+        COUNTRY_BORDERS_CACHE_PATH, os.stat(borders_filepath).st_mtime_ns)
+    if os.path.exists(cache_filepath):
+        with open(cache_filepath, "rb") as file:
+            return list(shapely.from_wkb(file.read()).geoms)
+
+    features = json_file_to_dict(borders_filepath)["features"]
+    # NOTE: buffer(0) is a trick for fixing scenarios where polygons have overlapping coordinates
+    borders = [shape(feature["geometry"]).buffer(0) for feature in features]
+    create_directory_structure(cache_filepath)
+    with open(cache_filepath, "wb") as file:
+        file.write(shapely.to_wkb(GeometryCollection(borders)))
+    return borders
+
+
+def get_country_borders_tree(
+        borders_filepath: str = COUNTRY_BORDERS_GEOJSON_FILEPATH) -> STRtree:
+    key = (borders_filepath, os.stat(borders_filepath).st_mtime_ns)
+    if key not in __borders_trees:
+        __borders_trees[key] = STRtree(get_country_borders(borders_filepath))
+    return __borders_trees[key]
+
+
+def get_polygons_intersecting_countries(
+        polygons: list,
+        borders_filepath: str = COUNTRY_BORDERS_GEOJSON_FILEPATH) \
+        -> MultiPolygon:
+    """Polygons, in order, that intersect any country border"""
+    if not polygons:
+        return MultiPolygon()
+    polygons_indexes, _ = get_country_borders_tree(borders_filepath).query(
+        polygons, predicate="intersects")
+    return MultiPolygon(
+        [polygons[index] for index in sorted(set(polygons_indexes.tolist()))])
+
+
+def get_mesh_grid_with_countries(
+        area: tuple, spacing: float, polygons_builder,
+        borders_filepath: str = COUNTRY_BORDERS_GEOJSON_FILEPATH) \
+        -> MultiPolygon:
+    """
+    Grid of the area, with the given spacing, restricted to the cells that
+    intersect any country. The grid is memoized in the cache path per area
+    and spacing, polygons_builder() only runs when it is not cached.
+    """
+    cache_filepath = "{}grid_{}_{}_{}.wkb".format(
+        COUNTRY_BORDERS_CACHE_PATH,
+        "_".join(map(str, area)),
+        spacing,
+        os.stat(borders_filepath).st_mtime_ns)
+    if os.path.exists(cache_filepath):
+        with open(cache_filepath, "rb") as file:
+            return shapely.from_wkb(file.read())
+
+    grid = get_polygons_intersecting_countries(polygons_builder(),
+                                               borders_filepath)
+    create_directory_structure(cache_filepath)
+    with open(cache_filepath, "wb") as file:
+        file.write(shapely.to_wkb(grid))
+    return grid
@@ -31,3 +31,7 @@ class IncompatibleArguments(Exception):
 
 class InternalError(Exception):
     pass
+
+
+class PipelineError(Exception):
+    pass
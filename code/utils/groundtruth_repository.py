@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import os
+import ast
+import hashlib
+import pandas as pd
+# internal modules imports
+from utils.constants import (
+    AREAS_FILE_PATH,
+    GROUND_TRUTH_CACHE_PATH,
+    GROUND_TRUTH_DISK_CACHE
+)
+from utils.common_functions import (
+    json_file_to_dict,
+    create_directory_structure
+)
+
+
+class GroundTruthRepository:
+    """
+    Parses every ground truth source (root-servers and Cloudflare JSON files),
+    countries set and probes area once and keeps the result in memory. Entries
+    are keyed by path and modification time, so a file updated on disk is
+    parsed again the next time it is requested.
+    """
+
+    def __init__(self, disk_cache_path: str = None):
+        self._disk_cache_path = disk_cache_path
+        self._gt_instances = {}
+        self._countries_sets = {}
+        self._probes_areas = {}
+        self._areas = {}
+
+    def get_gt_instances_locations(self, filepath: str) -> pd.DataFrame:
+        gt_df = self._get_cached(self._gt_instances, filepath,
+                                 self._load_gt_instances_locations)
+        # Validations modify the frame, never hand out the cached one
+        return gt_df.copy()
+
+    def get_alpha2_country_codes(self, filepath: str) -> set:
+        return set(self._get_cached(
+            self._countries_sets, filepath,
+            lambda path, key: frozenset(
+                country["alpha-2"] for country in json_file_to_dict(path))))
+
+    def get_probes_area(self, filepath: str) -> tuple:
+        return self._get_cached(
+            self._probes_areas, filepath,
+            lambda path, key: ast.literal_eval(
+                json_file_to_dict(path)["area"]))
+
+    def get_area(self, area_name: str) -> dict:
+        """
+        Returns the area definition with either a "bounding_box" as
+        (top_left_lon, top_left_lat, bottom_right_lon, bottom_right_lat) or
+        the "countries" set of alpha-2 codes inside the area.
+        """
+        areas = self._get_cached(self._areas, AREAS_FILE_PATH,
+                                 lambda path, key: json_file_to_dict(path))
+        try:
+            area = areas[area_name]
+        except KeyError:
+            raise Exception("Sorry, area {} not recognized".format(area_name))
+
+        if "bounding_box" in area:
+            section = area["bounding_box"]
+            return {"bounding_box": (section["longitude_min"],
+                                     section["latitude_max"],
+                                     section["longitude_max"],
+                                     section["latitude_min"])}
+        else:
+            return {"countries": self.get_alpha2_country_codes(
+                area["countries_file"])}
+
+    def get_area_of_countries_file(self, countries_filepath: str) -> dict:
+        # Countries sets files are named <area name>_countries.json
+        area_name = countries_filepath.split("/")[-1][:-len("_countries.json")]
+        try:
+            return self.get_area(area_name)
+        except Exception:
+            return {"countries": self.get_alpha2_country_codes(
+                countries_filepath)}
+
+    def clear(self) -> None:
+        self._gt_instances.clear()
+        self._countries_sets.clear()
+        self._probes_areas.clear()
+        self._areas.clear()
+
+    @staticmethod
+    def _get_cached(cache: dict, filepath: str, loader):
+        path = os.path.abspath(filepath)
+        key = (path, os.stat(path).st_mtime_ns)
+        cached = cache.get(path)
+        if cached is None or cached[0] != key:
+            cache[path] = (key, loader(filepath, key))
+        return cache[path][1]
+
+    def _load_gt_instances_locations(self, filepath: str,
+                                     key: tuple) -> pd.DataFrame:
+        if self._disk_cache_path is None:
+            return parse_gt_instances_locations(filepath)
+
+        cache_filepath = "{}{}_{}.pkl".format(
+            self._disk_cache_path,
+            hashlib.sha1(key[0].encode()).hexdigest(),
+            key[1])
+        if os.path.exists(cache_filepath):
+            return pd.read_pickle(cache_filepath)
+
+        gt_df = parse_gt_instances_locations(filepath)
+        create_directory_structure(cache_filepath)
+        gt_df.to_pickle(cache_filepath)
+        return gt_df
+
+
+def parse_gt_instances_locations(filepath: str) -> pd.DataFrame:
+    if "root" in filepath:
+        return parse_root_servers_instances_locations(filepath)
+    elif "cloudfare" in filepath:
+        return parse_cloudfare_servers_instances_locations(filepath)
+    else:
+        raise Exception("Sorry, gt file pattern not recognized")
+
+
+def parse_root_servers_instances_locations(filepath: str) -> pd.DataFrame:
+    df = pd.DataFrame(json_file_to_dict(filepath)["Sites"])
+    df = df[["Country", "Town", "Latitude", "Longitude"]]
+    df.drop_duplicates(subset=['Town'], inplace=True)
+    df.rename(
+        columns={
+            "Country": "country_code",
+            "Town": "city",
+            "Latitude": "latitude",
+            "Longitude": "longitude"},
+        inplace=True)
+    df["type"] = "gt_instance"
+
+    return df
+
+
+def parse_cloudfare_servers_instances_locations(filepath: str) -> pd.DataFrame:
+    df = pd.DataFrame(json_file_to_dict(filepath))
+    df = df[["country_code", "city_name", "latitude", "longitude"]]
+    df.drop_duplicates(subset=['city_name'], inplace=True)
+    df.rename(
+        columns={
+            "city_name": "city"},
+        inplace=True)
+    df["type"] = "gt_instance"
+
+    return df
+
+
+gt_repository = GroundTruthRepository(
+    disk_cache_path=GROUND_TRUTH_CACHE_PATH if GROUND_TRUTH_DISK_CACHE
+    else None)
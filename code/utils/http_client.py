@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import asyncio
+import random
+import re
+import threading
+import time
+import httpx
+# internal modules imports
+from utils.constants import (
+    HTTP_RATE_LIMITS,
+    HTTP_DEFAULT_RATE_LIMIT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+    HTTP_TIMEOUT
+)
+
+# Answers worth retrying: rate limited or temporary server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Methods that can be sent again after a server error without side effects
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Errors raised before the request reached the server, any method can be
+# sent again after them
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class TokenBucket:
+    """
+    Token bucket allowing rate requests per second on average, with bursts
+    up to the rate (at least one request). The rate is halved every time
+    the server answers 429 and recovers step by step with every successful
+    request, so clients run at the maximum throughput the server accepts.
+    It can be shared by several event loops and threads.
+    """
+
+    def __init__(self, rate: float):
+        self._max_rate = rate
+        self._rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._penalized = 0
+        self._lock = threading.Lock()
+
+    def get_rate(self) -> float:
+        return self._rate
+
+    async def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    max(self._rate, 1),
+                    self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            await asyncio.sleep(wait)
+
+    def penalize(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # The answers of the requests in flight during the same
+            # throttling count once
+            if now - self._penalized < 1:
+                return
+            self._penalized = now
+            self._rate = max(self._rate / 2, self._max_rate / 64)
+            self._tokens = min(self._tokens, 0)
+
+    def reward(self) -> None:
+        with self._lock:
+            self._rate = min(self._rate + self._max_rate / 20,
+                             self._max_rate)
+
+
+class HTTPStatistics:
+    """
+    Requests, retries, errors and latency per endpoint, the host and path
+    of the request with the numeric segments as {id}
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def add(self, request: httpx.Request, latency: float,
+            status_code: int = None, retried: bool = False) -> None:
+        endpoint = "{} {}{}".format(
+            request.method, request.url.host,
+            re.sub(r"/\d+(?=/|$)", "/{id}", request.url.path))
+        with self._lock:
+            counters = self._endpoints.setdefault(endpoint, {
+                "requests": 0, "retries": 0, "errors": 0,
+                "total_latency": 0.0, "max_latency": 0.0})
+            counters["requests"] += 1
+            counters["retries"] += int(retried)
+            counters["errors"] += int(status_code is None or
+                                      status_code >= 400)
+            counters["total_latency"] += latency
+            counters["max_latency"] = max(counters["max_latency"], latency)
+
+    def get_summary(self) -> dict:
+        with self._lock:
+            return {endpoint: dict(
+                counters,
+                mean_latency=counters["total_latency"] / counters["requests"])
+                for endpoint, counters in self._endpoints.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+__rate_limiters = {}
+__rate_limiters_lock = threading.Lock()
+http_statistics = HTTPStatistics()
+
+
+def get_rate_limiter(host: str) -> TokenBucket:
+    """Token bucket of a host, shared by every client of the process"""
+    with __rate_limiters_lock:
+        if host not in __rate_limiters:
+            __rate_limiters[host] = TokenBucket(
+                HTTP_RATE_LIMITS.get(host, HTTP_DEFAULT_RATE_LIMIT))
+        return __rate_limiters[host]
+
+
+def get_retry_delay(response: httpx.Response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After") \
+        if response is not None else None
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX)
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(HTTP_BACKOFF_BASE * 2 ** attempt,
+                                 HTTP_BACKOFF_MAX))
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport over a pooled one that limits the requests per host,
+    retries with exponential backoff the rate limited answers, the server
+    and transport errors of idempotent requests and the connection errors
+    of any request, and records the statistics of every request. A POST
+    that may have reached the server is never sent twice. Without rate_limited the requests are
+    sent as soon as they are made, for transports not reaching a server.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None,
+                 max_retries: int = HTTP_MAX_RETRIES,
+                 rate_limited: bool = True):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._max_retries = max_retries
+        self._rate_limited = rate_limited
+
+    async def handle_async_request(
+            self, request: httpx.Request) -> httpx.Response:
+        rate_limiter = get_rate_limiter(request.url.host)
+        attempt = 0
+        while True:
+            if self._rate_limited:
+                await rate_limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = await self._transport.handle_async_request(
+                    request)
+            except httpx.TransportError as e:
+                http_statistics.add(request, time.monotonic() - start,
+                                    retried=attempt > 0)
+                if attempt >= self._max_retries or (
+                        request.method not in IDEMPOTENT_METHODS and
+                        not isinstance(e, CONNECT_ERRORS)):
+                    raise
+                await asyncio.sleep(get_retry_delay(None, attempt))
+                attempt += 1
+                continue
+            http_statistics.add(request, time.monotonic() - start,
+                                response.status_code, retried=attempt > 0)
+
+            if self._rate_limited:
+                if response.status_code == 429:
+                    rate_limiter.penalize()
+                elif response.status_code < 400:
+                    rate_limiter.reward()
+            retry = response.status_code == 429 or (
+                response.status_code in RETRY_STATUS_CODES and
+                request.method in IDEMPOTENT_METHODS)
+            if not retry or attempt >= self._max_retries:
+                return response
+
+            await response.aclose()
+            await asyncio.sleep(get_retry_delay(response, attempt))
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+__background_loop = None
+__background_loop_lock = threading.Lock()
+__http_client = None
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    global __background_loop
+    with __background_loop_lock:
+        if __background_loop is None:
+            __background_loop = asyncio.new_event_loop()
+            threading.Thread(target=__background_loop.run_forever,
+                             name="http-client-loop",
+                             daemon=True).start()
+    return __background_loop
+
+
+def run_sync(coroutine):
+    """Runs a coroutine in the background event loop and waits for it"""
+    return asyncio.run_coroutine_threadsafe(
+        coroutine, get_background_loop()).result()
+
+
+async def __get_json(url: str, params: dict = None):
+    global __http_client
+    if __http_client is None:
+        __http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT, transport=ResilientTransport(),
+            follow_redirects=True)
+    response = await __http_client.get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_json(url: str, params: dict = None):
+    """
+    Blocking GET of a JSON document through the shared resilient client.
+    Raises httpx.HTTPStatusError if the answer is not successful.
+    """
+    return run_sync(__get_json(url, params))
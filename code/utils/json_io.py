@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import gzip
+import json
+import os
+# internal modules imports
+from utils.constants import (
+    JSON_BACKEND,
+    OUTPUT_FORMATS
+)
+
+JSON_BACKENDS = ["orjson", "ujson", "json"]
+
+
+def __get_backend(name: str):
+    if name == "orjson":
+        import orjson
+        return (orjson.loads,
+                lambda data, sort_keys: orjson.dumps(
+                    data, option=orjson.OPT_NON_STR_KEYS |
+                    (orjson.OPT_SORT_KEYS if sort_keys else 0)))
+    if name == "ujson":
+        import ujson
+        return (ujson.loads,
+                lambda data, sort_keys: ujson.dumps(
+                    data, ensure_ascii=False, escape_forward_slashes=False,
+                    sort_keys=sort_keys).encode())
+    return (lambda raw_data: json.loads(raw_data.decode()),
+            lambda data, sort_keys: json.dumps(
+                data, separators=(",", ":"), sort_keys=sort_keys).encode())
+
+
+def get_json_backend(name: str = JSON_BACKEND) -> tuple:
+    """
+    (name, loads, dumps) of the JSON library used, "auto" picks the first of
+    JSON_BACKENDS installed. loads parses bytes, dumps(data, sort_keys)
+    returns compact JSON as bytes.
+    """
+    names = JSON_BACKENDS if name == "auto" else [name]
+    for backend_name in names:
+        if backend_name not in JSON_BACKENDS:
+            raise ValueError("Unknown JSON backend {}, expected one of {}".
+                             format(backend_name, JSON_BACKENDS))
+        try:
+            return (backend_name,) + __get_backend(backend_name)
+        except ImportError:
+            if name != "auto":
+                raise
+    return ("json",) + __get_backend("json")
+
+
+__backend_name, __loads, __dumps = get_json_backend()
+
+
+def set_json_backend(name: str) -> str:
+    """Changes the JSON library used by the module, returns its name"""
+    global __backend_name, __loads, __dumps
+    __backend_name, __loads, __dumps = get_json_backend(name)
+    return __backend_name
+
+
+def serialize(data, output_format: str = "pretty",
+              sort_keys: bool = False) -> bytes:
+    """
+    Data encoded in one of the OUTPUT_FORMATS. "pretty" is always written by
+    the standard library, the other backends cannot indent with 4 spaces.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format {}, expected one of {}".
+                         format(output_format, OUTPUT_FORMATS))
+    if output_format == "msgpack":
+        import msgpack
+        return msgpack.packb(data)
+    if output_format == "pretty":
+        return json.dumps(data, indent=4, sort_keys=sort_keys).encode()
+    raw_json = __dumps(data, sort_keys)
+    if output_format == "gzip":
+        return gzip.compress(raw_json, compresslevel=6, mtime=0)
+    return raw_json
+
+
+def deserialize(raw_data: bytes):
+    """Data of a file written in any of the OUTPUT_FORMATS"""
+    if raw_data[:2] == b"\x1f\x8b":
+        raw_data = gzip.decompress(raw_data)
+    # JSON documents are objects or arrays, anything else is msgpack
+    first_byte = raw_data[:1]
+    if first_byte.isspace():
+        first_byte = raw_data.lstrip()[:1]
+    if first_byte not in (b"{", b"[", b""):
+        import msgpack
+        return msgpack.unpackb(raw_data)
+    try:
+        return __loads(raw_data)
+    except ValueError:
+        # NaN, Infinity or integers too big for the fast backends
+        return json.loads(raw_data)
+
+
+def read_json_file(file_path: str):
+    """Reads a file in any of the OUTPUT_FORMATS, without touching the
+    directories"""
+    with open(file_path, "rb") as file:
+        return deserialize(file.read())
+
+
+def write_json_file(data, file_path: str, sort_keys: bool = False,
+                    output_format: str = "pretty") -> None:
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_path, "wb") as file:
+        file.write(serialize(data, output_format, sort_keys))
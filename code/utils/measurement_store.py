@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import gzip
+import json
+import os
+import re
+import numpy as np
+# internal modules imports
+from utils.constants import MEASUREMENT_STREAM_CHUNK_SIZE
+from utils.common_functions import (
+    json_file_to_dict,
+    create_directory_structure,
+    get_probe_set_selection_and_number
+)
+
+# Columns of "measurement_results", one entry per RTT answered
+MEASUREMENT_COLUMNS = ["hostname", "latitude", "longitude", "rtt_ms"]
+__NUMERIC_COLUMNS = ["latitude", "longitude", "rtt_ms"]
+
+
+def get_columnar_filepath(measurement_filepath: str) -> str:
+    """The columnar copy of measurement.json is measurement.npz"""
+    return os.path.splitext(measurement_filepath)[0] + ".npz"
+
+
+def get_results_columns(results: list) -> dict:
+    """Columns of the entries of "measurement_results" as numpy arrays"""
+    columns = {"hostname": np.array(
+        [str(result.get("hostname", "")) for result in results], dtype=str)}
+    for column in __NUMERIC_COLUMNS:
+        columns[column] = np.array(
+            [result.get(column, np.nan) for result in results],
+            dtype=np.float64)
+    return columns
+
+
+def has_columnar_copy(measurement_filepath: str) -> bool:
+    """True if the columnar copy exists and is not older than the JSON"""
+    columnar_filepath = get_columnar_filepath(measurement_filepath)
+    if not os.path.exists(columnar_filepath):
+        return False
+    return not os.path.exists(measurement_filepath) or \
+        os.stat(columnar_filepath).st_mtime_ns >= \
+        os.stat(measurement_filepath).st_mtime_ns
+
+
+def save_measurement_columns(measurement_filepath: str,
+                             measurement: dict) -> str:
+    """
+    Saves the measurement next to its JSON file as an uncompressed .npz, one
+    array per column of "measurement_results" and the rest of the keys as a
+    JSON header. Values missing in an entry are stored as NaN (or "" for the
+    hostname) and left out again when loaded.
+    """
+    columns = get_results_columns(measurement["measurement_results"])
+    header = {key: value for key, value in measurement.items()
+              if key != "measurement_results"}
+
+    columnar_filepath = get_columnar_filepath(measurement_filepath)
+    create_directory_structure(columnar_filepath)
+    # np.savez appends .npz to names without it, write to the open file
+    with open(columnar_filepath, "wb") as file:
+        np.savez(file, header=np.array(json.dumps(header)), **columns)
+    return columnar_filepath
+
+
+def get_measurement_metadata(measurement_filepath: str, header: dict,
+                             columns: dict) -> dict:
+    """
+    Summary of a measurement from the (header, columns) of
+    load_measurement_columns: its ID, target, address family, probes set,
+    number of probes and of RTTs, RTT percentiles and size of its file
+    """
+    definitions = (header.get("request_data") or {}).get("definitions") or \
+        [{}]
+    try:
+        probe_selection, probe_set_number = \
+            get_probe_set_selection_and_number(header["probes_filepath"])
+    except (IndexError, ValueError):
+        # Probes sets not named <region>_<number>.json
+        probe_selection, probe_set_number = None, None
+    rtts = columns["rtt_ms"][~np.isnan(columns["rtt_ms"])]
+    rtt_percentiles = np.percentile(rtts, [0, 10, 50, 90]).tolist() \
+        if len(rtts) else [None] * 4
+    return {
+        "measurement_id": header.get("measurement_id"),
+        "target": header["target"],
+        "af": definitions[0].get(
+            "af", 6 if ":" in header["target"] else 4),
+        "probes_filepath": header["probes_filepath"],
+        "probe_selection": probe_selection,
+        "probe_set_number": probe_set_number,
+        "num_probes": len(np.unique(columns["hostname"])),
+        "num_results": len(columns["hostname"]),
+        "rtt_min": rtt_percentiles[0],
+        "rtt_p10": rtt_percentiles[1],
+        "rtt_p50": rtt_percentiles[2],
+        "rtt_p90": rtt_percentiles[3],
+        "file_size": os.path.getsize(measurement_filepath)
+    }
+
+
+def load_measurement_columns(measurement_filepath: str) -> tuple:
+    """
+    Returns (header, columns) of a measurement: the keys of the JSON file
+    but "measurement_results" and a dict of numpy arrays, one per column
+    of MEASUREMENT_COLUMNS. The columnar copy is used when it is up to date,
+    the JSON file otherwise.
+    """
+    if has_columnar_copy(measurement_filepath):
+        with np.load(get_columnar_filepath(measurement_filepath)) as data:
+            header = json.loads(str(data["header"]))
+            columns = {column: data[column]
+                       for column in MEASUREMENT_COLUMNS}
+        return header, columns
+
+    header = {}
+    samples = list(iter_measurement_results(measurement_filepath, header))
+    hostnames, latitudes, longitudes, rtts = zip(*samples) if samples \
+        else ((), (), (), ())
+    # None of the entries without RTT answered is converted to NaN
+    return header, {
+        "hostname": np.array([hostname or "" for hostname in hostnames],
+                             dtype=str),
+        "latitude": np.array(latitudes, dtype=np.float64),
+        "longitude": np.array(longitudes, dtype=np.float64),
+        "rtt_ms": np.array(rtts, dtype=np.float64)}
+
+
+def iter_measurement_samples(measurement_filepath: str):
+    """
+    (hostname, latitude, longitude, rtt_ms) of every entry of
+    "measurement_results", from the columnar copy when it is up to date or
+    parsed incrementally from the JSON file otherwise. The values missing
+    in an entry are None.
+    """
+    if not has_columnar_copy(measurement_filepath):
+        yield from iter_measurement_results(measurement_filepath)
+        return
+
+    _, columns = load_measurement_columns(measurement_filepath)
+    for hostname, latitude, longitude, rtt_ms in zip(
+            columns["hostname"].tolist(), columns["latitude"].tolist(),
+            columns["longitude"].tolist(), columns["rtt_ms"].tolist()):
+        yield (hostname or None,
+               latitude if latitude == latitude else None,
+               longitude if longitude == longitude else None,
+               rtt_ms if rtt_ms == rtt_ms else None)
+
+
+def load_measurement(measurement_filepath: str) -> dict:
+    """The measurement as in its JSON file, read from the columnar copy
+    when it is up to date"""
+    if not has_columnar_copy(measurement_filepath):
+        return json_file_to_dict(measurement_filepath)
+
+    header, columns = load_measurement_columns(measurement_filepath)
+    results = []
+    for hostname, latitude, longitude, rtt_ms in zip(
+            columns["hostname"].tolist(), columns["latitude"].tolist(),
+            columns["longitude"].tolist(), columns["rtt_ms"].tolist()):
+        result = {"hostname": hostname}
+        for column, value in (("latitude", latitude),
+                              ("longitude", longitude),
+                              ("rtt_ms", rtt_ms)):
+            if value == value:
+                result[column] = value
+        results.append(result)
+    header["measurement_results"] = results
+    return header
+
+
+def convert_measurement_file(measurement_filepath: str,
+                             force: bool = False) -> bool:
+    """Writes the columnar copy of a JSON measurement file if missing"""
+    if not force and has_columnar_copy(measurement_filepath):
+        return False
+    measurement = json_file_to_dict(measurement_filepath)
+    if "measurement_results" not in measurement:
+        return False
+    save_measurement_columns(measurement_filepath, measurement)
+    return True
+
+
+def convert_measurements_directory(path: str, force: bool = False) -> int:
+    """Writes the columnar copy of every measurement file below path"""
+    files_converted = 0
+    for directory, _, filenames in os.walk(path):
+        for filename in sorted(filenames):
+            if filename.endswith(".json") and convert_measurement_file(
+                    os.path.join(directory, filename), force):
+                files_converted += 1
+    return files_converted
+
+
+class JSONStream:
+    """
+    Text of a JSON file read in chunks, its values decoded one at a time.
+    Only the value being decoded and the chunk it is in are kept in memory.
+    """
+
+    _DECODER = json.JSONDecoder()
+    _WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, file, chunk_size: int = MEASUREMENT_STREAM_CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._position = 0
+        self._end_of_file = False
+
+    def peek(self) -> str:
+        """Next character but whitespace, "" at the end of the file"""
+        while True:
+            self._position = self._WHITESPACE.match(
+                self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read_chunk():
+                return ""
+
+    def expect(self, character: str) -> None:
+        if self.peek() != character:
+            raise ValueError("Expected {!r} in {}".format(
+                character, getattr(self._file, "name", "JSON stream")))
+        self._position += 1
+
+    def skip(self, character: str) -> bool:
+        """Consumes the next character if it is the one given"""
+        if self.peek() != character:
+            return False
+        self._position += 1
+        return True
+
+    def decode(self):
+        """Next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._DECODER.raw_decode(self._buffer,
+                                                      self._position)
+                # A number at the end of the buffer may go on in the next
+                # chunk
+                if end < len(self._buffer) or self._end_of_file:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._end_of_file:
+                    raise
+            self._read_chunk()
+
+    def iter_array(self):
+        """Values of the array that starts at the next character"""
+        self.expect("[")
+        if self.skip("]"):
+            return
+        raw_decode = self._DECODER.raw_decode
+        match_whitespace = self._WHITESPACE.match
+        while True:
+            # Values followed by their separator in the buffer are decoded
+            # straight from it, the chunk boundaries go through decode()
+            buffer = self._buffer
+            try:
+                value, end = raw_decode(
+                    buffer, match_whitespace(buffer, self._position).end())
+                end = match_whitespace(buffer, end).end()
+                separator = buffer[end:end + 1]
+            except json.JSONDecodeError:
+                separator = ""
+            if separator:
+                self._position = end + 1
+            else:
+                value = self.decode()
+                separator = self.peek()
+                self._position += 1
+            if separator not in (",", "]"):
+                raise ValueError("Expected ',' or ']' in {}".format(
+                    getattr(self._file, "name", "JSON stream")))
+            yield value
+            if separator == "]":
+                return
+
+    def _read_chunk(self) -> bool:
+        if self._end_of_file:
+            return False
+        # Values longer than a chunk double the reads, so they are decoded
+        # a logarithmic number of times
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+        chunk = self._file.read(max(self._chunk_size, len(self._buffer)))
+        if not chunk:
+            self._end_of_file = True
+            return False
+        self._buffer += chunk
+        return True
+
+
+def iter_measurement_results(measurement_filepath: str, header: dict = None,
+                             chunk_size: int = MEASUREMENT_STREAM_CHUNK_SIZE):
+    """
+    (hostname, latitude, longitude, rtt_ms) of every entry of
+    "measurement_results" of a JSON file, parsed incrementally so memory
+    does not grow with the file. The values missing in an entry are None.
+    The other keys of the measurement are stored in header when given.
+    """
+    with open(measurement_filepath, "rb") as file:
+        magic_number = file.read(2)
+    if magic_number == b"\x1f\x8b":
+        file = gzip.open(measurement_filepath, "rt")
+    elif magic_number[:1] not in b"{ \t\n\r":
+        # msgpack files are not parsed incrementally
+        measurement = json_file_to_dict(measurement_filepath)
+        for result in measurement.pop("measurement_results"):
+            yield (result.get("hostname"), result.get("latitude"),
+                   result.get("longitude"), result.get("rtt_ms"))
+        if header is not None:
+            header.update(measurement)
+        return
+    else:
+        file = open(measurement_filepath)
+
+    with file:
+        stream = JSONStream(file, chunk_size)
+        stream.expect("{")
+        while not stream.skip("}"):
+            key = stream.decode()
+            stream.expect(":")
+            if key != "measurement_results":
+                value = stream.decode()
+                if header is not None:
+                    header[key] = value
+            else:
+                for result in stream.iter_array():
+                    yield (result.get("hostname"), result.get("latitude"),
+                           result.get("longitude"), result.get("rtt_ms"))
+            stream.skip(",")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import hashlib
+import json
+import os
+import traceback
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    FIRST_COMPLETED,
+    wait
+)
+# internal modules imports
+from utils.constants import PIPELINE_WORKERS
+from utils.common_functions import (
+    get_file_hash,
+    json_file_to_dict,
+    dict_to_json_file
+)
+from utils.custom_exceptions import PipelineError
+
+# Outcome of a node in a run
+NODE_UP_TO_DATE = "up to date"
+NODE_DONE = "done"
+NODE_FAILED = "failed"
+NODE_SKIPPED = "skipped"
+NODE_STALE = "stale"
+
+
+class PipelineNode:
+    """
+    A stage of the pipeline: action() produces the outputs files from the
+    inputs files. inputs and outputs are lists of filepaths or functions
+    returning them, called when the node is checked, so they can depend on
+    what the previous nodes wrote. An output None is one the action may
+    produce in a later run (a measurement not finished yet): the node stays
+    out of date but its run does not fail.
+    """
+
+    def __init__(self, name: str, action, dependencies: list = None,
+                 parameters: dict = None, inputs=None, outputs=None):
+        self.name = name
+        self.action = action
+        self.dependencies = dependencies or []
+        self.parameters = parameters or {}
+        self._inputs = inputs or []
+        self._outputs = outputs or []
+
+    def get_inputs(self) -> list:
+        return self._inputs() if callable(self._inputs) else self._inputs
+
+    def get_outputs(self) -> list:
+        return self._outputs() if callable(self._outputs) else self._outputs
+
+    def get_fingerprint(self) -> str:
+        """
+        SHA-256 of the parameters and of the contents of the inputs, raises
+        FileNotFoundError if an input is missing
+        """
+        fingerprint = {
+            "parameters": self.parameters,
+            "inputs": [[filepath, get_file_hash(filepath)]
+                       for filepath in sorted(self.get_inputs())]
+        }
+        return hashlib.sha256(json.dumps(
+            fingerprint, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_up_to_date(self, fingerprint: str, last_fingerprint: str) -> bool:
+        return fingerprint == last_fingerprint and all(
+            filepath is not None and os.path.exists(filepath)
+            for filepath in self.get_outputs())
+
+
+class Pipeline:
+    """
+    Graph of PipelineNode run like make: a node runs only when its
+    fingerprint changed since its last successful run or one of its outputs
+    is missing, and only after all its dependencies. The nodes ready are run
+    in a pool of threads, so their actions should start processes or wait
+    on I/O. The fingerprint of each node run is kept in a JSON state file,
+    the dependents of a failed node are skipped.
+    """
+
+    def __init__(self, state_filepath: str, workers: int = PIPELINE_WORKERS):
+        self._state_filepath = state_filepath
+        self._workers = workers
+        self._nodes = {}
+        self._state = self.load_state()
+
+    def load_state(self) -> dict:
+        if os.path.exists(self._state_filepath):
+            return json_file_to_dict(self._state_filepath)
+        return {}
+
+    def save_state(self) -> None:
+        dict_to_json_file(self._state, self._state_filepath)
+
+    def add_node(self, node: PipelineNode) -> PipelineNode:
+        if node.name in self._nodes:
+            raise PipelineError("Node {} already in the pipeline".format(
+                node.name))
+        self._nodes[node.name] = node
+        return node
+
+    def get_nodes(self) -> dict:
+        return self._nodes
+
+    def get_order(self) -> list:
+        """Names of the nodes, every one after its dependencies"""
+        order = []
+        visiting = set()
+
+        def visit(name: str, path: list) -> None:
+            if name in order:
+                return
+            if name not in self._nodes:
+                raise PipelineError("Node {} depends on unknown node {}".
+                                    format(path[-1], name))
+            if name in visiting:
+                raise PipelineError("Dependency cycle: {}".format(
+                    " -> ".join(path + [name])))
+            visiting.add(name)
+            for dependency in self._nodes[name].dependencies:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self._nodes:
+            visit(name, [])
+        return order
+
+    def run(self, force: bool = False, dry_run: bool = False) -> dict:
+        """
+        Runs the stale nodes and returns the outcome of every node. With
+        force every node runs, with dry_run none does and the stale ones
+        are returned as NODE_STALE (a node after a stale one is stale too,
+        its inputs are not known until then).
+        """
+        order = self.get_order()
+        outcomes = {}
+        if dry_run:
+            for name in order:
+                node = self._nodes[name]
+                if force or any(outcomes[dependency] == NODE_STALE
+                                for dependency in node.dependencies):
+                    outcomes[name] = NODE_STALE
+                    continue
+                try:
+                    fingerprint = node.get_fingerprint()
+                except FileNotFoundError:
+                    outcomes[name] = NODE_STALE
+                    continue
+                outcomes[name] = NODE_UP_TO_DATE if node.is_up_to_date(
+                    fingerprint, self._state.get(name)) else NODE_STALE
+            return outcomes
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            while len(outcomes) < len(order):
+                for name in order:
+                    if name in outcomes or name in running.values():
+                        continue
+                    node = self._nodes[name]
+                    dependencies_outcomes = [outcomes.get(dependency)
+                                             for dependency in
+                                             node.dependencies]
+                    if None in dependencies_outcomes:
+                        continue
+                    if any(outcome in (NODE_FAILED, NODE_SKIPPED)
+                           for outcome in dependencies_outcomes):
+                        outcomes[name] = NODE_SKIPPED
+                        print("{}: skipped".format(name))
+                        continue
+                    try:
+                        fingerprint = node.get_fingerprint()
+                    except FileNotFoundError as e:
+                        outcomes[name] = NODE_FAILED
+                        print("{}: failed, missing input {}".format(
+                            name, e.filename))
+                        continue
+                    if not force and node.is_up_to_date(
+                            fingerprint, self._state.get(name)):
+                        outcomes[name] = NODE_UP_TO_DATE
+                        continue
+                    print("{}: running".format(name))
+                    running[executor.submit(self._run_node, node,
+                                            fingerprint)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    fingerprint = future.result()
+                    if fingerprint is None:
+                        outcomes[name] = NODE_FAILED
+                        self._state.pop(name, None)
+                    else:
+                        outcomes[name] = NODE_DONE
+                        self._state[name] = fingerprint
+                    print("{}: {}".format(name, outcomes[name]))
+                    self.save_state()
+        return outcomes
+
+    @staticmethod
+    def _run_node(node: PipelineNode, fingerprint: str):
+        """Fingerprint of the inputs used if the node succeeded, else None"""
+        try:
+            node.action()
+        except Exception:
+            traceback.print_exc()
+            return None
+        missing_outputs = [filepath for filepath in node.get_outputs()
+                           if filepath is not None and
+                           not os.path.exists(filepath)]
+        if missing_outputs:
+            print("{}: outputs not written {}".format(
+                node.name, missing_outputs))
+            return None
+        return fingerprint
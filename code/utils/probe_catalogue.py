@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import time
+import sqlite3
+import threading
+# internal modules imports
+from utils.constants import (
+    PROBE_CATALOGUE_FILEPATH,
+    PROBE_CATALOGUE_TTL,
+    PROBE_CATALOGUE_OFFLINE,
+    ATLAS_PROBES_PAGE_SIZE
+)
+from utils.common_functions import create_directory_structure
+from utils.atlas_client import (
+    SyncAtlasClient,
+    get_sync_atlas_client
+)
+
+PROBE_FIELDS = "id,geometry,status"
+
+
+class ProbeCatalogue:
+    """
+    Local SQLite copy of the RIPE Atlas probes metadata (location and
+    status). It is filled with one paged dump of every probe and refreshed
+    incrementally: probes older than ttl seconds are requested again by ID
+    and only the probes created after the last dump are downloaded. Offline
+    the catalogue is never refreshed and answers with what it stores.
+
+    Probes are returned with the shape of the API answers
+    {"id", "geometry": {"coordinates": [longitude, latitude]}, "status"}.
+    The connection is shared by the threads of the campaign scheduler, one
+    statement at a time.
+    """
+
+    def __init__(self, catalogue_filepath: str = PROBE_CATALOGUE_FILEPATH,
+                 ttl: float = PROBE_CATALOGUE_TTL,
+                 offline: bool = PROBE_CATALOGUE_OFFLINE,
+                 atlas_client: SyncAtlasClient = None):
+        self._ttl = ttl
+        self._offline = offline
+        self._atlas_client = atlas_client
+        create_directory_structure(catalogue_filepath)
+        self._connection = sqlite3.connect(catalogue_filepath, timeout=60,
+                                           check_same_thread=False)
+        self._lock = threading.RLock()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            "id INTEGER PRIMARY KEY, longitude REAL, latitude REAL, "
+            "status TEXT, updated REAL)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS probes_location "
+            "ON probes (longitude, latitude)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, "
+            "value REAL)")
+        self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def get_probes(self, probes_ids: list) -> list:
+        """Probes of the IDs, the missing or expired ones are requested"""
+        probes_ids = [int(probe_id) for probe_id in probes_ids]
+        if not probes_ids:
+            return []
+        if not self._offline:
+            outdated_ids = set(probes_ids) - set(
+                self._select_ids("id IN ({}) AND updated >= ?".format(
+                    ",".join(map(str, probes_ids))),
+                    (time.time() - self._ttl,)))
+            if outdated_ids:
+                self._store(self._get_atlas_client().get_probes_by_id(
+                    sorted(outdated_ids), fields=PROBE_FIELDS))
+        probes = {probe["id"]: probe for probe in self._select_probes(
+            "id IN ({})".format(",".join(map(str, probes_ids))))}
+        return [probes[probe_id] for probe_id in probes_ids
+                if probe_id in probes]
+
+    def get_probes_in_section(self, section: dict) -> list:
+        """Probes located inside the section borders"""
+        self.refresh()
+        return self._select_probes(
+            "longitude >= ? AND longitude <= ? AND "
+            "latitude >= ? AND latitude <= ?",
+            (section["longitude_min"], section["longitude_max"],
+             section["latitude_min"], section["latitude_max"]))
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Dumps every probe the first time. Later, once ttl has passed since
+        the last refresh, downloads the new probes and requests again the
+        expired ones.
+        """
+        if self._offline:
+            return
+        now = time.time()
+        last_refresh = self._get_metadata("last_refresh")
+        if not force and last_refresh is not None and \
+                now - last_refresh < self._ttl:
+            return
+
+        atlas_client = self._get_atlas_client()
+        with self._lock:
+            last_id = self._connection.execute(
+                "SELECT MAX(id) FROM probes").fetchone()[0]
+        if last_id is None:
+            self._store(atlas_client.get_probes(
+                fields=PROBE_FIELDS, page_size=ATLAS_PROBES_PAGE_SIZE))
+        else:
+            self._store(atlas_client.get_probes(
+                id__gt=last_id, fields=PROBE_FIELDS,
+                page_size=ATLAS_PROBES_PAGE_SIZE))
+            outdated_ids = self._select_ids("updated < ?",
+                                            (now - self._ttl,))
+            if outdated_ids:
+                self._store(atlas_client.get_probes_by_id(
+                    outdated_ids, fields=PROBE_FIELDS))
+        self._set_metadata("last_refresh", now)
+
+    def _get_atlas_client(self) -> SyncAtlasClient:
+        if self._atlas_client is None:
+            self._atlas_client = get_sync_atlas_client()
+        return self._atlas_client
+
+    def _store(self, probes: list) -> None:
+        updated = time.time()
+        rows = []
+        for probe in probes:
+            coordinates = (probe.get("geometry") or {}).get(
+                "coordinates") or [None, None]
+            rows.append((probe["id"], coordinates[0], coordinates[1],
+                         (probe.get("status") or {}).get("name"), updated))
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO probes "
+                "(id, longitude, latitude, status, updated) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            self._connection.commit()
+
+    def _select_ids(self, where: str, parameters: tuple = ()) -> list:
+        with self._lock:
+            return [row[0] for row in self._connection.execute(
+                "SELECT id FROM probes WHERE " + where, parameters)]
+
+    def _select_probes(self, where: str, parameters: tuple = ()) -> list:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, longitude, latitude, status FROM probes "
+                "WHERE longitude IS NOT NULL AND " + where + " ORDER BY id",
+                parameters).fetchall()
+        return [{
+            "id": probe_id,
+            "geometry": {"type": "Point",
+                         "coordinates": [longitude, latitude]},
+            "status": {"name": status}
+        } for probe_id, longitude, latitude, status in rows]
+
+    def _get_metadata(self, key: str):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM metadata WHERE key = ?",
+                (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_metadata(self, key: str, value: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                (key, value))
+            self._connection.commit()
+
+
+__probe_catalogue = None
+__probe_catalogue_lock = threading.Lock()
+
+
+def get_probe_catalogue() -> ProbeCatalogue:
+    global __probe_catalogue
+    with __probe_catalogue_lock:
+        if __probe_catalogue is None:
+            __probe_catalogue = ProbeCatalogue()
+        return __probe_catalogue
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+import os
+import sqlite3
+import threading
+import pandas as pd
+# internal modules imports
+from utils.constants import (
+    RESULTS_INDEX_FILEPATH,
+    RESULTS_INDEX_ENABLED,
+    MEASUREMENTS_CAMPAIGNS_PATH,
+    RESULTS_CAMPAIGNS_PATH,
+    GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH
+)
+from utils.common_functions import (
+    create_directory_structure,
+    json_file_to_dict,
+    get_probe_set_selection_and_number
+)
+from utils.campaign_sink import (
+    list_output_files,
+    read_output_file
+)
+from utils.measurement_store import (
+    get_results_columns,
+    get_measurement_metadata
+)
+
+RESULTS_COLUMNS = [
+    "filepath", "campaign", "target", "measurement_filepath",
+    "probes_filepath", "alpha", "threshold", "noise", "ping_radius_function",
+    "num_anycast_instances"
+]
+VALIDATIONS_COLUMNS = [
+    "filepath", "campaign", "target", "probes_filepath", "alpha", "threshold",
+    "noise", "ping_radius_function", "results_filepath", "gt_filepath",
+    "gt_instances_in_region", "TP", "FP", "TN", "FN", "OT", "OF",
+    "accuracy", "precision", "recall", "f1"
+]
+MEASUREMENTS_COLUMNS = [
+    "filepath", "campaign", "measurement_id", "target", "af",
+    "probes_filepath", "probe_selection", "probe_set_number", "num_probes",
+    "num_results", "rtt_min", "rtt_p10", "rtt_p50", "rtt_p90", "file_size"
+]
+STATISTICS_KEYS = ["TP", "FP", "TN", "FN", "OT", "OF",
+                   "accuracy", "precision", "recall", "f1"]
+# Directory of the campaigns of the files of every table
+CAMPAIGNS_PATHS = {
+    "measurements": MEASUREMENTS_CAMPAIGNS_PATH,
+    "results": RESULTS_CAMPAIGNS_PATH,
+    "validations": GROUND_TRUTH_VALIDATIONS_CAMPAIGNS_PATH
+}
+
+
+class ResultsIndex:
+    """
+    SQLite index of the measurements, results and ground truth validation
+    files. Every row keeps the parameters of the analysis, its statistics
+    and the path of the JSON file, so campaign reports are one query instead
+    of a directory scan. The measurements rows keep a summary of the
+    measurement, enough to plan and select the analyses without opening it.
+    """
+
+    def __init__(self, index_filepath: str = RESULTS_INDEX_FILEPATH):
+        create_directory_structure(index_filepath)
+        # Shared by the threads saving measurements, one statement at a time
+        self._connection = sqlite3.connect(index_filepath, timeout=60,
+                                           check_same_thread=False)
+        self._lock = threading.RLock()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ({}, "
+            "PRIMARY KEY (filepath))".format(
+                ", ".join('"{}"'.format(column)
+                          for column in RESULTS_COLUMNS)))
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS validations ({}, "
+            "PRIMARY KEY (filepath))".format(
+                ", ".join('"{}"'.format(column)
+                          for column in VALIDATIONS_COLUMNS)))
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS measurements ({}, "
+            "PRIMARY KEY (filepath))".format(
+                ", ".join('"{}"'.format(column)
+                          for column in MEASUREMENTS_COLUMNS)))
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS measurements_campaign "
+            "ON measurements (campaign)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS validations_campaign "
+            "ON validations (campaign)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_campaign "
+            "ON results (campaign)")
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add_measurement(self, filepath: str, header: dict, columns: dict,
+                        commit: bool = True) -> None:
+        """Index a measurement from the (header, columns) of its file"""
+        metadata = get_measurement_metadata(filepath, header, columns)
+        self._insert("measurements", MEASUREMENTS_COLUMNS, [
+            filepath,
+            get_campaign_of_filepath(filepath)
+        ] + [metadata[column] for column in MEASUREMENTS_COLUMNS[2:]],
+            commit)
+
+    def add_result(self, filepath: str, result: dict,
+                   commit: bool = True) -> None:
+        self._insert("results", RESULTS_COLUMNS, [
+            filepath,
+            get_campaign_of_filepath(filepath),
+            result["target"],
+            result["measurement_filepath"],
+            result["probes_filepath"],
+            result["alpha"],
+            result["threshold"],
+            result["noise"],
+            result["ping_radius_function"],
+            result["num_anycast_instances"]
+        ], commit)
+
+    def add_validation(self, filepath: str, validation: dict,
+                       commit: bool = True) -> None:
+        statistics = validation["statistics"]
+        self._insert("validations", VALIDATIONS_COLUMNS, [
+            filepath,
+            get_campaign_of_filepath(filepath),
+            validation["target"],
+            validation["probes_filepath"],
+            validation["alpha"],
+            validation["threshold"],
+            validation["noise"],
+            validation.get("ping_radius_function"),
+            validation["results_filepath"],
+            validation["gt_filepath"],
+            validation.get("gt_instances_in_region")
+        ] + [statistics.get(key) for key in STATISTICS_KEYS], commit)
+
+    def add_file(self, filepath: str, commit: bool = True,
+                 data: dict = None) -> bool:
+        """
+        Index a measurement, results or validation file, recognized by its
+        keys. data is the content of the file, read if not given.
+        """
+        if data is None:
+            data = json_file_to_dict(filepath)
+        if "measurement_results" in data:
+            self.add_measurement(
+                filepath, data,
+                get_results_columns(data["measurement_results"]), commit)
+        elif "num_anycast_instances" in data:
+            self.add_result(filepath, data, commit)
+        elif "statistics" in data and "instances" in data:
+            self.add_validation(filepath, data, commit)
+        else:
+            return False
+        return True
+
+    def index_directory(self, path: str) -> int:
+        """
+        Index every measurement, results or validation file found below
+        path
+        """
+        files_indexed = 0
+        for directory, _, filenames in os.walk(path):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                try:
+                    if self.add_file(os.path.join(directory, filename),
+                                     commit=False):
+                        files_indexed += 1
+                except (KeyError, ValueError):
+                    continue
+        with self._lock:
+            self._connection.commit()
+        return files_indexed
+
+    def query_measurements(self, campaign: str = None,
+                           **filters) -> pd.DataFrame:
+        return self._query("measurements", campaign, filters)
+
+    def sync_campaign(self, table: str, campaign: str) -> None:
+        """
+        Brings the rows of a campaign in line with its directory: the files
+        not indexed yet, such as the ones saved before the index, are
+        indexed and the rows of files deleted or moved are dropped. The
+        files kept in the sink of the campaign count as in the directory.
+        """
+        campaign_path = CAMPAIGNS_PATHS[table] + campaign
+        indexed_filepaths = set(self.query(
+            "SELECT filepath FROM {} WHERE campaign = ?".format(table),
+            (campaign,))["filepath"])
+        filepaths = set(list_output_files(campaign_path, campaign))
+        missing_filepaths = [filepath for filepath in indexed_filepaths
+                             if filepath not in filepaths and
+                             not os.path.exists(filepath)]
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM {} WHERE filepath = ?".format(table),
+                [(filepath,) for filepath in missing_filepaths])
+            for filepath in filepaths - indexed_filepaths:
+                try:
+                    self.add_file(filepath, commit=False,
+                                  data=read_output_file(filepath, campaign))
+                except (KeyError, ValueError):
+                    continue
+            self._connection.commit()
+
+    def query_campaign_measurements(self, campaign: str) -> pd.DataFrame:
+        """Measurements of a campaign, in line with its directory"""
+        self.sync_campaign("measurements", campaign)
+        return self.query_measurements(campaign)
+
+    def query_campaign_results(self, campaign: str) -> pd.DataFrame:
+        """Results of a campaign, in line with its directory"""
+        self.sync_campaign("results", campaign)
+        return self.query_results(campaign)
+
+    def query_campaign_validations(self, campaign: str) -> pd.DataFrame:
+        """Validations of a campaign, in line with its directory"""
+        self.sync_campaign("validations", campaign)
+        return self.query_validations(campaign)
+
+    def query_results(self, campaign: str = None,
+                      **filters) -> pd.DataFrame:
+        return self._query("results", campaign, filters)
+
+    def query_validations(self, campaign: str = None,
+                          **filters) -> pd.DataFrame:
+        return self._query("validations", campaign, filters)
+
+    def query(self, sql: str, parameters: tuple = (),
+              keep_types: bool = False) -> pd.DataFrame:
+        """
+        Run a SQL query over the index. With keep_types the int and float
+        values are kept as stored, like the JSON files do, instead of being
+        coerced to a common numeric column type.
+        """
+        with self._lock:
+            if not keep_types:
+                return pd.read_sql_query(sql, self._connection,
+                                         params=parameters)
+            cursor = self._connection.execute(sql, parameters)
+            return pd.DataFrame(
+                cursor.fetchall(),
+                columns=[column[0] for column in cursor.description],
+                dtype=object)
+
+    def query_validations_statistics(self, campaign: str) -> pd.DataFrame:
+        """
+        Validations of a campaign with the columns of the statistics CSV
+        built by statistics_igreedy, in line with the directories of the
+        campaign
+        """
+        self.sync_campaign("results", campaign)
+        self.sync_campaign("validations", campaign)
+        # The probes set summary comes from the measurements index, the
+        # validations of measurements not indexed get it from the filename
+        validations_df = self.query(
+            'SELECT v.target, v.probes_filepath, '
+            'm.probe_selection, m.probe_set_number, v.threshold, v.alpha, '
+            'v.accuracy AS "Accuracy", v.precision AS "Precision", '
+            'v.recall AS "Recall", v.f1 AS "F1", '
+            'v.ping_radius_function AS distance_function, '
+            'v.gt_instances_in_region, v.filepath '
+            'FROM validations v '
+            'LEFT JOIN results r ON r.filepath = v.results_filepath '
+            'LEFT JOIN measurements m ON m.filepath = r.measurement_filepath '
+            'WHERE v.campaign = ?', (campaign,),
+            keep_types=True)
+
+        not_indexed = validations_df["probe_selection"].isna()
+        if not_indexed.any():
+            probe_sets = validations_df.loc[
+                not_indexed, "probes_filepath"].map(
+                get_probe_set_selection_and_number)
+            validations_df.loc[not_indexed, "probe_selection"] = \
+                probe_sets.str[0]
+            validations_df.loc[not_indexed, "probe_set_number"] = \
+                probe_sets.str[1]
+        validations_df.insert(1, "probes_file", validations_df[
+            "probes_filepath"].str.split("/").str[-1])
+        validations_df["filename"] = validations_df[
+            "filepath"].str.split("/").str[-1]
+
+        return validations_df.drop(columns=["probes_filepath", "filepath"])
+
+    def campaigns(self) -> pd.DataFrame:
+        return self.query(
+            "SELECT campaign, 'measurements' AS kind, COUNT(*) AS files "
+            "FROM measurements GROUP BY campaign "
+            "UNION ALL "
+            "SELECT campaign, 'results' AS kind, COUNT(*) AS files "
+            "FROM results GROUP BY campaign "
+            "UNION ALL "
+            "SELECT campaign, 'validations' AS kind, COUNT(*) AS files "
+            "FROM validations GROUP BY campaign "
+            "ORDER BY campaign, kind")
+
+    def _insert(self, table: str, columns: list, values: list,
+                commit: bool) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(
+                    table,
+                    ", ".join('"{}"'.format(column) for column in columns),
+                    ", ".join("?" for _ in columns)),
+                values)
+            if commit:
+                self._connection.commit()
+
+    def _query(self, table: str, campaign: str,
+               filters: dict) -> pd.DataFrame:
+        if campaign is not None:
+            filters["campaign"] = campaign
+        where = " AND ".join('"{}" = ?'.format(column) for column in filters)
+        sql = "SELECT * FROM {}".format(table)
+        if where:
+            sql += " WHERE " + where
+        return self.query(sql, tuple(filters.values()))
+
+
+def get_campaign_of_filepath(filepath: str) -> str:
+    return filepath.split("/")[-2] if "/" in filepath else ""
+
+
+__results_index = None
+__results_index_lock = threading.Lock()
+
+
+def get_results_index() -> ResultsIndex:
+    global __results_index
+    with __results_index_lock:
+        if __results_index is None:
+            __results_index = ResultsIndex()
+        return __results_index
+
+
+def index_results_file(filepath: str, result: dict) -> None:
+    if RESULTS_INDEX_ENABLED:
+        get_results_index().add_result(filepath, result)
+
+
+def index_measurement_file(filepath: str, measurement: dict) -> None:
+    if RESULTS_INDEX_ENABLED:
+        get_results_index().add_measurement(
+            filepath, measurement,
+            get_results_columns(measurement["measurement_results"]))
+
+
+def index_validation_file(filepath: str, validation: dict) -> None:
+    if RESULTS_INDEX_ENABLED:
+        get_results_index().add_validation(filepath, validation)
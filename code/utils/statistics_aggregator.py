@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# external modules imports
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+# internal modules imports
+from utils.constants import STATISTICS_READ_WORKERS
+from utils.common_functions import json_file_to_dict
+
+
+class StatisticsAggregator:
+    """
+    Collects rows as one list per column and builds the DataFrame once, so
+    the cost is linear in the number of rows instead of copying the frame on
+    every new row.
+    """
+
+    def __init__(self, columns: list):
+        self._columns = {column: [] for column in columns}
+
+    def add_row(self, row: list) -> None:
+        for column_values, value in zip(self._columns.values(), row):
+            column_values.append(value)
+
+    def to_dataframe(self, newest_first: bool = True) -> pd.DataFrame:
+        """
+        With newest_first the last row added is the first one of the frame,
+        the order the statistics scripts got by prepending every new row.
+        """
+        step = -1 if newest_first else 1
+        return pd.DataFrame(
+            {column: column_values[::step]
+             for column, column_values in self._columns.items()},
+            dtype=object)
+
+
+def read_json_files(filepaths: list,
+                    max_workers: int = STATISTICS_READ_WORKERS,
+                    read_file=json_file_to_dict):
+    """
+    Yields (filepath, read_file(filepath)) in order. A thread pool reads a
+    bounded window of files ahead, so only a few parsed files are in memory
+    at a time.
+    """
+    read_ahead = max_workers * 4
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for filepath in filepaths:
+            pending.append(
+                (filepath, executor.submit(read_file, filepath)))
+            if len(pending) >= read_ahead:
+                filepath_read, future = pending.popleft()
+                yield filepath_read, future.result()
+        while pending:
+            filepath_read, future = pending.popleft()
+            yield filepath_read, future.result()
+
+
+def aggregate_json_files(filepaths: list, columns: list, build_row,
+                         read_file=json_file_to_dict) -> pd.DataFrame:
+    """Builds a DataFrame with one row per file, row = build_row(path, dict)"""
+    aggregator = StatisticsAggregator(columns)
+    for filepath, content in read_json_files(filepaths,
+                                             read_file=read_file):
+        aggregator.add_row(build_row(filepath, content))
+    return aggregator.to_dataframe()
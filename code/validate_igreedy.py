@@ -8,21 +8,23 @@ from utils.constants import (
     CLOUDFARE_IPS,
     ROOT_SERVERS,
     PROBES_SETS_PATH,
-    MEASUREMENTS_CAMPAIGNS_PATH,
-    ROOT_SERVERS_PATH,
-    CLOUDFARE_PATH,
-    DISTANCE_FUNCTION_USED,
-    AREA_OF_INTEREST_FILEPATH
-)
-from utils.common_functions import (
-    get_list_files_in_path,
-    json_file_to_dict
+    DISTANCE_FUNCTION_USED
 )
+from utils.measurement_store import load_measurement_columns
+from utils.results_index import get_results_index
+from utils.campaign_journal import get_campaign_journal
+from groundtruth import get_groundtruth_filepath
+from campaign_scheduler import CampaignScheduler
+
+# Kind of the analyses in the campaign journal and their state once done
+JOURNAL_ANALYSIS = "analysis"
+ANALYSIS_VALIDATED = "validated"
 
 
 class iGreedyValidation:
 
-    def __init__(self, measurement_campaign_name: str):
+    def __init__(self, measurement_campaign_name: str,
+                 force_analysis: bool = False):
         self._probefile_list = [
             "WW_1000.json",
             "WW_500.json",
@@ -40,69 +42,75 @@ class iGreedyValidation:
         self._threshold_list = [-1, 0.5, 1, 5, 10, 20, 30]
 
         self._measurement_campaign_name = measurement_campaign_name
+        # Analyze again the measurements whose analysis is in the cache
+        self._force_analysis = force_analysis
+
+    def generate_measurements(self, analyze: bool = False):
+        """
+        Runs every measurement of the campaign at once. With analyze each
+        measurement is validated as soon as it is saved.
+        """
+        CampaignScheduler(
+            campaign_name=self._measurement_campaign_name,
+            targets=self._target_list,
+            probes_filepaths=[PROBES_SETS_PATH + probe_set
+                              for probe_set in self._probefile_list],
+            on_measurement_saved=self.generate_result_and_gt_validation
+            if analyze else None
+        ).run()
+
+    def generate_results_and_gt_validations(self):
+        # The targets come from the measurements index, not the files
+        measurements_df = get_results_index().query_campaign_measurements(
+            self._measurement_campaign_name)
+
+        for measurement in measurements_df.itertuples():
+            self.generate_result_and_gt_validation(measurement.filepath,
+                                                   measurement.target)
 
-    def generate_measurements(self):
-        for target in self._target_list:
-            for probe_set in self._probefile_list:
-                measurement_command_result = subprocess.run(
+    def generate_result_and_gt_validation(self, measurement_path: str,
+                                          target: str = None):
+        measurement_name = measurement_path.split("/")[-1]
+        if target is None:
+            target = load_measurement_columns(measurement_path)[0]["target"]
+
+        gt_filepath = get_groundtruth_filepath(target)
+        if gt_filepath is None:
+            print("TARGET {} NOT IN GROUNDTRUTH".format(target))
+            return
+
+        campaign_name = self._measurement_campaign_name + \
+                        "_" + DISTANCE_FUNCTION_USED
+        journal = get_campaign_journal(self._measurement_campaign_name)
+
+        for alpha in self._alpha_list:
+            for threshold in self._threshold_list:
+                analysis_key = "{}_{}_{}_{}".format(
+                    measurement_name[:-5], alpha, threshold,
+                    DISTANCE_FUNCTION_USED)
+                if not self._force_analysis and \
+                        journal.get(JOURNAL_ANALYSIS, analysis_key):
+                    continue
+                print("Analyzing {} with alpha -> {} and threshold -> {}"
+                      .format(measurement_name, alpha, threshold))
+                result_and_gt_generation = subprocess.run(
                     [
                         "./igreedy.sh",
-                        "-m", target,
-                        "-p", PROBES_SETS_PATH + probe_set,
-                        "-c", self._measurement_campaign_name
-                    ],
+                        "-i", measurement_path,
+                        "-a", str(alpha),
+                        "-t", str(threshold),
+                        "-g", gt_filepath,
+                        "-c", campaign_name
+                    ] + (["-f"] if self._force_analysis else []),
                     stdout=subprocess.PIPE
                 )
-                print(str(measurement_command_result.stdout))
-
-    def generate_results_and_gt_validations(self):
-        measurement_files = get_list_files_in_path(
-            MEASUREMENTS_CAMPAIGNS_PATH + self._measurement_campaign_name
-        )
-
-        for measurement_name in measurement_files:
-            measurement_path = MEASUREMENTS_CAMPAIGNS_PATH + \
-                               self._measurement_campaign_name + \
-                               "/" + measurement_name
-            measurement_data = json_file_to_dict(measurement_path)
-
-            if measurement_data["target"] in ROOT_SERVERS.keys():
-                gt_filepath = ROOT_SERVERS_PATH + \
-                              ROOT_SERVERS[measurement_data["target"]]
-            elif measurement_data["target"] in CLOUDFARE_IPS:
-                if "North-Central" in AREA_OF_INTEREST_FILEPATH:
-                    gt_filepath = CLOUDFARE_PATH + \
-                                  "cloudfare_servers_europe.json"
-                else:
-                    gt_filepath = CLOUDFARE_PATH + \
-                                  "cloudfare_servers_world.json"
-            else:
-                print("TARGET {} NOT IN GROUNDTRUTH".format(
-                    measurement_data["target"]))
-                continue
-
-            campaign_name = self._measurement_campaign_name + \
-                            "_" + DISTANCE_FUNCTION_USED
-
-            for alpha in self._alpha_list:
-                for threshold in self._threshold_list:
-                    print("Analyzing {} with alpha -> {} and threshold -> {}"
-                          .format(measurement_name, alpha, threshold))
-                    result_and_gt_generation = subprocess.run(
-                        [
-                            "./igreedy.sh",
-                            "-i", measurement_path,
-                            "-a", str(alpha),
-                            "-t", str(threshold),
-                            "-g", gt_filepath,
-                            "-c", campaign_name
-                        ],
-                        stdout=subprocess.PIPE
-                    )
+                # igreedy.py exits with 0 for anycast and -1 for unicast
+                if result_and_gt_generation.returncode in (0, 255):
+                    journal.record(JOURNAL_ANALYSIS, analysis_key,
+                                   status=ANALYSIS_VALIDATED)
 
 
 igreedy_validation = iGreedyValidation(
     measurement_campaign_name="WW_validation_20230620"
 )
-igreedy_validation.generate_measurements()
-igreedy_validation.generate_results_and_gt_validations()
+igreedy_validation.generate_measurements(analyze=True)
@@ -23,6 +23,7 @@ from utils.common_functions import (
     convert_km_radius_to_degrees,
     get_distance_from_rtt
 )
+from utils.measurement_store import load_measurement_columns
 
 
 def plot_file(filepath: str) -> None:
@@ -48,7 +49,7 @@ def plot_file(filepath: str) -> None:
 
 def plot_measurement(measurement_path: str) -> None:
     measurement_results_df = pd.DataFrame(
-        json_file_to_dict(measurement_path)["measurement_results"])
+        load_measurement_columns(measurement_path)[1])
 
     if "verloc" in DISTANCE_FUNCTION_USED:
         distance_function = get_distance_from_rtt
@@ -246,10 +247,8 @@ def plot_hunter_result(filepath: str) -> None:
 def get_measurement_probes_from_results_file(result_path: str) -> pd.DataFrame:
     measurement_filepath = json_file_to_dict(
         result_path)["measurement_filepath"]
-    measurement_probes = json_file_to_dict(
-        measurement_filepath)["measurement_results"]
-
-    measurement_probes_df = pd.DataFrame(measurement_probes)
+    measurement_probes_df = pd.DataFrame(
+        load_measurement_columns(measurement_filepath)[1])
     measurement_probes_df = measurement_probes_df[
         ["hostname", "latitude", "longitude", "rtt_ms"]]
     measurement_probes_df['id'] = measurement_probes_df.loc[:, 'hostname']